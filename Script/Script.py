@@ -12,7 +12,30 @@ and file management.
 
 import tkinter as tk 
 from tkinter import filedialog, messagebox, ttk
-from collections import defaultdict
+import os
+import time
+from annotation_query import (CATEGORICAL_COLUMNS, NUMERIC_COLUMNS, OPERATORS, AnnotationFrame, Filter,
+                              QueryError, describe_filter, parse_filter)
+from annotations import ANNOTATION_COLUMNS, AnnotationStore
+from cache import FileCache
+from export import (export_annotation_rows, export_region, export_regions, export_scaffold,
+                    read_regions, regions_from_annotations)
+from background import BackgroundTask
+from diagnostics import DiagnosticsWindow, status_text
+from fasta_index import FastaIndexError, IndexedFasta, parse_region
+from feature_graph import export_transcripts
+from genome_overview import GenomeOverview
+from genome_tracks import gene_density
+from instrumentation import recorder
+from interval_index import IntervalIndex
+from motif_search import MotifError, parse_patterns, search_fasta
+from packed_sequence import PackedFasta
+from parallel_parse import parse_annotations, scan_fasta
+from sequence_viewer import SequenceViewer
+from virtual_table import VirtualTable
+
+SUMMARY_ROWS = 5000  # Groups listed in the summary panel, largest first
+STATUS_INTERVAL_MS = 1000  # Refresh of the instrumentation status bar
 
 ###################################
 # Defining Main Application Class #
@@ -23,11 +46,29 @@ class GenomeAssemblyApp(tk.Tk):
         super().__init__()  # Initializing parent Tk class
         self.title("GeneScoPy")  # Title
         self.geometry("1500x900")  # Window size
-        self.scaffold_map = {}  # Empty dictionary to Stores Scaffold and sequences
+        self.fasta = None  # Indexed, memory-mapped FASTA (sequences are fetched on demand), or a PackedFasta
+        self.keep_in_memory = tk.BooleanVar(value=False)  # Pack sequences 2-bit in memory after loading
+        self.assembly_stats = None  # Per-scaffold composition and gap statistics of the FASTA
+        self.genome_tracks = None  # Binned composition of every scaffold, counted while the FASTA loads
+        self.annotation_tracks = None  # Binned gene density, computed once the annotation loads
+        self.annotations = AnnotationStore()  # Columnar store behind the annotation table
+        self.search_index = None  # Inverted index over the annotations, set once loading finishes
+        self.interval_index = None  # Per-scaffold overlap index, set once loading finishes
+        self.feature_graph = None  # Gene -> transcript -> exon/CDS links, set once loading finishes
+        self.motif_hits = None  # Sequence search hits; while set, Next/Previous step through them
+        self.motif_index = -1  # Current hit of motif_hits, kept apart from the annotation rows of search_results
+        self.annotation_frame = None  # Filter and group-by engine over the annotation columns
+        self.filters = []  # Column filters applied to the table, combined with AND
+        self.filter_selectors = None  # One byte per row, 1 where the row passes the filters; None if unfiltered
+        self.pending_search = None  # after() id of the debounced as-you-type search
         self.create_menu()  # Call method for creating menu bar
         self.create_widgets()  # call method for creating widgets
         self.search_results = [] # Initializing search index
         self.current_search_index = -1 # Initializing search index
+        self.tasks = {}  # Running background loads keyed by kind ("fasta", "gtf")
+        self.cache = FileCache()  # Parsed files keyed by fingerprint, reused across sessions
+        self.diagnostics = None  # Diagnostics window while open
+        self.update_status_bar()
 
     #####################
     # Creating Menu Bar #
@@ -38,6 +79,8 @@ class GenomeAssemblyApp(tk.Tk):
         file_menu = tk.Menu(menu_bar, tearoff=0)
         file_menu.add_command(label="Open FASTA", command=self.open_fasta)
         file_menu.add_command(label="Open GTF/GFF", command=self.open_gtf)
+        file_menu.add_separator()
+        file_menu.add_checkbutton(label="Keep Sequences in Memory (2-bit packed)", variable=self.keep_in_memory)
         menu_bar.add_cascade(label="File", menu=file_menu)
         self.config(menu=menu_bar)
         
@@ -45,14 +88,26 @@ class GenomeAssemblyApp(tk.Tk):
         export_menu.add_command(label="Export Selected Annotation Row", command=self.export_selected_row)
         export_menu.add_command(label="Export Full Scaffold Sequence", command=self.export_full_scaffold)
         export_menu.add_command(label="Export Highlighted Sequence Region", command=self.export_highlighted_region)
+        export_menu.add_separator()
+        export_menu.add_command(label="Batch Export Regions...", command=self.open_batch_export)
+        export_menu.add_command(label="Export Transcript Sequences...", command=self.open_transcript_export)
+        export_menu.add_command(label="Export Sequence Search Hits (BED)", command=self.export_motif_hits)
         menu_bar.add_cascade(label="Export", menu=export_menu)
 
+        tools_menu = tk.Menu(menu_bar, tearoff=0)
+        tools_menu.add_command(label="Diagnostics...", command=self.open_diagnostics)
+        menu_bar.add_cascade(label="Tools", menu=tools_menu)
+
     ##############################
     # Function to Create Widgets #
     ##############################
 
     def create_widgets(self):
 
+        # Timings and memory of the latest stage, shown while instrumentation is on
+        self.status_bar = tk.Label(self, text="", anchor="w", relief="sunken")
+        self.status_bar.pack(side="bottom", fill="x")
+
         # Assembly Details Panel
         self.details_frame = tk.LabelFrame(self, text="Assembly Details", padx=10, pady=10)
         self.details_frame.pack(fill="x", padx=10, pady=5)
@@ -75,9 +130,50 @@ class GenomeAssemblyApp(tk.Tk):
         self.n50_label = tk.Label(self.details_frame, text="N50: ")
         self.n50_label.pack(anchor="w")
 
+        self.nx_label = tk.Label(self.details_frame, text="N10-N90: ")
+        self.nx_label.pack(anchor="w")
+
+        self.lx_label = tk.Label(self.details_frame, text="L50 / L90 / auN: ")
+        self.lx_label.pack(anchor="w")
+
+        self.composition_label = tk.Label(self.details_frame, text="Assembly GC / N Fraction: ")
+        self.composition_label.pack(anchor="w")
+
+        self.contig_label = tk.Label(self.details_frame, text="Contigs: ")
+        self.contig_label.pack(anchor="w")
+
         self.gc_content_label = tk.Label(self.details_frame, text="GC Content: ")
         self.gc_content_label.pack(anchor="w")
 
+        # Progress rows for background loads are added here while they run
+        self.progress_frame = tk.Frame(self.details_frame)
+        self.progress_frame.pack(fill="x")
+
+        # Coordinate navigation bar
+        self.navigation_frame = tk.Frame(self)
+        self.navigation_frame.pack(fill="x", padx=10)
+
+        tk.Label(self.navigation_frame, text="Jump to (scaffold:start-end):").pack(side="left")
+        self.jump_entry = tk.Entry(self.navigation_frame, width=40)
+        self.jump_entry.pack(side="left", padx=5)
+        self.jump_entry.bind("<Return>", lambda event: self.jump_to_coordinate())
+
+        self.jump_button = tk.Button(self.navigation_frame, text="Go", command=self.jump_to_coordinate)
+        self.jump_button.pack(side="left", padx=5)
+
+        self.features_in_view = tk.BooleanVar(value=True)
+        self.features_in_view_check = tk.Checkbutton(self.navigation_frame, text="Show all features in view",
+                                                     variable=self.features_in_view, command=lambda: self.sequence_viewer.render())
+        self.features_in_view_check.pack(side="left", padx=5)
+
+        # Sequence (motif) search over both strands of every scaffold
+        tk.Label(self.navigation_frame, text="Find sequence:").pack(side="left", padx=(20, 0))
+        self.motif_entry = tk.Entry(self.navigation_frame, width=30)
+        self.motif_entry.pack(side="left", padx=5)
+        self.motif_entry.bind("<Return>", lambda event: self.find_motif())
+        self.motif_button = tk.Button(self.navigation_frame, text="Find", command=self.find_motif)
+        self.motif_button.pack(side="left", padx=5)
+
         # Scaffold List and Sequence Viewer
         self.scaffold_frame = tk.Frame(self)
         self.scaffold_frame.pack(fill="both", expand=True, padx=10, pady=5)
@@ -86,8 +182,19 @@ class GenomeAssemblyApp(tk.Tk):
         self.scaffold_listbox.pack(side="left", fill="y")
         self.scaffold_listbox.bind("<<ListboxSelect>>", self.display_sequence)
 
-        self.sequence_text = tk.Text(self.scaffold_frame, wrap="word")
-        self.sequence_text.pack(side="right", fill="both", expand=True)
+        self.viewer_frame = tk.Frame(self.scaffold_frame)
+        self.viewer_frame.pack(side="right", fill="both", expand=True)
+
+        # Zoomable GC / N / gene density tracks of the selected scaffold
+        self.overview = GenomeOverview(self.viewer_frame)
+        self.overview.pack(side="top", fill="x")
+
+        # Only the visible slice of the selected scaffold is rendered
+        self.sequence_viewer = SequenceViewer(self.viewer_frame)
+        self.sequence_viewer.pack(side="top", fill="both", expand=True)
+        self.sequence_viewer.overlay_provider = self.features_for_view
+        self.sequence_viewer.view_listener = self.overview.set_cursor
+        self.overview.navigate = self.sequence_viewer.see
 
         # GTF/GFF Table with additional columns
         self.table_frame = tk.LabelFrame(self, text="GTF/GFF Data", padx=10, pady=10)
@@ -99,6 +206,8 @@ class GenomeAssemblyApp(tk.Tk):
 
         self.search_entry = tk.Entry(self.search_frame, width=50)
         self.search_entry.pack(side="left", padx=5)
+        self.search_entry.bind("<KeyRelease>", self.schedule_search)
+        self.search_entry.bind("<Return>", lambda event: self.search_table())
 
         self.search_button = tk.Button(self.search_frame, text="Search", command=self.search_table)
         self.search_button.pack(side="left", padx=5)
@@ -112,21 +221,41 @@ class GenomeAssemblyApp(tk.Tk):
         self.reset_button = tk.Button(self.search_frame, text="Reset", command=self.reset_table)
         self.reset_button.pack(side="left", padx=5)
 
-        self.table = ttk.Treeview(self.table_frame, columns=(
-            "Scaffold", "Source", "Feature", "Start", "End", "Strand", "Frame", "Product","Gene Name"), show="headings")
+        self.search_status_label = tk.Label(self.search_frame, text="")
+        self.search_status_label.pack(side="left", padx=5)
+
+        # Column filters narrowing the table, e.g. feature = CDS and length > 300
+        self.filter_frame = tk.Frame(self.table_frame)
+        self.filter_frame.pack(fill="x", padx=5)
+
+        tk.Label(self.filter_frame, text="Filter:").pack(side="left", padx=5)
+        self.filter_column = ttk.Combobox(self.filter_frame, values=CATEGORICAL_COLUMNS + NUMERIC_COLUMNS,
+                                          width=10, state="readonly")
+        self.filter_column.set("feature")
+        self.filter_column.pack(side="left", padx=2)
+        self.filter_operator = ttk.Combobox(self.filter_frame, values=OPERATORS, width=3, state="readonly")
+        self.filter_operator.set("=")
+        self.filter_operator.pack(side="left", padx=2)
+        self.filter_value = tk.Entry(self.filter_frame, width=20)
+        self.filter_value.pack(side="left", padx=2)
+        self.filter_value.bind("<Return>", lambda event: self.add_filter())
+
+        tk.Button(self.filter_frame, text="Add", command=self.add_filter).pack(side="left", padx=5)
+        tk.Button(self.filter_frame, text="Clear Filters", command=self.clear_filters).pack(side="left", padx=5)
+        tk.Button(self.filter_frame, text="Summary...", command=self.open_summary).pack(side="left", padx=5)
+
+        self.filter_status_label = tk.Label(self.filter_frame, text="")
+        self.filter_status_label.pack(side="left", padx=5)
+        self.filter_chips = tk.Frame(self.filter_frame)  # One removable button per active filter
+        self.filter_chips.pack(side="left", padx=5)
+
+        # Only the rows scrolled into view are materialised from the annotation store
+        self.table = VirtualTable(self.table_frame, columns=ANNOTATION_COLUMNS, headings=(
+            "Scaffold", "Source", "Feature", "Start Position", "End Position", "Strand", "Frame", "Product", "Gene Name"),
+            row_getter=lambda index: self.annotations.row(index))
         
         # Highlight sequence region based on table selection
-        self.table.bind("<<TreeviewSelect>>", self.highlight_sequence_region)
-
-        self.table.heading("Scaffold", text="Scaffold")
-        self.table.heading("Source", text="Source")
-        self.table.heading("Feature", text="Feature")
-        self.table.heading("Start", text="Start Position")
-        self.table.heading("End", text="End Position")
-        self.table.heading("Strand", text="Strand")
-        self.table.heading("Frame", text="Frame")
-        self.table.heading("Product", text="Product")
-        self.table.heading("Gene Name", text="Gene Name")
+        self.table.bind("<<TableSelect>>", self.highlight_sequence_region)
         
         self.table.pack(fill="both", expand=True)
 
@@ -135,7 +264,7 @@ class GenomeAssemblyApp(tk.Tk):
     ###############################
 
     def open_fasta(self):
-        file_path = filedialog.askopenfilename(filetypes=[("FASTA files", "*.fasta *.fa *.fna *.faa"), ("All files", "*.*")])
+        file_path = filedialog.askopenfilename(filetypes=[("FASTA files", "*.fasta *.fa *.fna *.faa *.gz *.bgz"), ("All files", "*.*")])
         if file_path:
             self.process_fasta(file_path)
     
@@ -144,7 +273,7 @@ class GenomeAssemblyApp(tk.Tk):
     #################################
 
     def open_gtf(self):
-        file_path = filedialog.askopenfilename(filetypes=[("GTF files", "*.gtf"), ("GFF files", "*.gff"), ("All files", "*.*")])
+        file_path = filedialog.askopenfilename(filetypes=[("GTF files", "*.gtf *.gtf.gz"), ("GFF files", "*.gff *.gff3 *.gff.gz *.gff3.gz"), ("All files", "*.*")])
         if file_path:
             self.process_gtf(file_path)
 
@@ -153,112 +282,190 @@ class GenomeAssemblyApp(tk.Tk):
     ##################################
 
     def process_fasta(self, file_path):
-        try:
-            from collections import defaultdict
-            import os
-
-            self.sequence_text.delete(1.0, tk.END)
-            self.scaffold_listbox.delete(0, tk.END)
-            self.scaffold_map = defaultdict(str)
-
-            self.file_label.config(text=f"File Name: {os.path.basename(file_path)}")
-            self.loading_label = tk.Label(self.details_frame, text="Loading FASTA...", fg="red")
-            self.loading_label.pack()
-            self.update()
-
-            with open(file_path, "r") as file:
-                scaffold = None
-                for line in file:
-                    line = line.strip()
-                    if line.startswith(">"):
-                        scaffold = line[1:].split()[0]
-                        self.scaffold_map[scaffold] = ""
-                    elif scaffold:
-                        self.scaffold_map[scaffold] += line
-
-            self.loading_label.destroy()
-            self.update_assembly_details()
-            self.scaffold_listbox.insert(tk.END, *self.scaffold_map.keys())
-
-        except Exception as e:
-            messagebox.showerror("Error", f"Could not process file: {e}")
+        # Cancel a running load first, so the old scan stops before the views
+        # it would fill are cleared and cannot finish into the new file's state
+        self.cancel_task("fasta")
+        self.sequence_viewer.clear()
+        self.overview.clear()
+        self.scaffold_listbox.delete(0, tk.END)
+        if self.fasta is not None:
+            self.fasta.close()
+            self.fasta = None
+            self.assembly_stats = None
+            self.genome_tracks = None
+
+        self.file_label.config(text=f"File Name: {os.path.basename(file_path)}")
+
+        # Builds the .fai index on first open (reused afterwards) off the main thread,
+        # collecting assembly statistics and composition tracks in the same pass;
+        # large files are scanned on all cores
+        keep_in_memory = self.keep_in_memory.get()
+
+        def load(task):
+            cached = self.cache.get("fasta", file_path)
+            if cached is not None:
+                entries, stats, tracks = cached
+                fasta = IndexedFasta(file_path, entries=entries, progress=task.report_progress)
+            else:
+                entries, stats, tracks = scan_fasta(file_path, workers=os.cpu_count() or 1,
+                                                    progress=task.report_progress)
+                fasta = IndexedFasta(file_path, entries=entries, progress=task.report_progress)
+                self.cache.put("fasta", file_path, (entries, stats, tracks))
+
+            if keep_in_memory:
+                with fasta:
+                    return PackedFasta.from_fasta(fasta, progress=task.report_progress), stats, tracks
+            return fasta, stats, tracks
+
+        self.start_task("fasta", "Loading FASTA...", load, on_done=self.fasta_loaded)
+
+    def fasta_loaded(self, result):
+        self.fasta, self.assembly_stats, self.genome_tracks = result
+        self.overview.set_sources(self.genome_tracks, self.annotation_tracks)
+        self.update_assembly_details()
+        self.scaffold_listbox.insert(tk.END, *self.fasta.names())
     
     ####################################
     # Function to process GTF/GFF file #
     ####################################
 
     def process_gtf(self, file_path):
-        try:
-
-            # Clear existing table contents before processing a new file
-            for row in self.table.get_children():
-                self.table.delete(row)
-                
-            with open(file_path, "r") as file:
-                for line in file:
-                    if not line.startswith("#"):
-                        parts = line.strip().split("\t")
-                        if len(parts) >= 9:  # Ensure there's enough columns
-                            scaffold = parts[0]   # scaffold
-                            source = parts[1]      # source
-                            feature = parts[2]     # feature type (gene, exon, etc.)
-                            start = parts[3]       # start position
-                            end = parts[4]         # end position
-                            strand = parts[6]      # strand (+ or -)
-                            frame = parts[7]       # frame
-                            product = parts[8]
-                            attributes = parts[8]  # gene ID or gene name
-
-                            # Extract the gene name from the attributes (assuming it's in 'gene_name' or 'gene_id')
-                            gene_name = "Unknown"
-                            if 'gene "' in attributes:  # GTF format
-                                gene_name = attributes.split('gene "')[1].split('"')[0]
-                            elif "gene=" in attributes:  # GFF format
-                                gene_name = attributes.split("gene=")[1].split(";")[0]
-                            elif "Name=" in attributes:  # GFF format alternative
-                                gene_name = attributes.split("Name=")[1].split(";")[0]
-                            
-                            product_out = "Unknown"
-                            if 'product "' in product: # GTF format
-                                product_out = product.split('product "')[1].split('"')[0]
-                            elif "product=" in product: #GFF format
-                                product_out = product.split("product=")[1].split(";")[0]
-
-
-                            # Insert data into table
-                            self.table.insert("", "end", values=(scaffold, source, feature, start, end, strand, frame, product_out, gene_name))
-
-        except Exception as e:
-            messagebox.showerror("Error", f"Could not process file: {e}")
+        # Cancel a running load first, its on_cancel would otherwise replace
+        # the store captured below and leave the table reading an empty one
+        self.cancel_task("gtf")
+        self.clear_table()
+        store = self.annotations
+
+        # The worker fills the columnar store and the search index, and reports
+        # how many rows are complete; large files are parsed on all cores and
+        # merged in file order. A cached parse of the same file skips all of it.
+        def parse(task):
+            cached = self.cache.get("annotations", file_path)
+            if cached is not None:
+                return cached + (AnnotationFrame(cached[0]),)
+
+            _, search_index, feature_graph = parse_annotations(
+                file_path, workers=os.cpu_count() or 1, progress=task.report_progress, store=store,
+                on_merged=lambda merged: task.send(len(merged)))
+            result = (store, search_index, IntervalIndex(store), feature_graph, gene_density(store, feature_graph))
+            self.cache.put("annotations", file_path, result)
+            return result + (AnnotationFrame(store),)
+
+        self.start_task("gtf", f"Loading {os.path.basename(file_path)}...", parse,
+                        on_done=self.annotations_loaded,
+                        on_chunk=self.table.set_row_count, on_cancel=self.clear_table)
+
+    def annotations_loaded(self, result):
+        (self.annotations, self.search_index, self.interval_index, self.feature_graph,
+         self.annotation_tracks, self.annotation_frame) = result
+        self.overview.set_sources(self.genome_tracks, self.annotation_tracks)
+        self.table.set_row_count(len(self.annotations))
+        self.sequence_viewer.render()
+        if self.search_entry.get().strip():
+            self.search_table()  # Run a query typed while the file was loading
+
+    def clear_table(self):
+        # Clear existing table contents before processing a new file
+        self.reset_table()
+        self.annotations = AnnotationStore()
+        self.search_index = None
+        self.interval_index = None
+        self.feature_graph = None
+        self.annotation_tracks = None
+        self.annotation_frame = None
+        self.overview.set_sources(self.genome_tracks)
+        self.table.clear()
+        self.filters = []
+        self.filter_selectors = None
+        self.show_filters()
+        self.sequence_viewer.render()
+
+    #########################################################
+    # Functions to run file loads in the background with UI #
+    #########################################################
+
+    def start_task(self, kind, text, target, on_done=None, on_chunk=None, on_cancel=None):
+        # Only one load per kind at a time, a new file replaces the running one
+        if kind in self.tasks:
+            self.cancel_task(kind)
+
+        row = tk.Frame(self.progress_frame)
+        row.pack(fill="x", pady=2)
+        tk.Label(row, text=text, fg="red", width=40, anchor="w").pack(side="left")
+        bar = ttk.Progressbar(row, length=300, maximum=100, mode="determinate")
+        bar.pack(side="left", padx=5)
+        tk.Button(row, text="Cancel", command=lambda: self.cancel_task(kind)).pack(side="left", padx=5)
+
+        task = BackgroundTask(target, name=kind)
+        self.tasks[kind] = {"task": task, "row": row, "bar": bar, "on_done": on_done,
+                            "on_chunk": on_chunk, "on_cancel": on_cancel}
+        task.start()
+        self.after(50, self.poll_task, kind, task)
+
+    def cancel_task(self, kind):
+        entry = self.tasks.pop(kind, None)
+        if entry is None:
+            return
+        entry["task"].cancel()
+        entry["row"].destroy()
+        if entry["on_cancel"]:
+            entry["on_cancel"]()
+
+    def poll_task(self, kind, task):
+        entry = self.tasks.get(kind)
+        if entry is None or entry["task"] is not task:
+            return  # Cancelled or replaced, late messages are dropped
+
+        # Drain the queue for a bounded time slice so the window stays responsive
+        deadline = time.monotonic() + 0.04
+        while time.monotonic() < deadline:
+            messages = task.poll(max_messages=1)
+            if not messages:
+                break
+            for message, payload in messages:
+                if message == "progress":
+                    done, total = payload
+                    entry["bar"]["value"] = 100 * done / total if total else 100
+                elif message == "chunk" and entry["on_chunk"]:
+                    entry["on_chunk"](payload)
+                elif message in ("done", "error", "cancelled"):
+                    self.tasks.pop(kind, None)
+                    entry["row"].destroy()
+                    if message == "done" and entry["on_done"]:
+                        entry["on_done"](payload)
+                    elif message == "error":
+                        if entry["on_cancel"]:
+                            entry["on_cancel"]()  # Do not leave a partially loaded file behind
+                        messagebox.showerror("Error", f"Could not process file: {payload}")
+                    return
+
+        self.after(50, self.poll_task, kind, task)
 
     #############################################################
     # Function to update assembly FASTA details on the info tab #
     #############################################################
 
     def update_assembly_details(self):
-        total_length = sum(len(seq) for seq in self.scaffold_map.values())
-        num_scaffolds = len(self.scaffold_map)
-
-        largest_scaffold = max(self.scaffold_map, key=lambda x: len(self.scaffold_map[x]))
-        largest_length = len(self.scaffold_map[largest_scaffold])
-
-        smallest_scaffold = min(self.scaffold_map, key=lambda x: len(self.scaffold_map[x]))
-        smallest_length = len(self.scaffold_map[smallest_scaffold])
-
-        sorted_lengths = sorted(len(seq) for seq in self.scaffold_map.values())
-        cumulative_length = 0
-        n50 = 0
-        for length in sorted_lengths:
-            cumulative_length += length
-            if cumulative_length >= total_length / 2:
-                n50 = length
-                break
+        summary = self.assembly_stats.summary()  # Collected while the FASTA streamed past
+        if not summary["scaffolds"]:
+            return
 
-        self.assembly_length_label.config(text=f"Total Assembly Length: {total_length}")
-        self.num_scaffolds_label.config(text=f"Total Number of Scaffolds: {num_scaffolds}")
-        self.largest_scaffold_label.config(text=f"Largest Scaffold: {largest_scaffold} ({largest_length})")
-        self.shortest_scaffold_label.config(text=f"Shortest Scaffold: {smallest_scaffold} ({smallest_length})")
-        self.n50_label.config(text=f"N50: {n50}")
+        nx = ", ".join(f"N{x}: {summary[f'n{x}']}" for x in range(10, 100, 10))
+
+        self.assembly_length_label.config(text=f"Total Assembly Length: {summary['total_length']}")
+        self.num_scaffolds_label.config(text=f"Total Number of Scaffolds: {summary['scaffolds']}")
+        self.largest_scaffold_label.config(
+            text=f"Largest Scaffold: {summary['largest_scaffold']} ({summary['largest_length']})")
+        self.shortest_scaffold_label.config(
+            text=f"Shortest Scaffold: {summary['smallest_scaffold']} ({summary['smallest_length']})")
+        self.n50_label.config(text=f"N50: {summary['n50']}")
+        self.nx_label.config(text=f"N10-N90: {nx}")
+        self.lx_label.config(text=f"L50 / L90 / auN: {summary['l50']} / {summary['l90']} / {summary['aun']:.0f}")
+        self.composition_label.config(
+            text=f"Assembly GC / N Fraction: {summary['gc_fraction'] * 100:.2f}% / {summary['n_fraction'] * 100:.3f}%")
+        self.contig_label.config(
+            text=f"Contigs (split at >= {summary['min_gap']} N): {summary['contigs']}, "
+                 f"N50: {summary['contig_n50']}, L50: {summary['contig_l50']}, Gaps: {summary['gaps']}")
 
     ##################################################
     # Function to display fasta sequence in text box #
@@ -268,42 +475,72 @@ class GenomeAssemblyApp(tk.Tk):
         selected = self.scaffold_listbox.curselection()
         if selected:
             scaffold = self.scaffold_listbox.get(selected)
-            sequence = self.scaffold_map.get(scaffold, "")
+            if self.fasta is None or scaffold not in self.fasta:
+                return
 
-            self.sequence_text.delete(1.0, tk.END)
+            self.show_scaffold(scaffold)
+            self.sequence_viewer.clear_highlight("highlight")
 
-            for i in range(0, len(sequence), 1000):  # Chunk-wise insert for large sequences
-                self.sequence_text.insert(tk.END, sequence[i:i+1000] + "\n")
-
-            gc_count = sum(1 for char in sequence if char in "GC")
-            gc_content = (gc_count / len(sequence)) * 100 if sequence else 0
+            # Composition was counted while the FASTA loaded
+            gc_content = self.assembly_stats.by_name[scaffold].gc_fraction * 100
             self.gc_content_label.config(text=f"GC Content: {gc_content:.2f}%")
 
+    def show_scaffold(self, scaffold, position=0):
+        if self.sequence_viewer.name != scaffold:
+            fasta = self.fasta
+            with recorder.span("view.show_scaffold"):
+                self.overview.show(scaffold, fasta.lengths[scaffold])
+                self.sequence_viewer.show(scaffold, fasta.lengths[scaffold],
+                                          lambda start, end: fasta.fetch(scaffold, start, end), position)
+        else:
+            self.sequence_viewer.scroll_to(position)
+
 
     ###############################################################
     # Function to perform search in table based on input keywords #
     ###############################################################
 
     def search_table(self):
-        query = self.search_entry.get().lower()
-        self.search_results.clear()  # Clear previous search results
+        if self.pending_search is not None:
+            self.after_cancel(self.pending_search)
+            self.pending_search = None
+
+        query = self.search_entry.get()
+        self.search_results = []  # Clear previous search results
         self.current_search_index = -1  # Reset the search index
+        self.clear_motif_hits()
 
-        for idx, row in enumerate(self.table.get_children()):
-            values = self.table.item(row, "values")
-            if any(query in str(value).lower() for value in values):
-                self.search_results.append(row)
+        if self.search_index is None:
+            self.search_status_label.config(text="Index not ready" if self.tasks.get("gtf") else "")
+            return
+
+        # Hit list comes precomputed from the inverted index, Next/Previous step through it
+        self.search_results = self.rows_in_view(self.search_index.search(query))
 
         if self.search_results:
             self.current_search_index = 0
             self.highlight_search()
+        else:
+            self.search_status_label.config(text="No matches" if query.strip() else "")
+
+    # Re-run the search shortly after the user stops typing
+    def schedule_search(self, event):
+        if event.keysym == "Return":
+            return
+        if self.pending_search is not None:
+            self.after_cancel(self.pending_search)
+        self.pending_search = self.after(150, self.search_table)
 
     #########################################################################
     # Function for the next search button to navigate to next similar input #
     #########################################################################
 
     def next_search(self):
-        if self.search_results and self.current_search_index < len(self.search_results) - 1:
+        if self.motif_hits is not None:
+            if self.motif_index < len(self.motif_hits) - 1:
+                self.motif_index += 1
+                self.highlight_search()
+        elif self.search_results and self.current_search_index < len(self.search_results) - 1:
             self.current_search_index += 1
             self.highlight_search()
 
@@ -312,7 +549,11 @@ class GenomeAssemblyApp(tk.Tk):
     #############################################################################
 
     def previous_search(self):
-        if self.search_results and self.current_search_index > 0:
+        if self.motif_hits is not None:
+            if self.motif_index > 0:
+                self.motif_index -= 1
+                self.highlight_search()
+        elif self.search_results and self.current_search_index > 0:
             self.current_search_index -= 1
             self.highlight_search()
 
@@ -321,84 +562,119 @@ class GenomeAssemblyApp(tk.Tk):
     ###############################################################
 
     def highlight_search(self):
-        for row in self.table.selection():
-            self.table.selection_remove(row)
-        if self.search_results:
-            row = self.search_results[self.current_search_index]
-            self.table.selection_set(row)
-            self.table.see(row)
+        if self.motif_hits:
+            scaffold, start, end, strand, name = self.motif_hits[self.motif_index]
+            self.search_status_label.config(text=f"{name} ({strand}) {self.motif_index + 1} of {len(self.motif_hits)}")
+            self.show_region(scaffold, start + 1, end)
+        elif self.search_results:
+            self.search_status_label.config(
+                text=f"{self.current_search_index + 1} of {len(self.search_results)}")
+            self.table.select(self.search_results[self.current_search_index])
+        else:
+            self.table.clear_selection()
 
     #######################################################
     # Function for reset button to the clear search check #
     #######################################################
 
     def reset_table(self):
-        self.search_results.clear()
+        self.search_results = []
         self.current_search_index = -1
-        self.table.selection_remove(*self.table.selection())
+        self.clear_motif_hits()
+        self.table.clear_selection()
         self.search_entry.delete(0, tk.END)
+        self.search_status_label.config(text="")
 
     #########################################################################
     # Function to highlight FASTA sequence region for selected row in table #
     #########################################################################
 
     def highlight_sequence_region(self, event):
-        selected_item = self.table.selection()
-        if not selected_item:
+        selected_row = self.table.selection()
+        if selected_row is None:
             return
 
-        item_values = self.table.item(selected_item, 'values')
-        if len(item_values) < 5:
-            return
+        # Coordinates are stored as integers when the GTF/GFF is parsed
+        scaffold = self.annotations.scaffold[selected_row]
+        start = self.annotations.start[selected_row]
+        end = self.annotations.end[selected_row]
 
-        scaffold = item_values[0]
-        try:
-            start = int(item_values[3])
-            end = int(item_values[4])
-        except ValueError:
-            messagebox.showerror("Error", "Start/End coordinates must be integers.")
+        if self.fasta is None:
+            return  # Nothing to highlight until a FASTA is loaded
+        if scaffold not in self.fasta:
+            messagebox.showerror("Error", f"Scaffold '{scaffold}' not found in FASTA.")
             return
 
-        # Check scaffold match with selection
-        listbox_selection = self.scaffold_listbox.curselection()
-        
+        self.show_region(scaffold, start, end)
+
+    ###################################################################
+    # Function to show a highlighted region with flanks in the viewer #
+    ###################################################################
+
+    def show_region(self, scaffold, start, end, flank=500):
         # Auto-select scaffold in listbox if not already selected
         for i in range(self.scaffold_listbox.size()):
             if self.scaffold_listbox.get(i) == scaffold:
                 self.scaffold_listbox.selection_clear(0, tk.END)
                 self.scaffold_listbox.selection_set(i)
                 self.scaffold_listbox.activate(i)
-                selected_scaffold = scaffold  # Update selected scaffold
                 break
 
-        selected_scaffold = self.scaffold_listbox.get(listbox_selection)
-        
-
-        sequence = self.scaffold_map.get(scaffold, "")
-        if not sequence:
-            messagebox.showerror("Error", f"Scaffold '{scaffold}' not found in FASTA.")
+        # Scroll so the feature starts below 500 bp of upstream context
+        with recorder.span("view.highlight"):
+            self.show_scaffold(scaffold, max(0, start - flank - 1))
+            self.sequence_viewer.set_highlight("highlight", [(start - 1, end)])
+
+    #####################################################################
+    # Function to supply every annotated feature overlapping the viewer #
+    #####################################################################
+
+    def features_for_view(self, scaffold, start, end):
+        overlays = {}
+        if self.motif_hits is not None:
+            overlays["motif"] = self.motif_hits.intervals(scaffold, start, end)
+        if not self.features_in_view.get() or self.interval_index is None:
+            return overlays
+        # Viewer coordinates are 0-based half-open, annotations are 1-based inclusive
+        rows = self.interval_index.overlap(scaffold, start + 1, end)
+        overlays["feature"] = [(self.annotations.start[row] - 1, self.annotations.end[row]) for row in rows]
+        return overlays
+
+    ######################################################
+    # Function to jump to a coordinate typed by the user #
+    ######################################################
+
+    def jump_to_coordinate(self):
+        text = self.jump_entry.get().strip()
+        if not text:
             return
 
-        # Display window: +/- 500 bp around the feature
-        flank = 500
-        seq_len = len(sequence)
-
-        display_start = max(0, start - flank - 1)  # 0-based
-        display_end = min(seq_len, end + flank)
-
-        display_seq = sequence[display_start:display_end]
-
-        self.sequence_text.delete(1.0, tk.END)
-        for i in range(0, len(display_seq), 1000):
-            self.sequence_text.insert(tk.END, display_seq[i:i+1000] + "\n")
+        names = self.fasta.lengths if self.fasta else (self.interval_index.scaffolds if self.interval_index else {})
+        try:
+            scaffold, start, end = parse_region(text, names)
+        except FastaIndexError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        if scaffold not in names:
+            messagebox.showerror("Error", f"Scaffold '{scaffold}' not found.")
+            return
 
-        # Calculate relative highlight position
-        highlight_start = start - display_start - 1
-        highlight_end = highlight_start + (end - start + 1)
+        if start is None:  # A bare scaffold name covers the whole scaffold
+            start, end = 1, self.fasta.lengths[scaffold] if self.fasta else 2 ** 62
+        elif end is None:
+            end = start
 
-        self.sequence_text.tag_remove("highlight", 1.0, tk.END)
-        self.sequence_text.tag_add("highlight", f"1.0+{highlight_start}c", f"1.0+{highlight_end}c")
-        self.sequence_text.tag_configure("highlight", background="cyan")
+        # Features at the coordinate (or the closest ones) become the navigable hit list
+        hits = self.interval_index.nearest(scaffold, start, end) if self.interval_index else []
+        self.search_results = hits = self.rows_in_view(hits)
+        self.current_search_index = 0 if hits else -1
+        if hits:
+            self.highlight_search()
+            self.search_status_label.config(text=f"1 of {len(hits)} features at {text}")
+        elif self.fasta:
+            self.table.clear_selection()
+            self.search_status_label.config(text=f"No features at {text}")
+            self.show_region(scaffold, start, min(end, self.fasta.lengths[scaffold]))
     
     
     ################################################
@@ -406,20 +682,16 @@ class GenomeAssemblyApp(tk.Tk):
     ################################################
             
     def export_selected_row(self):
-        selected_item = self.table.selection()
-        if not selected_item:
+        selected_row = self.table.selection()
+        if selected_row is None:
             messagebox.showinfo("Info", "No annotation row selected.")
             return
     
-        row_data = self.table.item(selected_item[0], 'values')
         save_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv")])
     
         if save_path:
             try:
-                with open(save_path, "w") as f:
-                    headers = ["Scaffold", "Source", "Feature", "Start", "End", "Strand", "Frame", "Product", "Gene Name"]
-                    f.write(",".join(headers) + "\n")
-                    f.write(",".join(str(i) for i in row_data) + "\n")
+                export_annotation_rows(self.annotations, [selected_row], save_path)
                 messagebox.showinfo("Success", f"Annotation row exported to {save_path}")
             except Exception as e:
                 messagebox.showerror("Error", str(e))
@@ -431,52 +703,374 @@ class GenomeAssemblyApp(tk.Tk):
             return
 
         scaffold = self.scaffold_listbox.get(selected)
-        sequence = self.scaffold_map.get(scaffold, "")
 
         save_path = filedialog.asksaveasfilename(defaultextension=".fasta", filetypes=[("FASTA files", "*.fasta")])
         if save_path:
             try:
-                with open(save_path, "w") as f:
-                    f.write(f">{scaffold}\n")
-                    for i in range(0, len(sequence), 80):
-                        f.write(sequence[i:i+80] + "\n")
+                export_scaffold(self.fasta, scaffold, save_path)
                 messagebox.showinfo("Success", f"Scaffold exported to {save_path}")
             except Exception as e:
                 messagebox.showerror("Error", str(e))
 
     def export_highlighted_region(self):
-        selected_item = self.table.selection()
-        if not selected_item:
+        selected_row = self.table.selection()
+        if selected_row is None:
             messagebox.showinfo("Info", "No annotation row selected.")
             return
 
-        item_values = self.table.item(selected_item[0], 'values')
-        scaffold = item_values[0]
-        try:
-            start = int(item_values[3])
-            end = int(item_values[4])
-        except ValueError:
-            messagebox.showerror("Error", "Start/End coordinates must be integers.")
-            return
+        scaffold = self.annotations.scaffold[selected_row]
+        start = self.annotations.start[selected_row]
+        end = self.annotations.end[selected_row]
+        strand = self.annotations.strand[selected_row]
 
-        if scaffold not in self.scaffold_map:
+        if self.fasta is None or scaffold not in self.fasta:
             messagebox.showerror("Error", f"{scaffold} not found in loaded FASTA.")
             return
 
-        region_seq = self.scaffold_map[scaffold][start-1:end]
-
         save_path = filedialog.asksaveasfilename(defaultextension=".fasta", filetypes=[("FASTA files", "*.fasta")])
         if save_path:
             try:
-                with open(save_path, "w") as f:
-                    f.write(f">{scaffold}:{start}-{end}\n")
-                    for i in range(0, len(region_seq), 80):
-                        f.write(region_seq[i:i+80] + "\n")
+                export_region(self.fasta, scaffold, start, end, save_path, strand=strand)
                 messagebox.showinfo("Success", f"Region exported to {save_path}")
             except Exception as e:
                 messagebox.showerror("Error", str(e))
 
 
+    #########################################
+    # Functions for batch export of regions #
+    #########################################
+
+    def open_batch_export(self):
+        if self.fasta is None:
+            messagebox.showinfo("Info", "Please load a FASTA file first.")
+            return
+
+        dialog = tk.Toplevel(self)
+        dialog.title("Batch Export Regions")
+        dialog.transient(self)
+
+        source = tk.StringVar(value="features" if len(self.annotations) else "file")
+        feature = tk.StringVar(value="All features")
+        region_file = tk.StringVar()
+        flank = tk.IntVar(value=0)
+        output_format = tk.StringVar(value="fasta")
+        strand_aware = tk.BooleanVar(value=True)
+
+        features = ["All features"] + sorted(self.annotations.feature.categories)
+        tk.Radiobutton(dialog, text="Annotations of type", variable=source, value="features").grid(row=0, column=0, sticky="w")
+        ttk.Combobox(dialog, textvariable=feature, values=features, state="readonly").grid(row=0, column=1, sticky="we")
+        tk.Radiobutton(dialog, text=f"Search results ({len(self.search_results)})", variable=source,
+                       value="search").grid(row=1, column=0, sticky="w")
+        tk.Radiobutton(dialog, text="BED or region list file", variable=source, value="file").grid(row=2, column=0, sticky="w")
+        tk.Entry(dialog, textvariable=region_file, width=40).grid(row=2, column=1, sticky="we")
+        tk.Button(dialog, text="Browse", command=lambda: region_file.set(
+            filedialog.askopenfilename(filetypes=[("BED files", "*.bed *.bed.gz"), ("All files", "*.*")]) or region_file.get()
+        )).grid(row=2, column=2, padx=5)
+
+        tk.Label(dialog, text="Flanking bases").grid(row=3, column=0, sticky="w")
+        tk.Spinbox(dialog, from_=0, to=1000000, increment=100, textvariable=flank, width=10).grid(row=3, column=1, sticky="w")
+        tk.Label(dialog, text="Format").grid(row=4, column=0, sticky="w")
+        ttk.Combobox(dialog, textvariable=output_format, values=["fasta", "csv"], state="readonly",
+                     width=8).grid(row=4, column=1, sticky="w")
+        tk.Checkbutton(dialog, text="Reverse-complement minus strand regions",
+                       variable=strand_aware).grid(row=5, column=0, columnspan=2, sticky="w")
+
+        def run():
+            try:
+                flank_bases = max(0, flank.get())
+            except tk.TclError:
+                messagebox.showerror("Error", "Flanking bases must be a number.", parent=dialog)
+                return
+            if source.get() == "file" and not region_file.get():
+                messagebox.showinfo("Info", "Please choose a BED or region file.", parent=dialog)
+                return
+            if source.get() == "features":
+                selected = None if feature.get() == "All features" else [feature.get()]
+                regions = list(regions_from_annotations(self.annotations, features=selected, flank=flank_bases))
+            elif source.get() == "search":
+                regions = list(regions_from_annotations(self.annotations, rows=self.search_results, flank=flank_bases))
+            else:
+                regions = None  # Read on the worker thread
+            extension = ".csv" if output_format.get() == "csv" else ".fasta"
+            save_path = filedialog.asksaveasfilename(parent=dialog, defaultextension=extension,
+                                                     filetypes=[(output_format.get().upper() + " files", "*" + extension)])
+            if not save_path:
+                return
+            dialog.destroy()
+            self.run_batch_export(regions, region_file.get(), flank_bases, save_path,
+                                  output_format.get(), strand_aware.get())
+
+        tk.Button(dialog, text="Export", command=run).grid(row=6, column=1, sticky="e", pady=5)
+        tk.Button(dialog, text="Close", command=dialog.destroy).grid(row=6, column=2, pady=5)
+
+    def run_batch_export(self, regions, region_file, flank, save_path, output_format, strand_aware):
+        fasta = self.fasta
+
+        def export(task):
+            selected = regions if regions is not None else read_regions(region_file, flank)
+            return export_regions(fasta, selected, save_path, output_format, strand_aware,
+                                  workers=os.cpu_count() or 1, progress=task.report_progress)
+
+        def exported(result):
+            count, skipped = result
+            note = f" ({skipped} regions outside the FASTA were skipped)" if skipped else ""
+            messagebox.showinfo("Success", f"{count} regions exported to {save_path}{note}")
+
+        self.start_task("export", f"Exporting to {os.path.basename(save_path)}...", export, on_done=exported)
+
+
+    ###############################################
+    # Functions for export of spliced transcripts #
+    ###############################################
+
+    def open_transcript_export(self):
+        if self.fasta is None or self.feature_graph is None:
+            messagebox.showinfo("Info", "Please load a FASTA and a GTF/GFF file first.")
+            return
+
+        dialog = tk.Toplevel(self)
+        dialog.title("Export Transcript Sequences")
+        dialog.transient(self)
+
+        selected_row = self.table.selection()
+        scope = tk.StringVar(value="all")
+        kind = tk.StringVar(value="cds")
+
+        tk.Label(dialog, text="Transcripts").grid(row=0, column=0, sticky="w")
+        tk.Radiobutton(dialog, text=f"All ({len(self.feature_graph.transcripts)})", variable=scope,
+                       value="all").grid(row=0, column=1, sticky="w")
+        gene_button = tk.Radiobutton(dialog, text="Gene of the selected row", variable=scope, value="selected")
+        gene_button.grid(row=1, column=1, sticky="w")
+        if selected_row is None or not self.feature_graph.transcripts_for_row(selected_row):
+            gene_button.config(state="disabled")
+        tk.Radiobutton(dialog, text=f"Genes of the search results ({len(self.search_results)} rows)",
+                       variable=scope, value="search").grid(row=2, column=1, sticky="w")
+
+        tk.Label(dialog, text="Sequence").grid(row=3, column=0, sticky="w")
+        for row, (value, text) in enumerate((("mrna", "Spliced mRNA"), ("cds", "CDS"), ("protein", "Protein")), start=3):
+            tk.Radiobutton(dialog, text=text, variable=kind, value=value).grid(row=row, column=1, sticky="w")
+
+        def run():
+            graph = self.feature_graph
+            if scope.get() == "all":
+                transcript_ids = None
+            else:
+                rows = [selected_row] if scope.get() == "selected" else self.search_results
+                transcript_ids = list(dict.fromkeys(
+                    transcript_id for row in rows for transcript_id in graph.transcripts_for_row(row)))
+            save_path = filedialog.asksaveasfilename(parent=dialog, defaultextension=".fasta",
+                                                     filetypes=[("FASTA files", "*.fasta *.fa *.faa")])
+            if not save_path:
+                return
+            dialog.destroy()
+            self.run_transcript_export(transcript_ids, kind.get(), save_path)
+
+        tk.Button(dialog, text="Export", command=run).grid(row=6, column=1, sticky="e", pady=5)
+        tk.Button(dialog, text="Close", command=dialog.destroy).grid(row=6, column=2, pady=5)
+
+    def run_transcript_export(self, transcript_ids, kind, save_path):
+        fasta, store, graph = self.fasta, self.annotations, self.feature_graph
+
+        def export(task):
+            return export_transcripts(fasta, store, graph, save_path, kind, transcript_ids,
+                                      progress=task.report_progress)
+
+        def exported(result):
+            count, skipped = result
+            note = f" ({skipped} without a CDS or outside the FASTA were skipped)" if skipped else ""
+            messagebox.showinfo("Success", f"{count} transcripts exported to {save_path}{note}")
+
+        # Own kind, so it does not cancel a running region export (or the other way round)
+        self.start_task("transcripts", f"Exporting to {os.path.basename(save_path)}...", export, on_done=exported)
+
+
+    #########################################
+    # Functions for sequence (motif) search #
+    #########################################
+
+    def find_motif(self):
+        if self.fasta is None:
+            messagebox.showinfo("Info", "Please load a FASTA file first.")
+            return
+        try:
+            patterns = parse_patterns(self.motif_entry.get())
+        except MotifError as e:
+            messagebox.showerror("Error", str(e))
+            return
+
+        fasta = self.fasta
+
+        def search(task):
+            return search_fasta(fasta, patterns, workers=os.cpu_count() or 1, progress=task.report_progress)
+
+        self.start_task("motif", "Searching sequence...", search, on_done=self.motif_search_done)
+
+    # Sequence hits replace the annotation search results, which the export
+    # dialogs read as annotation rows, so those are cleared rather than reused
+    def motif_search_done(self, hits):
+        self.search_results = []
+        self.current_search_index = -1
+        self.motif_hits = hits
+        self.motif_index = -1
+        self.sequence_viewer.render()
+        if not hits:
+            self.search_status_label.config(text="No sequence matches")
+            return
+        if hits.truncated:
+            messagebox.showinfo("Info", f"Only the first {len(hits)} matches were kept.")
+        self.motif_index = 0
+        self.highlight_search()
+
+    def clear_motif_hits(self):
+        self.motif_index = -1
+        if self.motif_hits is not None:
+            self.motif_hits = None
+            self.sequence_viewer.render()
+
+    def export_motif_hits(self):
+        if not self.motif_hits:
+            messagebox.showinfo("Info", "No sequence search hits to export.")
+            return
+        save_path = filedialog.asksaveasfilename(defaultextension=".bed", filetypes=[("BED files", "*.bed")])
+        if save_path:
+            try:
+                self.motif_hits.write_bed(save_path)
+                messagebox.showinfo("Success", f"{len(self.motif_hits)} hits exported to {save_path}")
+            except Exception as e:
+                messagebox.showerror("Error", str(e))
+
+
+    ##################################################
+    # Functions to filter the table and summarise it #
+    ##################################################
+
+    def add_filter(self):
+        if self.annotation_frame is None:
+            messagebox.showinfo("Info", "Please load a GTF/GFF file first.")
+            return
+        try:
+            query_filter = parse_filter(self.filter_column.get() + self.filter_operator.get() + self.filter_value.get())
+        except QueryError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.filters.append(query_filter)
+        self.filter_value.delete(0, tk.END)
+        self.apply_filters()
+
+    def remove_filter(self, index):
+        del self.filters[index]
+        self.apply_filters()
+
+    def clear_filters(self):
+        self.filters = []
+        self.apply_filters()
+
+    def apply_filters(self):
+        frame = self.annotation_frame
+        if frame is None:
+            return
+        if self.filters:
+            mask = frame.mask(self.filters)
+            self.filter_selectors = mask.to_bytes(frame.size, "little")
+            self.table.set_view(frame.rows(mask))
+        else:
+            self.filter_selectors = None
+            self.table.set_view(None)
+        self.show_filters()
+        self.search_table()  # Search results only cover the rows left in the table
+
+    def show_filters(self):
+        for chip in self.filter_chips.winfo_children():
+            chip.destroy()
+        for index, query_filter in enumerate(self.filters):
+            tk.Button(self.filter_chips, text=f"{describe_filter(query_filter)}  \u2715", relief="groove",
+                      command=lambda index=index: self.remove_filter(index)).pack(side="left", padx=2)
+        if self.filters:
+            self.filter_status_label.config(text=f"{self.table.row_count:,} of {len(self.annotations):,} rows")
+        else:
+            self.filter_status_label.config(text="")
+
+    # Rows that pass the current filters, in their original order
+    def rows_in_view(self, rows):
+        if self.filter_selectors is None:
+            return rows
+        return [row for row in rows if self.filter_selectors[row]]
+
+    def open_summary(self):
+        frame = self.annotation_frame
+        if frame is None:
+            messagebox.showinfo("Info", "Please load a GTF/GFF file first.")
+            return
+
+        dialog = tk.Toplevel(self)
+        dialog.title("Annotation Summary")
+        dialog.geometry("700x500")
+
+        groupings = {"Scaffold and feature": ("scaffold", "feature"), "Feature": ("feature",),
+                     "Scaffold": ("scaffold",), "Feature and strand": ("feature", "strand"),
+                     "Source": ("source",), "Gene": ("gene_name",)}
+        grouping = tk.StringVar(value="Scaffold and feature")
+        controls = tk.Frame(dialog)
+        controls.pack(fill="x", padx=5, pady=5)
+        tk.Label(controls, text="Group by:").pack(side="left")
+        ttk.Combobox(controls, textvariable=grouping, values=list(groupings), state="readonly",
+                     width=22).pack(side="left", padx=5)
+        status = tk.Label(controls, text="")
+        status.pack(side="left", padx=5)
+
+        columns = ("group", "count", "total", "mean")
+        tree = ttk.Treeview(dialog, columns=columns, show="headings")
+        for column, heading in zip(columns, ("Group", "Features", "Total Length (bp)", "Mean Length (bp)")):
+            tree.heading(column, text=heading)
+            tree.column(column, anchor="w" if column == "group" else "e")
+        scrollbar = ttk.Scrollbar(dialog, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+        tree.pack(fill="both", expand=True, padx=5, pady=5)
+
+        shown = {}  # Treeview item -> group values, for drilling down
+
+        def refresh(event=None):
+            by = groupings[grouping.get()]
+            mask = frame.mask(self.filters)
+            summary = frame.summary(mask, by)
+            tree.delete(*tree.get_children())
+            shown.clear()
+            for values, count, total, mean in summary[:SUMMARY_ROWS]:
+                item = tree.insert("", "end", values=(" / ".join(values), f"{count:,}", f"{total:,}", f"{mean:,.1f}"))
+                shown[item] = (by, values)
+            rows = sum(group[1] for group in summary)
+            note = f" (largest {SUMMARY_ROWS:,} shown)" if len(summary) > SUMMARY_ROWS else ""
+            status.config(text=f"{len(summary):,} groups, {rows:,} features{note}")
+
+        # Double-clicking a group narrows the table to it
+        def drill_down(event):
+            selected = tree.selection()
+            if selected and selected[0] in shown:
+                by, values = shown[selected[0]]
+                self.filters.extend(Filter(column, "=", (value,)) for column, value in zip(by, values))
+                self.apply_filters()
+                refresh()
+
+        grouping.trace_add("write", lambda *args: refresh())
+        tree.bind("<Double-1>", drill_down)
+        refresh()
+
+    #########################################
+    # Functions for performance diagnostics #
+    #########################################
+
+    def open_diagnostics(self):
+        if self.diagnostics is not None and self.diagnostics.winfo_exists():
+            self.diagnostics.lift()
+            return
+        self.diagnostics = DiagnosticsWindow(self)
+
+    def update_status_bar(self):
+        self.status_bar.config(text=status_text())
+        self.after(STATUS_INTERVAL_MS, self.update_status_bar)
+
+
 if __name__ == "__main__":
     app = GenomeAssemblyApp()
     app.mainloop()
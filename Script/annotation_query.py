@@ -0,0 +1,306 @@
+'''
+Column filters and grouped summaries over an AnnotationStore.
+
+A query such as "feature=CDS strand=+ scaffold=chr1 start>=1Mb end<=2Mb
+length>300" is a list of column filters that must all hold. Each filter
+becomes a boolean mask over every row, held as one big integer with a
+0x01 byte per matching row, and masks are combined with & | ^ on those
+integers. Masks are computed per byte plane: integer columns (category
+codes, start, end, length) are split into planes of their 1st, 2nd, ...
+byte, a comparison becomes one bytes.translate per plane, and planes are
+chained from the most significant one down. No Python code runs per row
+while filtering, so a query over millions of rows stays well under a
+second.
+
+Grouped summaries count rows and add up feature lengths per scaffold,
+feature type or any other categorical column, for the rows of a mask.
+
+    frame = frame_from_file("genome.gff")
+    rows = frame.select("feature=CDS strand=+ length>300")
+    for (scaffold, feature), count, total, mean in frame.summary(frame.mask("feature=CDS")):
+        ...
+'''
+
+#######################
+# Importing Libraries #
+#######################
+
+import re
+import shlex
+import sys
+from array import array
+from collections import Counter, namedtuple
+from itertools import compress
+from operator import add, sub
+
+from instrumentation import timed
+from parallel_parse import parse_annotations
+
+CATEGORICAL_COLUMNS = ("scaffold", "source", "feature", "strand", "frame", "product", "gene_name")
+NUMERIC_COLUMNS = ("start", "end", "length")
+OPERATORS = ("!=", ">=", "<=", "=", ">", "<", "~")  # Longest first, so ">=" is not read as ">"
+MAX_CODE_GROUPS = 16  # Above this many distinct high bytes, a set of codes is matched row by row
+DENSE_KEY_SPACE = 1 << 20  # Group totals kept in a list below this many possible groups
+
+FILTER_PATTERN = re.compile(r"^([A-Za-z_]+)(!=|>=|<=|=|>|<|~)(.*)$")
+SIZE_PATTERN = re.compile(r"^([0-9][0-9,_]*(?:\.[0-9]+)?)\s*([kmg]?)b?$", re.IGNORECASE)
+SIZE_UNITS = {"": 1, "k": 1_000, "m": 1_000_000, "g": 1_000_000_000}
+
+COLUMN_ALIASES = {"seqid": "scaffold", "chr": "scaffold", "type": "feature", "gene": "gene_name",
+                  "name": "gene_name", "len": "length"}
+
+# A column filter: column, operator (one of OPERATORS) and value. "~" is a
+# case-insensitive substring match; "=" and "!=" on a categorical column
+# take a comma separated list of values, or a tuple of exact values.
+Filter = namedtuple("Filter", ["column", "op", "value"])
+
+
+class QueryError(ValueError):
+    pass
+
+
+################################
+# Functions to parse the query #
+################################
+
+# "1500", "1,500", "1.5kb" or "2Mb" -> number of bases
+def parse_size(text):
+    match = SIZE_PATTERN.match(text.strip())
+    if match is None:
+        raise QueryError(f"'{text}' is not a number")
+    number = float(match.group(1).replace(",", "").replace("_", ""))
+    return int(round(number * SIZE_UNITS[match.group(2).lower()]))
+
+
+def parse_filter(text):
+    match = FILTER_PATTERN.match(text.strip())
+    if match is None:
+        raise QueryError(f"'{text}' is not a filter like feature=CDS or length>300")
+    column, op, value = match.groups()
+    column = COLUMN_ALIASES.get(column.lower(), column.lower())
+    if column in NUMERIC_COLUMNS:
+        if op == "~":
+            raise QueryError(f"'~' does not apply to the numeric column {column}")
+        return Filter(column, op, parse_size(value))
+    if column not in CATEGORICAL_COLUMNS:
+        raise QueryError(f"Unknown column '{column}'")
+    if op in (">", "<", ">=", "<="):
+        raise QueryError(f"'{op}' does not apply to the text column {column}")
+    return Filter(column, op, value)
+
+
+# Whitespace separated filters; values with spaces can be quoted (product~"photosystem II")
+def parse_filters(text):
+    try:
+        return [parse_filter(item) for item in shlex.split(text)]
+    except ValueError as e:
+        raise QueryError(str(e)) from None
+
+
+def describe_filter(query_filter):
+    column, op, value = query_filter
+    if isinstance(value, int):
+        value = f"{value:,}"
+    elif isinstance(value, tuple):
+        value = ",".join(value)
+    return f"{column} {op} {value}"
+
+
+##########################################
+# Byte-plane comparisons over whole rows #
+##########################################
+
+# Bytes of an integer array, least significant plane first, as many as
+# values up to largest need; values must be >= 0
+def _planes(values, largest):
+    size = values.itemsize
+    count = max(1, (largest.bit_length() + 7) // 8)
+    raw = values.tobytes()
+    if sys.byteorder == "little":
+        return [raw[k::size] for k in range(count)]
+    return [raw[size - 1 - k::size] for k in range(count)]
+
+
+def _table(predicate):
+    return bytes(1 if predicate(byte) else 0 for byte in range(256))
+
+
+def _mask(plane, table):
+    return int.from_bytes(plane.translate(table), "little")
+
+
+# Mask of rows whose value is >= threshold
+def _at_least(planes, threshold, all_rows):
+    if threshold <= 0:
+        return all_rows
+    if threshold >= 256 ** len(planes):
+        return 0
+    digits = threshold.to_bytes(len(planes), "little")
+    mask = _mask(planes[0], _table(lambda byte: byte >= digits[0]))
+    for plane, digit in zip(planes[1:], digits[1:]):
+        greater = _mask(plane, _table(lambda byte: byte > digit))
+        equal = _mask(plane, _table(lambda byte: byte == digit))
+        mask = greater | (equal & mask)
+    return mask
+
+
+# Mask of rows whose value is one of codes
+def _one_of(planes, codes):
+    codes = [code for code in codes if code < 256 ** len(planes)]
+    groups = {}  # High bytes -> set of low bytes
+    for code in codes:
+        groups.setdefault(code >> 8, set()).add(code & 0xFF)
+
+    mask = 0
+    for high, lows in groups.items():
+        group = _mask(planes[0], _table(lows.__contains__))
+        digits = high.to_bytes(len(planes) - 1, "little") if len(planes) > 1 else b""
+        for plane, digit in zip(planes[1:], digits):
+            group &= _mask(plane, _table(lambda byte: byte == digit))
+        mask |= group
+    return mask
+
+
+###############################
+# Defining Query Engine Class #
+###############################
+
+class AnnotationFrame:
+    # Byte planes of every column are cut once here, so building a frame over
+    # a few million rows takes about a second; the GUI does it in the loader thread
+    @timed("annotations.frame")
+    def __init__(self, store):
+        self.store = store
+        self.size = len(store)
+        self.all_rows = int.from_bytes(b"\x01" * self.size, "little")
+        self.spans = array("q", map(sub, store.end, store.start))  # Length - 1 of every row
+        self._planes = {}
+        for column in CATEGORICAL_COLUMNS:
+            self._planes[column] = _planes(store.column(column).codes, len(store.column(column).categories))
+        for column in NUMERIC_COLUMNS:
+            values = self._values(column)
+            # Planes need values >= 0; a negative coordinate or span sends the column down the slow path
+            if min(values, default=0) >= 0:
+                self._planes[column] = _planes(values, max(values, default=0))
+
+    def _values(self, column):
+        if column == "length":
+            return self.spans
+        if column in NUMERIC_COLUMNS:
+            return self.store.column(column)
+        return self.store.column(column).codes
+
+    # Mask of the rows matching one filter
+    def filter_mask(self, query_filter):
+        column, op, value = query_filter
+        if column in NUMERIC_COLUMNS:
+            return self._numeric_mask(column, op, value - 1 if column == "length" else value)
+
+        categories = self.store.column(column).lookup
+        if op == "~":
+            needle = value.lower()
+            codes = [code for name, code in categories.items() if needle in name.lower()]
+        else:
+            names = value if isinstance(value, tuple) else value.split(",")
+            codes = [categories[name] for name in names if name in categories]
+        mask = self._codes_mask(column, codes)
+        return mask ^ self.all_rows if op == "!=" else mask
+
+    def _codes_mask(self, column, codes):
+        if len({code >> 8 for code in codes}) <= MAX_CODE_GROUPS:
+            return _one_of(self._planes[column], codes)
+        table = bytearray(len(self.store.column(column).categories))
+        for code in codes:
+            table[code] = 1
+        return int.from_bytes(bytes(map(table.__getitem__, self._values(column))), "little")
+
+    def _numeric_mask(self, column, op, value):
+        planes = self._planes.get(column)
+        if planes is None:
+            compare = {">=": value.__le__, ">": value.__lt__, "<=": value.__ge__, "<": value.__gt__,
+                       "=": value.__eq__, "!=": value.__ne__}[op]
+            return int.from_bytes(bytes(map(compare, self._values(column))), "little")
+
+        def at_least(threshold):
+            return _at_least(planes, threshold, self.all_rows)
+
+        if op == ">=":
+            return at_least(value)
+        if op == ">":
+            return at_least(value + 1)
+        if op == "<=":
+            return at_least(value + 1) ^ self.all_rows
+        if op == "<":
+            return at_least(value) ^ self.all_rows
+        equal = at_least(value) ^ at_least(value + 1)
+        return equal if op == "=" else equal ^ self.all_rows
+
+    # Mask of the rows matching every filter; a query string is parsed first
+    @timed("query.filter")
+    def mask(self, filters):
+        if isinstance(filters, str):
+            filters = parse_filters(filters)
+        mask = self.all_rows
+        for query_filter in filters:
+            mask &= self.filter_mask(query_filter)
+            if not mask:
+                break
+        return mask
+
+    def count(self, mask):
+        return mask.bit_count()
+
+    # Row indexes of a mask, ascending
+    def rows(self, mask):
+        return array("I", compress(range(self.size), mask.to_bytes(self.size, "little")))
+
+    def select(self, filters):
+        return self.rows(self.mask(filters))
+
+    # Rows, summed feature length and mean length per group of the rows in
+    # mask (all rows if None), as (group values, count, total, mean), largest groups first
+    @timed("query.summary")
+    def summary(self, mask=None, by=("scaffold", "feature")):
+        for column in by:
+            if column not in CATEGORICAL_COLUMNS:
+                raise QueryError(f"Cannot group by '{column}'")
+        selectors = (self.all_rows if mask is None else mask).to_bytes(self.size, "little")
+        columns = [self.store.column(column) for column in by]
+
+        # One integer key per row mixes the category codes of the grouped columns
+        keys = compress(columns[0].codes, selectors)
+        key_space = len(columns[0].categories)
+        for column in columns[1:]:
+            width = len(column.categories)
+            keys = map(add, map(width.__mul__, keys), compress(column.codes, selectors))
+            key_space *= width
+        keys = array("q", keys)
+
+        counts = Counter(keys)
+        if key_space <= DENSE_KEY_SPACE:
+            totals = [0] * key_space
+        else:
+            totals = dict.fromkeys(counts, 0)
+        for key, span in zip(keys, compress(self.spans, selectors)):
+            totals[key] += span
+
+        summary = []
+        for key, count in counts.items():
+            values, rest = [], key
+            for column in reversed(columns):
+                rest, code = divmod(rest, len(column.categories))
+                values.append(column.categories[code])
+            total = totals[key] + count  # Spans are lengths - 1
+            summary.append((tuple(reversed(values)), count, total, total / count))
+        summary.sort(key=lambda group: (-group[1], group[0]))
+        return summary
+
+
+########################################
+# Function to load a frame from a file #
+########################################
+
+# Parse an annotation file straight into a frame
+def frame_from_file(file_path, progress=None, workers=1):
+    store, _, _ = parse_annotations(file_path, workers, progress, index=False, graph=False)
+    return AnnotationFrame(store)
@@ -0,0 +1,254 @@
+'''
+Parsing of genome annotation files (GTF/GFF).
+
+Kept free of any Tk code so the same parser can run on a worker thread
+or outside the graphical interface. Parsed rows are held in a columnar
+AnnotationStore: coordinates in integer arrays and repeated strings
+(scaffold, source, feature, ...) as integer codes into a category list.
+'''
+
+#######################
+# Importing Libraries #
+#######################
+
+import os
+import re
+import time
+from array import array
+from urllib.parse import unquote
+
+from compressed import open_input
+from instrumentation import recorder
+
+ANNOTATION_COLUMNS = ("Scaffold", "Source", "Feature", "Start", "End", "Strand", "Frame", "Product", "Gene Name")
+
+PROGRESS_INTERVAL = 4 * 1024 * 1024  # Characters between progress callbacks
+
+# GTF attribute: key "value"; (quoted values may contain ';') or key value;
+GTF_ATTRIBUTE = re.compile(r'\s*([^\s;]+)\s+(?:"([^"]*)"|([^;]*?))\s*(?:;|$)')
+
+
+##############################################
+# Function to parse the attribute column (9) #
+##############################################
+
+# GFF3 "key=value;key=v1,v2" or GTF 'key "value";' into a dict. Only the first
+# value of a repeated GTF key is kept; GFF3 values are percent-decoded.
+def parse_attributes(text):
+    text = text.strip()
+    first = text.split(";", 1)[0]
+    attributes = {}
+    if "=" in first and '"' not in first:  # GFF3
+        for item in text.split(";"):
+            key, separator, value = item.partition("=")
+            if separator:
+                attributes[key.strip()] = unquote(value) if "%" in value else value
+        return attributes
+
+    for match in GTF_ATTRIBUTE.finditer(text):
+        key = match.group(1)
+        if key not in attributes:
+            value = match.group(2)
+            attributes[key] = value if value is not None else match.group(3)
+    return attributes
+
+
+# Values of a multi-valued GFF3 attribute such as Parent
+def attribute_values(attributes, key):
+    value = attributes.get(key)
+    return value.split(",") if value else []
+
+
+# Single attribute straight from the column text (GFF3 key=value or GTF
+# key "value"), cheaper than parsing every attribute of the line
+def attribute_value(text, key):
+    for pattern, terminator in ((key + "=", ";"), (key + ' "', '"')):
+        position = text.find(pattern)
+        while position > 0 and text[position - 1] not in "; \t":  # Must start an attribute
+            position = text.find(pattern, position + 1)
+        if position >= 0:
+            start = position + len(pattern)
+            end = text.find(terminator, start)
+            value = text[start:] if end < 0 else text[start:end]
+            return unquote(value) if terminator == ";" and "%" in value else value
+    return None
+
+
+#############################################
+# Function to parse a single GTF/GFF record #
+#############################################
+
+def parse_annotation_line(line):
+    if line.startswith("#"):
+        return None
+
+    parts = line.strip().split("\t")
+    if len(parts) < 9:  # Ensure there's enough columns
+        return None
+
+    try:
+        start = int(parts[3])  # start position
+        end = int(parts[4])    # end position
+    except ValueError:
+        return None  # Coordinates must be integers
+
+    scaffold = parts[0]   # scaffold
+    source = parts[1]      # source
+    feature = parts[2]     # feature type (gene, exon, etc.)
+    strand = parts[6]      # strand (+ or -)
+    frame = parts[7]       # frame
+    attributes = parts[8]  # gene ID or gene name
+
+    # Gene name from the 'gene' attribute (GTF or GFF), then 'gene_name', then GFF 'Name'
+    gene_name = (attribute_value(attributes, "gene") or attribute_value(attributes, "gene_name")
+                 or attribute_value(attributes, "Name") or "Unknown")
+    product_out = attribute_value(attributes, "product") or "Unknown"
+
+    # The raw attribute text rides along for indexing, it is not kept in the store
+    return (scaffold, source, feature, start, end, strand, frame, product_out, gene_name, attributes)
+
+
+#############################################
+# Function to read a GTF/GFF file in chunks #
+#############################################
+
+def read_annotations(file_path, chunk_size=2000, progress=None):
+    total_size = os.path.getsize(file_path)
+    done = 0
+    next_report = PROGRESS_INTERVAL
+    chunk = []
+    # Reading and parsing time of each chunk, not counting the time the consumer holds it
+    clock, cpu, reported = time.perf_counter(), time.thread_time(), 0
+
+    # Plain, gzip and BGZF input; progress follows the position in the file on disk
+    file, position = open_input(file_path, text=True)
+    with file:
+        for line in file:
+            done += len(line)
+            row = parse_annotation_line(line)
+            if row is not None:
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    recorder.record("annotations.parse", time.perf_counter() - clock, time.thread_time() - cpu,
+                                    rows=len(chunk), bytes=done - reported)
+                    reported = done
+                    yield chunk
+                    chunk = []
+                    clock, cpu = time.perf_counter(), time.thread_time()
+            if progress and done >= next_report:
+                progress(min(position(), total_size), total_size)
+                next_report = done + PROGRESS_INTERVAL
+
+    if chunk:
+        recorder.record("annotations.parse", time.perf_counter() - clock, time.thread_time() - cpu,
+                        rows=len(chunk), bytes=done - reported)
+        yield chunk
+    if progress:
+        progress(total_size, total_size)
+
+
+##################################################
+# Column of repeated strings stored as int codes #
+##################################################
+
+class CategoricalColumn:
+    def __init__(self):
+        self.codes = array("I")
+        self.categories = []  # Code -> string
+        self.lookup = {}      # String -> code
+
+    def code_for(self, value):
+        code = self.lookup.get(value)
+        if code is None:
+            code = len(self.categories)
+            self.lookup[value] = code
+            self.categories.append(value)
+        return code
+
+    def append(self, value):
+        self.codes.append(self.code_for(value))
+
+    def __getitem__(self, index):
+        return self.categories[self.codes[index]]
+
+    def __len__(self):
+        return len(self.codes)
+
+
+######################################################
+# Columnar store holding every parsed annotation row #
+######################################################
+
+class AnnotationStore:
+    CATEGORICAL_COLUMNS = ("scaffold", "source", "feature", "strand", "frame", "product", "gene_name")
+    COLUMN_NAMES = ("scaffold", "source", "feature", "start", "end", "strand", "frame", "product", "gene_name")
+
+    def __init__(self):
+        for name in self.CATEGORICAL_COLUMNS:
+            setattr(self, name, CategoricalColumn())
+        self.start = array("q")
+        self.end = array("q")
+
+    # Rows are only counted once their last column is written, so a reader on
+    # another thread never sees a half appended row
+    def __len__(self):
+        return len(self.end)
+
+    # Takes a row as returned by parse_annotation_line
+    def append(self, row):
+        scaffold, source, feature, start, end, strand, frame, product, gene_name = row[:9]
+        self.scaffold.append(scaffold)
+        self.source.append(source)
+        self.feature.append(feature)
+        self.strand.append(strand)
+        self.frame.append(frame)
+        self.product.append(product)
+        self.gene_name.append(gene_name)
+        self.start.append(start)
+        self.end.append(end)
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    # Append every row of another store (e.g. one parsed by a worker process),
+    # translating its category codes into this store's
+    def merge(self, other):
+        for name in self.CATEGORICAL_COLUMNS:
+            column, theirs = getattr(self, name), getattr(other, name)
+            codes = [column.code_for(value) for value in theirs.categories]
+            column.codes.extend(map(codes.__getitem__, theirs.codes))
+        self.start.extend(other.start)
+        self.end.extend(other.end)  # Last, so the rows only count once complete
+
+    def column(self, name):
+        return getattr(self, name)
+
+    # Values for one row in ANNOTATION_COLUMNS order
+    def row(self, index):
+        return (self.scaffold[index], self.source[index], self.feature[index],
+                self.start[index], self.end[index], self.strand[index],
+                self.frame[index], self.product[index], self.gene_name[index])
+
+
+###########################################################
+# Function to summarise a GTF/GFF file without storing it #
+###########################################################
+
+def summarize_annotations(file_path, progress=None):
+    features = {}
+    scaffolds = set()
+    rows = 0
+    for chunk in read_annotations(file_path, chunk_size=20000, progress=progress):
+        for row in chunk:
+            rows += 1
+            scaffolds.add(row[0])
+            counts = features.setdefault(row[2], [0, 0])
+            counts[0] += 1
+            counts[1] += row[4] - row[3] + 1
+    return {
+        "rows": rows,
+        "scaffolds": len(scaffolds),
+        "features": {feature: {"count": count, "total_length": length}
+                     for feature, (count, length) in sorted(features.items())},
+    }
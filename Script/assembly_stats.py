@@ -0,0 +1,260 @@
+'''
+Streaming assembly statistics.
+
+Base composition and N-gap runs are counted per scaffold while the
+sequence streams past (during .fai indexing, or in a single read of the
+file), so no sequence is ever kept in memory. Contiguity metrics (Nx/Lx,
+auN) are then derived from the per-scaffold lengths, and contigs are
+obtained by splitting scaffolds at N-gaps of at least min_gap bases.
+
+A genome_tracks.TrackBuilder can be passed along to bin the composition
+of every scaffold from the same blocks.
+'''
+
+#######################
+# Importing Libraries #
+#######################
+
+import os
+import re
+from array import array
+
+from compressed import open_input
+from instrumentation import timed
+
+GAP_PATTERN = re.compile(rb"[Nn]+")
+FLUSH_SIZE = 1024 * 1024  # Bytes of sequence buffered before counting
+MIN_GAP = 10              # Shortest N run that splits a scaffold into contigs
+
+
+##################################
+# Per-scaffold statistics record #
+##################################
+
+class ScaffoldStats:
+    __slots__ = ("name", "length", "a", "c", "g", "t", "n", "soft_masked",
+                 "gap_count", "gap_length", "contig_lengths")
+
+    def __init__(self, name):
+        self.name = name
+        self.length = 0
+        self.a = self.c = self.g = self.t = self.n = 0
+        self.soft_masked = 0  # Lowercase bases
+        self.gap_count = 0    # N runs of at least min_gap bases
+        self.gap_length = 0
+        self.contig_lengths = array("q")
+
+    @property
+    def acgt(self):
+        return self.a + self.c + self.g + self.t
+
+    # GC fraction of called bases (N and other IUPAC codes excluded)
+    @property
+    def gc_fraction(self):
+        return (self.g + self.c) / self.acgt if self.acgt else 0.0
+
+
+#############################################
+# Collector fed with sequence as it streams #
+#############################################
+
+class StatsCollector:
+    def __init__(self, min_gap=MIN_GAP, tracks=None):
+        self.min_gap = min_gap
+        self.tracks = tracks  # Optional TrackBuilder fed the same blocks
+        self.scaffolds = []
+        self._current = None
+        self._pending = []
+        self._pending_size = 0
+        self._run_start = None  # Open N run that may continue into the next block
+        self._run_end = 0
+        self._contig_start = 0
+
+    def start_scaffold(self, name):
+        self._finish_scaffold()
+        self._current = ScaffoldStats(name)
+        if self.tracks:
+            self.tracks.start_scaffold(name)
+        self._run_start = None
+        self._contig_start = 0
+
+    # Data may contain line breaks, they are not counted as bases. Data that
+    # arrives before the first scaffold is started is dropped.
+    def add_sequence(self, data):
+        self._pending.append(data)
+        self._pending_size += len(data)
+        if self._pending_size >= FLUSH_SIZE:
+            self._flush()
+
+    def finish(self):
+        self._finish_scaffold()
+        return AssemblyStats(self.scaffolds, self.min_gap)
+
+    def _flush(self):
+        if not self._pending or self._current is None:
+            self._pending, self._pending_size = [], 0
+            return
+        block = b"".join(self._pending).replace(b"\n", b"").replace(b"\r", b"")
+        self._pending, self._pending_size = [], 0
+        if self.tracks:
+            self.tracks.add_block(block)
+
+        stats = self._current
+        offset = stats.length
+        upper = [block.count(base) for base in b"ACGTN"]
+        lower = [block.count(base) for base in b"acgtn"]
+        stats.a += upper[0] + lower[0]
+        stats.c += upper[1] + lower[1]
+        stats.g += upper[2] + lower[2]
+        stats.t += upper[3] + lower[3]
+        stats.n += upper[4] + lower[4]
+        stats.soft_masked += sum(lower[:4])
+        stats.length += len(block)
+
+        for match in GAP_PATTERN.finditer(block):
+            run_start, run_end = offset + match.start(), offset + match.end()
+            if self._run_start is not None and run_start == self._run_end:
+                self._run_end = run_end  # Run continues across the block boundary
+                continue
+            self._close_run()
+            self._run_start, self._run_end = run_start, run_end
+
+    def _close_run(self):
+        if self._run_start is None:
+            return
+        stats = self._current
+        if self._run_end - self._run_start >= self.min_gap:
+            stats.gap_count += 1
+            stats.gap_length += self._run_end - self._run_start
+            if self._run_start > self._contig_start:
+                stats.contig_lengths.append(self._run_start - self._contig_start)
+            self._contig_start = self._run_end
+        self._run_start = None
+
+    def _finish_scaffold(self):
+        if self._current is None:
+            return
+        self._flush()
+        self._close_run()
+        stats = self._current
+        if stats.length > self._contig_start:
+            stats.contig_lengths.append(stats.length - self._contig_start)
+        self.scaffolds.append(stats)
+        self._current = None
+
+
+#####################################
+# Whole assembly statistics summary #
+#####################################
+
+def contiguity(lengths, total=None):
+    # Nx and Lx for x = 10..90 plus auN, from sequence lengths
+    lengths = sorted(lengths, reverse=True)
+    total = sum(lengths) if total is None else total
+    nx, lx = {}, {}
+    thresholds = list(range(10, 100, 10))
+    cumulative = 0
+    for count, length in enumerate(lengths, start=1):
+        cumulative += length
+        while thresholds and cumulative * 100 >= thresholds[0] * total:
+            nx[thresholds[0]], lx[thresholds[0]] = length, count
+            thresholds.pop(0)
+        if not thresholds:
+            break
+    aun = sum(length * length for length in lengths) / total if total else 0.0
+    return nx, lx, aun
+
+
+class AssemblyStats:
+    def __init__(self, scaffolds, min_gap=MIN_GAP):
+        self.scaffolds = scaffolds
+        self.min_gap = min_gap
+        self.by_name = {stats.name: stats for stats in scaffolds}
+
+    def __len__(self):
+        return len(self.scaffolds)
+
+    def summary(self):
+        lengths = [stats.length for stats in self.scaffolds]
+        total = sum(lengths)
+        if not lengths:
+            return {"total_length": 0, "scaffolds": 0}
+
+        acgt = sum(stats.acgt for stats in self.scaffolds)
+        gc = sum(stats.g + stats.c for stats in self.scaffolds)
+        n = sum(stats.n for stats in self.scaffolds)
+        largest = max(self.scaffolds, key=lambda stats: stats.length)
+        smallest = min(self.scaffolds, key=lambda stats: stats.length)
+        nx, lx, aun = contiguity(lengths, total)
+
+        contig_lengths = [length for stats in self.scaffolds for length in stats.contig_lengths]
+        contig_nx, contig_lx, contig_aun = contiguity(contig_lengths)
+
+        summary = {
+            "total_length": total,
+            "scaffolds": len(lengths),
+            "largest_scaffold": largest.name,
+            "largest_length": largest.length,
+            "smallest_scaffold": smallest.name,
+            "smallest_length": smallest.length,
+            "aun": aun,
+            "gc_fraction": gc / acgt if acgt else 0.0,
+            "n_fraction": n / total if total else 0.0,
+            "soft_masked_fraction": sum(stats.soft_masked for stats in self.scaffolds) / total if total else 0.0,
+            "gaps": sum(stats.gap_count for stats in self.scaffolds),
+            "gap_length": sum(stats.gap_length for stats in self.scaffolds),
+            "min_gap": self.min_gap,
+            "contigs": len(contig_lengths),
+            "contig_length": sum(contig_lengths),
+            "largest_contig": max(contig_lengths, default=0),
+            "contig_aun": contig_aun,
+        }
+        for x in range(10, 100, 10):
+            summary[f"n{x}"], summary[f"l{x}"] = nx.get(x, 0), lx.get(x, 0)
+            summary[f"contig_n{x}"], summary[f"contig_l{x}"] = contig_nx.get(x, 0), contig_lx.get(x, 0)
+        return summary
+
+
+##########################################
+# Functions to compute stats in one pass #
+##########################################
+
+@timed("fasta.stats")
+def stats_from_fasta(fasta_path, min_gap=MIN_GAP, progress=None, progress_interval=8 * 1024 * 1024, tracks=None):
+    collector = StatsCollector(min_gap, tracks)
+    total_size = os.path.getsize(fasta_path)
+    done = 0
+    next_report = progress_interval
+
+    file, position = open_input(fasta_path)
+    with file:
+        for line in file:
+            done += len(line)
+            if line.startswith(b">"):
+                header = line[1:].split()
+                collector.start_scaffold(header[0].decode() if header else "")
+            else:
+                collector.add_sequence(line)  # Ignored before the first header
+            if progress and done >= next_report:
+                progress(min(position(), total_size), total_size)
+                next_report = done + progress_interval
+
+    if progress:
+        progress(total_size, total_size)
+    return collector.finish()
+
+
+# Same statistics read back through an IndexedFasta, scaffold by scaffold
+@timed("fasta.stats")
+def stats_from_index(fasta, min_gap=MIN_GAP, progress=None, chunk_size=FLUSH_SIZE, tracks=None):
+    collector = StatsCollector(min_gap, tracks)
+    total = sum(fasta.lengths.values())
+    done = 0
+    for name in fasta.names():
+        collector.start_scaffold(name)
+        for chunk in fasta.iter_chunks(name, chunk_size):
+            collector.add_sequence(chunk.encode("ascii"))
+            done += len(chunk)
+            if progress:
+                progress(done, total)
+    return collector.finish()
@@ -0,0 +1,101 @@
+'''
+Background execution of long running file loads.
+
+A BackgroundTask runs a loader on a worker thread and hands its results
+back through a queue, which the Tk main loop drains with after(). Loaders
+report progress through task.report_progress(done, total); that call is
+also where a pending cancellation is raised inside the worker.
+'''
+
+#######################
+# Importing Libraries #
+#######################
+
+import queue
+import threading
+
+from instrumentation import recorder
+
+
+class LoadCancelled(Exception):
+    pass
+
+
+############################################
+# Class to run a loader on a worker thread #
+############################################
+
+class BackgroundTask:
+    def __init__(self, target, max_pending=64, name="task"):
+        self.target = target  # Called as target(task) on the worker thread
+        self.name = name      # Timed as the span "task.<name>" while instrumentation is on
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.cancel_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.finished = False
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def _run(self):
+        try:
+            with recorder.span(f"task.{self.name}"):
+                result = recorder.profiled(self.target, self)  # Profiled while a capture is on
+            self._put(("done", result))
+        except LoadCancelled:
+            self._put(("cancelled", None), force=True)
+        except Exception as e:
+            self._put(("error", e), force=True)
+
+    # Blocks while the UI is behind, but never past a cancellation
+    def _put(self, message, force=False):
+        while True:
+            if self.cancel_event.is_set() and not force:
+                raise LoadCancelled()
+            try:
+                self.queue.put(message, timeout=0.1)
+                return
+            except queue.Full:
+                if force:
+                    # Drop stale chunks so the final message always gets through
+                    try:
+                        self.queue.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    ##################################
+    # Helpers used inside the worker #
+    ##################################
+
+    def report_progress(self, done, total):
+        if self.cancel_event.is_set():
+            raise LoadCancelled()
+        self._put(("progress", (done, total)))
+
+    def send(self, chunk):
+        self._put(("chunk", chunk))
+
+    ######################################
+    # Helper used by the Tk polling loop #
+    ######################################
+
+    def poll(self, max_messages=50):
+        messages = []
+        while len(messages) < max_messages:
+            try:
+                message = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            messages.append(message)
+            if message[0] in ("done", "cancelled", "error"):
+                self.finished = True
+                break
+        return messages
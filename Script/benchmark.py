@@ -0,0 +1,453 @@
+'''
+Benchmarks of every hot path of GeneScoPy on synthetic data.
+
+Generates a seeded assembly and annotation of a chosen scale (or reuses
+one already generated in --data-dir) and times, without a display, the
+work the GUI and the command line do on them: FASTA indexing with the
+statistics and track pass, annotation parsing with the search index and
+feature graph, interval and query indexes, free-text search, column
+filters and summaries, region highlighting (nearest feature plus the
+sequence fetch the viewer makes), batch and transcript export, motif
+search, the packed in-memory store and the on-disk cache.
+
+Each benchmark records wall and CPU time (best of --repeat runs), the
+change in resident memory, the peak resident memory while it ran and,
+with --trace-memory, the peak of Python allocations. Results are written
+as JSON together with the machine, Python version, seed and scale, and a
+later run can be compared with a saved one to catch regressions.
+
+Examples:
+    python Script/benchmark.py --scale tauri --output bench.json
+    python Script/benchmark.py --scale medium --data-dir /scratch/bench --repeat 3 --output medium.json
+    python Script/benchmark.py --genome-size 2Gb --scaffolds 500 --features 3000000 --only fasta,annotations
+    python Script/benchmark.py --scale small --compare baseline.json --threshold 0.2
+'''
+
+#######################
+# Importing Libraries #
+#######################
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from annotation_query import AnnotationFrame
+from annotations import AnnotationStore, read_annotations
+from assembly_stats import StatsCollector, stats_from_fasta
+from cache import FileCache
+from export import export_regions, regions_from_annotations
+from feature_graph import FeatureGraph, export_transcripts
+from fasta_index import IndexedFasta
+from genome_tracks import TrackBuilder, gene_density
+from instrumentation import megabytes, peak_rss_bytes, recorder, reset_peak_rss, rss_bytes
+from interval_index import IntervalIndex
+from motif_search import search_fasta
+from packed_sequence import PackedFasta
+from parallel_parse import parse_annotations, scan_fasta
+from search_index import SearchIndex
+from synthetic_data import SCALES, scaffold_lengths, write_annotation, write_fasta
+
+FORMAT_VERSION = 1
+LATENCY_SAMPLES = 200     # Calls timed for each per-request benchmark
+NOISE_FLOOR = 0.005       # Seconds below which a slowdown is not reported as a regression
+VIEW_WIDTH = 10_000       # Bases the viewer fetches when a hit is highlighted
+SPAN_CALLS = 1_000_000    # Disabled spans timed for the instrumentation overhead
+MOTIFS = (("EcoRI", "GAATTC"), ("TATA", "TATAWAWR"), ("CAAT", "GGCCAATCT"))
+FILTERS = ("feature=CDS", "feature=CDS strand=+ length>300", "start>=1Mb end<=5Mb",
+           "product~kinase", "scaffold=scaffold_1 feature=exon,CDS")
+SUMMARIES = (("scaffold", "feature"), ("feature", "strand"), ("product",))
+
+
+###################################
+# Defining Benchmark Runner Class #
+###################################
+
+class Benchmark:
+    def __init__(self, repeat=1, trace_memory=False, only=None):
+        self.repeat = max(1, repeat)
+        self.trace_memory = trace_memory
+        self.only = only  # Name prefixes to run, None for all
+        self.results = []
+
+    def wanted(self, name):
+        return self.only is None or any(name.startswith(prefix) for prefix in self.only)
+
+    # Time function() --repeat times; the value of the last run is returned.
+    # items is the amount of work done (bases, rows, ...) for the rate column.
+    def run(self, name, function, items=None, unit=None):
+        if not self.wanted(name):
+            return None
+        runs, value = [], None
+        for _ in range(self.repeat):
+            value = None
+            gc.collect()
+            peak_known = reset_peak_rss()  # Each benchmark gets its own peak where the kernel allows
+            rss_before = rss_bytes()
+            if self.trace_memory:
+                tracemalloc.start()
+            cpu, wall = time.process_time(), time.perf_counter()
+            value = function()
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            traced = tracemalloc.get_traced_memory()[1] if self.trace_memory else None
+            if self.trace_memory:
+                tracemalloc.stop()
+            runs.append({"seconds": wall, "cpu_seconds": cpu, "rss_delta_mb": megabytes(rss_bytes() - rss_before),
+                         "peak_rss_mb": megabytes(peak_rss_bytes()) if peak_known else None,
+                         "traced_peak_mb": megabytes(traced) if traced is not None else None})
+
+        best = min(runs, key=lambda run: run["seconds"])
+        record = {"name": name, **best, "runs": [round(run["seconds"], 6) for run in runs]}
+        if items is not None:
+            record.update(items=items, unit=unit, rate=round(items / best["seconds"], 1) if best["seconds"] else None)
+        self._add(record)
+        return value
+
+    # Per-request latency of function(argument) over a list of arguments
+    def latencies(self, name, function, arguments):
+        if not self.wanted(name) or not arguments:
+            return
+        function(arguments[0])  # Warm caches and lazily built state
+        times = []
+        for argument in arguments:
+            start = time.perf_counter()
+            function(argument)
+            times.append(time.perf_counter() - start)
+        times.sort()
+        self._add({"name": name, "seconds": statistics.fmean(times), "calls": len(times),
+                   "p50_seconds": times[len(times) // 2], "p95_seconds": times[int(len(times) * 0.95)],
+                   "max_seconds": times[-1]})
+
+    def _add(self, record):
+        for key in ("seconds", "cpu_seconds", "p50_seconds", "p95_seconds", "max_seconds"):
+            if key in record:
+                record[key] = round(record[key], 6)
+        self.results.append(record)
+        line = f"{record['name']:<32} {record['seconds']:>10.4f} s"
+        if "rate" in record and record["rate"] is not None:
+            line += f"  {record['rate']:>14,.0f} {record['unit']}/s"
+        if "p95_seconds" in record:
+            line += f"  p95 {record['p95_seconds'] * 1000:.2f} ms"
+        if record.get("peak_rss_mb") is not None:
+            line += f"  peak {record['peak_rss_mb']:,.0f} MB"
+        print(line, file=sys.stderr)
+
+
+######################################
+# Functions to prepare the test data #
+######################################
+
+# "13000000", "13Mb" or "2.5Gb" -> bases
+def parse_amount(text):
+    text = text.strip().lower().rstrip("b")
+    factor = {"k": 1_000, "m": 1_000_000, "g": 1_000_000_000}.get(text[-1:], 1)
+    if factor > 1:
+        text = text[:-1]
+    return int(float(text.replace(",", "").replace("_", "")) * factor)
+
+
+# Files of the requested scale in directory, generated unless a manifest shows they already are
+def prepare_data(directory, params):
+    manifest_path = os.path.join(directory, "manifest.json")
+    fasta_path = os.path.join(directory, "genome.fa")
+    annotation_path = os.path.join(directory, f"annotation.{params['annotation_format']}")
+    try:
+        with open(manifest_path) as file:
+            manifest = json.load(file)
+        if manifest["params"] == params and os.path.exists(fasta_path) and os.path.exists(annotation_path):
+            print(f"[data] reusing {directory}", file=sys.stderr)
+            return fasta_path, annotation_path, manifest
+    except (OSError, ValueError, KeyError):
+        pass
+
+    def report(label):
+        def progress(done, total):
+            print(f"\r[data] {label} {done / max(1, total):.0%}", end="", file=sys.stderr)
+        return progress
+
+    start = time.perf_counter()
+    lengths = scaffold_lengths(params["genome_size"], params["scaffolds"], params["seed"])
+    write_fasta(fasta_path, lengths, params["seed"], params["gc"], progress=report("FASTA"))
+    print(file=sys.stderr)
+    lines = write_annotation(annotation_path, lengths, params["features"], params["seed"],
+                             params["annotation_format"], progress=report("annotation"))
+    print(file=sys.stderr)
+    manifest = {"params": params, "annotation_lines": lines, "generate_seconds": round(time.perf_counter() - start, 2)}
+    with open(manifest_path, "w") as file:
+        json.dump(manifest, file, indent=2)
+    return fasta_path, annotation_path, manifest
+
+
+############################
+# Functions for each stage #
+############################
+
+def index_fasta(fasta_path):
+    fai_path = fasta_path + ".fai"
+    if os.path.exists(fai_path):
+        os.unlink(fai_path)
+    builder = TrackBuilder()
+    collector = StatsCollector(tracks=builder)
+    fasta = IndexedFasta(fasta_path, stats=collector)
+    return fasta, collector.finish(), builder.finish()
+
+
+# The GUI's loader: parse, search index and feature graph in one pass, with the time of each stage
+def load_annotations(annotation_path, stages):
+    store, search_index, graph = AnnotationStore(), SearchIndex(), FeatureGraph()
+    stages.update(parse=0.0, search_index=0.0, feature_graph=0.0, store=0.0)
+    clock = time.perf_counter()
+    for chunk in read_annotations(annotation_path, chunk_size=20000):
+        now = time.perf_counter()
+        stages["parse"] += now - clock
+        search_index.add_rows(len(store), chunk)
+        clock, now = now, time.perf_counter()
+        stages["search_index"] += now - clock
+        graph.add_rows(len(store), chunk)
+        clock, now = now, time.perf_counter()
+        stages["feature_graph"] += now - clock
+        store.extend(chunk)
+        clock = time.perf_counter()
+        stages["store"] += clock - now
+    now = time.perf_counter()
+    search_index.finalize()
+    graph.finalize()
+    stages["finalize"] = time.perf_counter() - now
+    return store, search_index, graph
+
+
+def search_queries(store, rng, count):
+    queries = []
+    for _ in range(count):
+        row = store.row(rng.randrange(len(store)))
+        gene, product = row[8], row[7]
+        queries.append(rng.choice((gene, gene[:-1], product.split()[0], f"feature:{row[2]} {gene}",
+                                   f"scaffold:{row[0]} product:{product.split()[0]}")))
+    return queries
+
+
+# Positions to highlight: near annotated rows, as clicking search hits does, and anywhere
+def highlight_positions(fasta, store, rng, count):
+    names = fasta.names()
+    positions = []
+    for number in range(count):
+        if number % 2 and len(store):
+            row = store.row(rng.randrange(len(store)))
+            positions.append((row[0], row[3], row[4]))
+        else:
+            name = rng.choice(names)
+            start = rng.randrange(fasta.lengths[name])
+            positions.append((name, start + 1, start + 1))
+    return positions
+
+
+def highlight(fasta, interval_index, position):
+    scaffold, start, end = position
+    interval_index.nearest(scaffold, start, end)
+    middle = (start + end) // 2
+    view_start = max(0, middle - VIEW_WIDTH // 2)
+    return fasta.fetch(scaffold, view_start, min(fasta.lengths[scaffold], view_start + VIEW_WIDTH))
+
+
+###############################
+# Function to run every bench #
+###############################
+
+def run_benchmarks(bench, fasta_path, annotation_path, workers, scratch, seed):
+    rng = random.Random(seed)
+
+    # Benches left out by --only still build what later ones need, untimed
+    fasta, stats, tracks = (bench.run("fasta.index", lambda: index_fasta(fasta_path),
+                                      items=os.path.getsize(fasta_path), unit="bytes") or index_fasta(fasta_path))
+    genome_size = sum(fasta.lengths.values())
+    # Files below parallel_parse.MIN_PARALLEL_SIZE are scanned serially whatever the worker count
+    for count in sorted({1, workers}):
+        bench.run(f"fasta.scan.workers_{count}", lambda: scan_fasta(fasta_path, workers=count),
+                  items=os.path.getsize(fasta_path), unit="bytes")
+    bench.run("fasta.reopen", lambda: IndexedFasta(fasta_path).close())
+    bench.run("stats.from_fasta", lambda: stats_from_fasta(fasta_path), items=genome_size, unit="bases")
+    bench.run("stats.summary", stats.summary)
+
+    stages = {}
+    loaded = bench.run("annotations.load", lambda: load_annotations(annotation_path, stages),
+                       items=os.path.getsize(annotation_path), unit="bytes")
+    if loaded is not None:
+        bench.results[-1]["stages"] = {key: round(value, 4) for key, value in stages.items()}
+    store, search_index, graph = loaded or load_annotations(annotation_path, stages)
+    rows = len(store)
+    for count in sorted({1, workers}):
+        bench.run(f"annotations.parse_all.workers_{count}", lambda: parse_annotations(annotation_path, workers=count),
+                  items=os.path.getsize(annotation_path), unit="bytes")
+
+    interval_index = (bench.run("annotations.interval_index", lambda: IntervalIndex(store), items=rows, unit="rows")
+                      or IntervalIndex(store))
+    bench.run("annotations.gene_density", lambda: gene_density(store, graph), items=rows, unit="rows")
+    frame = bench.run("annotations.frame", lambda: AnnotationFrame(store), items=rows, unit="rows") or AnnotationFrame(store)
+
+    bench.latencies("search.query", search_index.search, search_queries(store, rng, LATENCY_SAMPLES))
+    bench.latencies("highlight.nearest_fetch", lambda position: highlight(fasta, interval_index, position),
+                    highlight_positions(fasta, store, rng, LATENCY_SAMPLES))
+    for number, text in enumerate(FILTERS):
+        bench.run(f"query.filter.{number}", lambda: frame.count(frame.mask(text)), items=rows, unit="rows")
+    cds = frame.mask("feature=CDS")
+    for by in SUMMARIES:
+        bench.run(f"query.summary.{'_'.join(by)}", lambda: frame.summary(cds, by), items=frame.count(cds), unit="rows")
+
+    # Exports are written to scratch and deleted; their size goes in the record
+    export_path = os.path.join(scratch, "export.out")
+    cds_rows = frame.rows(cds)
+    for count in sorted({1, workers}):
+        bench.run(f"export.regions.workers_{count}",
+                  lambda: export_regions(fasta, regions_from_annotations(store, cds_rows), export_path, workers=count),
+                  items=len(cds_rows), unit="regions")
+    for kind in ("mrna", "protein"):
+        bench.run(f"export.transcripts.{kind}", lambda: export_transcripts(fasta, store, graph, export_path, kind),
+                  items=len(graph.transcripts), unit="transcripts")
+    if os.path.exists(export_path):
+        os.unlink(export_path)
+
+    for count in sorted({1, workers}):
+        bench.run(f"motif.search.workers_{count}", lambda: search_fasta(fasta, MOTIFS, workers=count),
+                  items=genome_size, unit="bases")
+
+    packed = bench.run("packed.load", lambda: PackedFasta.from_fasta(fasta), items=genome_size, unit="bases")
+    if packed is not None:
+        bench.results[-1]["packed_mb"] = megabytes(packed.memory_size())
+        bench.latencies("packed.highlight_fetch", lambda position: highlight(packed, interval_index, position),
+                        highlight_positions(packed, store, rng, LATENCY_SAMPLES))
+        del packed
+
+    cache = FileCache(directory=os.path.join(scratch, "cache"), max_bytes=1 << 62)
+    value = (store, search_index, interval_index, graph, gene_density(store, graph))
+    bench.run("cache.put_annotations", lambda: cache.put("annotations", annotation_path, value))
+    bench.run("cache.get_annotations", lambda: cache.get("annotations", annotation_path))
+    bench.run("cache.put_fasta", lambda: cache.put("fasta", fasta_path, (list(fasta.entries.values()), stats, tracks)))
+    bench.run("cache.get_fasta", lambda: cache.get("fasta", fasta_path))
+    cache.clear()
+    fasta.close()
+
+    # What instrumented code pays per stage while instrumentation is off
+    def disabled_spans():
+        enabled, recorder.enabled = recorder.enabled, False
+        for _ in range(SPAN_CALLS):
+            with recorder.span("benchmark", rows=1):
+                pass
+        recorder.enabled = enabled
+
+    bench.run("instrumentation.disabled_span", disabled_spans, items=SPAN_CALLS, unit="spans")
+
+
+######################################
+# Functions for metadata and results #
+######################################
+
+def git_revision():
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        return result.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def metadata(params, manifest, args):
+    return {"format_version": FORMAT_VERSION, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "revision": git_revision(), "python": platform.python_version(),
+            "implementation": platform.python_implementation(), "platform": platform.platform(),
+            "machine": platform.machine(), "cpus": os.cpu_count(), "workers": args.workers,
+            "repeat": args.repeat, "trace_memory": args.trace_memory, "params": params,
+            "annotation_lines": manifest.get("annotation_lines"), "generate_seconds": manifest.get("generate_seconds")}
+
+
+# Benchmarks slower than the baseline by more than threshold (a fraction), as (name, baseline, current)
+def compare(results, baseline, threshold):
+    previous = {record["name"]: record["seconds"] for record in baseline["results"]}
+    regressions = []
+    print(f"\n{'benchmark':<32} {'baseline':>10} {'current':>10} {'change':>8}", file=sys.stderr)
+    for record in results:
+        before = previous.get(record["name"])
+        if before is None:
+            continue
+        change = (record["seconds"] - before) / before if before else 0.0
+        regressed = change > threshold and record["seconds"] - before > NOISE_FLOOR
+        print(f"{record['name']:<32} {before:>10.4f} {record['seconds']:>10.4f} {change:>+8.1%}"
+              f"{'  REGRESSION' if regressed else ''}", file=sys.stderr)
+        if regressed:
+            regressions.append((record["name"], before, record["seconds"]))
+    return regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="benchmark", description="Time GeneScoPy's hot paths on synthetic data.")
+    parser.add_argument("--scale", choices=sorted(SCALES, key=lambda name: SCALES[name][0]), default="tauri",
+                        help="Ready-made size: " + ", ".join(f"{name} ({size / 1e6:,.0f} Mb, {features:,} lines)"
+                                                             for name, (size, _, features) in SCALES.items()))
+    parser.add_argument("--genome-size", type=parse_amount, help="Assembly size, e.g. 250Mb or 20Gb (overrides --scale)")
+    parser.add_argument("--scaffolds", type=int, help="Number of scaffolds (overrides --scale)")
+    parser.add_argument("--features", type=parse_amount, help="Approximate annotation lines (overrides --scale)")
+    parser.add_argument("--gc", type=float, default=0.45, help="GC fraction of the generated sequence")
+    parser.add_argument("--annotation-format", choices=("gff3", "gtf"), default="gff3", help="Annotation format")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of the generator and of sampled queries")
+    parser.add_argument("--data-dir", help="Keep generated data here and reuse it in later runs (default: temporary)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes for parallel paths")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs of each benchmark; the fastest is kept")
+    parser.add_argument("--trace-memory", action="store_true", help="Record peak Python allocations (slower)")
+    parser.add_argument("--only", help="Comma separated benchmark name prefixes to run, e.g. fasta,query")
+    parser.add_argument("--output", "-o", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Slowdown (fraction) above which --compare reports a regression and exits with 1")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    genome_size, scaffolds, features = SCALES[args.scale]
+    params = {"genome_size": args.genome_size or genome_size, "scaffolds": args.scaffolds or scaffolds,
+              "features": args.features or features, "gc": args.gc, "seed": args.seed,
+              "annotation_format": args.annotation_format}
+
+    temporary = args.data_dir is None
+    data_dir = tempfile.mkdtemp(prefix="genescopy-bench-") if temporary else args.data_dir
+    os.makedirs(data_dir, exist_ok=True)
+    scratch = tempfile.mkdtemp(prefix=".scratch-", dir=data_dir)
+    bench = Benchmark(args.repeat, args.trace_memory, args.only.split(",") if args.only else None)
+    try:
+        fasta_path, annotation_path, manifest = prepare_data(data_dir, params)
+        run_benchmarks(bench, fasta_path, annotation_path, max(1, args.workers), scratch, args.seed)
+    finally:
+        shutil.rmtree(data_dir if temporary else scratch, ignore_errors=True)
+
+    results = {"metadata": metadata(params, manifest, args), "results": bench.results}
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"[done] results written to {args.output}", file=sys.stderr)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        if baseline.get("metadata", {}).get("params") != params:
+            print("[warning] the baseline was run on data of another scale or seed", file=sys.stderr)
+        regressions = compare(bench.results, baseline, args.threshold)
+        if regressions:
+            print(f"[failed] {len(regressions)} benchmark(s) slower than the baseline by more than "
+                  f"{args.threshold:.0%}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
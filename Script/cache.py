@@ -0,0 +1,131 @@
+'''
+Persistent on-disk cache of parsed files.
+
+Parsed annotation columns, their search and interval indexes, FASTA
+index entries and assembly statistics are pickled into a cache directory
+so reopening a file skips parsing. Entries are keyed by a fingerprint of
+the input (absolute path, size, modification time and a hash of sampled
+content), so an edited file simply misses the cache. The directory is
+kept under a size budget by evicting the least recently used entries.
+
+The cache directory defaults to ~/.cache/genescopy and can be moved with
+GENESCOPY_CACHE_DIR; GENESCOPY_CACHE_MAX_MB sets the size budget. Only
+files written by this module are ever unpickled from it.
+'''
+
+#######################
+# Importing Libraries #
+#######################
+
+import hashlib
+import os
+import pickle
+import tempfile
+
+from instrumentation import timed
+
+CACHE_VERSION = 3  # Bump when the layout of cached objects changes
+DEFAULT_MAX_MB = 2048
+SAMPLE_SIZE = 1024 * 1024  # Bytes hashed from the start, middle and end of a file
+
+
+#########################################
+# Function to fingerprint an input file #
+#########################################
+
+def fingerprint(path):
+    path = os.path.abspath(path)
+    info = os.stat(path)
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as file:
+        for offset in (0, max(0, info.st_size // 2 - SAMPLE_SIZE // 2), max(0, info.st_size - SAMPLE_SIZE)):
+            file.seek(offset)
+            digest.update(file.read(SAMPLE_SIZE))
+    return (path, info.st_size, info.st_mtime_ns, digest.hexdigest())
+
+
+#############################
+# Defining File Cache Class #
+#############################
+
+class FileCache:
+    def __init__(self, directory=None, max_bytes=None):
+        if directory is None:
+            base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+            directory = os.environ.get("GENESCOPY_CACHE_DIR") or os.path.join(base, "genescopy")
+        if max_bytes is None:
+            max_bytes = int(os.environ.get("GENESCOPY_CACHE_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def _entry_path(self, kind, path):
+        key = hashlib.sha1(repr((CACHE_VERSION, kind, fingerprint(path))).encode()).hexdigest()
+        return os.path.join(self.directory, f"{kind}-{key}.pkl")
+
+    # Cached value for the current contents of path, or None
+    @timed("cache.get")
+    def get(self, kind, path):
+        try:
+            entry_path = self._entry_path(kind, path)
+            with open(entry_path, "rb") as file:
+                value = pickle.load(file)
+            os.utime(entry_path)  # Mark as recently used for eviction
+            return value
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+
+    @timed("cache.put")
+    def put(self, kind, path, value):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            entry_path = self._entry_path(kind, path)
+            # Write to a temporary file first so readers never see a partial entry
+            handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(handle, "wb") as file:
+                    pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(temp_path, entry_path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+            self.evict()
+            return True
+        except (OSError, pickle.PicklingError):
+            return False  # Caching is best effort, a failure never breaks loading
+
+    #############################
+    # Size bounded LRU eviction #
+    #############################
+
+    def entries(self):
+        if not os.path.isdir(self.directory):
+            return []
+        found = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".pkl"):
+                entry_path = os.path.join(self.directory, name)
+                try:
+                    info = os.stat(entry_path)
+                except OSError:
+                    continue
+                found.append((info.st_mtime, info.st_size, entry_path))
+        return found
+
+    def evict(self):
+        entries = sorted(self.entries())  # Least recently used first
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(entry_path)
+                total -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        for _, _, entry_path in self.entries():
+            try:
+                os.unlink(entry_path)
+            except OSError:
+                pass
@@ -0,0 +1,417 @@
+'''
+Transparent reading of gzip and BGZF compressed input.
+
+Compressed files are recognised from their first bytes, not their name,
+and streamed without decompressing them to disk first. Decompression runs
+on background threads so it overlaps with parsing; BGZF files (bgzip,
+samtools) are made of independent blocks, which are inflated in parallel.
+
+For random access (the sequence viewer and exports), BGZF files use a
+.gzi block index compatible with bgzip, so a fetch only inflates the
+blocks it touches. Plain gzip files cannot be entered mid-stream, so they
+get an in-memory checkpoint index built in one pass on open; recompressing
+with bgzip is much faster for large assemblies.
+
+If python-isal is installed its faster inflate routines are used.
+'''
+
+#######################
+# Importing Libraries #
+#######################
+
+import io
+import os
+import queue
+import struct
+import threading
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import zlib
+try:
+    from isal import igzip as gzip
+    from isal import isal_zlib as fast_zlib
+except ImportError:
+    import gzip
+    fast_zlib = zlib
+
+GZIP_MAGIC = b"\x1f\x8b"
+BGZF_MAGIC = b"\x1f\x8b\x08\x04"  # gzip header with the FEXTRA flag set
+READ_SIZE = 1024 * 1024           # Bytes handed over by the streaming reader at a time
+THREADS = min(4, os.cpu_count() or 1)
+CHECKPOINT_SPACING = 8 * 1024 * 1024  # Uncompressed bytes between plain gzip checkpoints
+
+
+###########################################
+# Function to detect the compression type #
+###########################################
+
+# "bgzf", "gzip" or "plain"
+def detect_format(path):
+    with open(path, "rb") as file:
+        header = file.read(64)
+    if not header.startswith(GZIP_MAGIC):
+        return "plain"
+    if header.startswith(BGZF_MAGIC) and _bgzf_block_size(header) is not None:
+        return "bgzf"
+    return "gzip"
+
+
+#####################################
+# BGZF block layout and .gzi format #
+#####################################
+
+# Total size of the BGZF block starting with header, or None if it is not one
+def _bgzf_block_size(header):
+    if len(header) < 12 or not header.startswith(BGZF_MAGIC):
+        return None
+    extra_length = struct.unpack_from("<H", header, 10)[0]
+    extra = header[12:12 + extra_length]
+    position = 0
+    while position + 4 <= len(extra):
+        field_length = struct.unpack_from("<H", extra, position + 2)[0]
+        if extra[position:position + 2] == b"BC" and field_length == 2 and position + 6 <= len(extra):
+            return struct.unpack_from("<H", extra, position + 4)[0] + 1
+        position += 4 + field_length
+    return None
+
+
+def _inflate_block(block):
+    # Skip the gzip header and the CRC32/ISIZE trailer around the raw deflate data
+    header_length = 12 + struct.unpack_from("<H", block, 10)[0]
+    return fast_zlib.decompress(block[header_length:-8], -15)
+
+
+# Compressed blocks of a BGZF stream read sequentially from an open file
+def _read_bgzf_blocks(file):
+    while True:
+        header = file.read(12)
+        if not header:
+            return
+        if len(header) < 12:
+            raise OSError("Truncated BGZF block")
+        header += file.read(struct.unpack_from("<H", header, 10)[0])
+        size = _bgzf_block_size(header)
+        if size is None:
+            raise OSError("Not a BGZF block")
+        block = header + file.read(size - len(header))
+        if len(block) < size:
+            raise OSError("Truncated BGZF block")
+        yield block
+
+
+# Walk block headers from (compressed, uncompressed) offsets without inflating anything
+def scan_bgzf_blocks(path, compressed_offset=0, uncompressed_offset=0):
+    blocks = []
+    with open(path, "rb") as file:
+        file.seek(compressed_offset)
+        while True:
+            header = file.read(18)
+            if not header:
+                break
+            header += file.read(max(0, 12 + struct.unpack_from("<H", header, 10)[0] - len(header)))
+            size = _bgzf_block_size(header)
+            if size is None:
+                raise OSError(f"Not a BGZF block at byte {compressed_offset}")
+            file.seek(compressed_offset + size - 4)
+            block_length = struct.unpack("<I", file.read(4))[0]
+            blocks.append((compressed_offset, uncompressed_offset))
+            compressed_offset += size
+            uncompressed_offset += block_length
+            file.seek(compressed_offset)
+    return blocks, uncompressed_offset
+
+
+# bgzip .gzi: entry count, then (compressed, uncompressed) offset pairs,
+# all unsigned 64-bit little endian; the first block at (0, 0) is implied
+def read_gzi(gzi_path):
+    with open(gzi_path, "rb") as file:
+        count = struct.unpack("<Q", file.read(8))[0]
+        offsets = array("Q", file.read(16 * count))
+    if len(offsets) != 2 * count:
+        raise ValueError("Truncated .gzi index")
+    return [(0, 0)] + list(zip(offsets[0::2], offsets[1::2]))
+
+
+def write_gzi(blocks, gzi_path):
+    blocks = [block for block in blocks if block != (0, 0)]
+    with open(gzi_path, "wb") as file:
+        file.write(struct.pack("<Q", len(blocks)))
+        for compressed_offset, uncompressed_offset in blocks:
+            file.write(struct.pack("<QQ", compressed_offset, uncompressed_offset))
+
+
+def load_or_build_gzi(path, gzi_path=None):
+    gzi_path = gzi_path or path + ".gzi"
+
+    # Reuse the index unless the file was modified after it was written
+    if os.path.exists(gzi_path) and os.path.getmtime(gzi_path) >= os.path.getmtime(path):
+        try:
+            blocks = read_gzi(gzi_path)
+            # Only the blocks after the last entry are walked to find the total length
+            tail, length = scan_bgzf_blocks(path, *blocks[-1])
+            return blocks[:-1] + tail, length
+        except (OSError, ValueError, struct.error):
+            pass
+
+    blocks, length = scan_bgzf_blocks(path)
+    try:
+        write_gzi(blocks, gzi_path)
+    except OSError:
+        pass  # Read-only location, keep the index in memory only
+    return blocks, length
+
+
+##########################################
+# Streaming reader with threaded inflate #
+##########################################
+
+# Inflate BGZF blocks on a thread pool, yielding the data in file order
+def _inflate_parallel(blocks, threads=THREADS):
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        pending = deque()
+        for block in blocks:
+            pending.append(pool.submit(_inflate_block, block))
+            if len(pending) >= 4 * threads:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class ReadaheadStream(io.RawIOBase):
+    # Pulls chunks from a producer iterator on a background thread
+    def __init__(self, chunks, source, max_pending=8):
+        super().__init__()
+        self._source = source
+        self._queue = queue.Queue(max_pending)
+        self._buffer = memoryview(b"")
+        self._done = False
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._produce, args=(chunks,), daemon=True)
+        self._thread.start()
+
+    def _produce(self, chunks):
+        try:
+            for chunk in chunks:
+                if not self._put(("chunk", chunk)):
+                    return
+            self._put(("done", None))
+        except Exception as e:
+            self._put(("error", e))
+
+    def _put(self, message):
+        while not self._stopped.is_set():
+            try:
+                self._queue.put(message, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._buffer and not self._done:
+            kind, payload = self._queue.get()
+            if kind == "chunk":
+                self._buffer = memoryview(payload)
+            elif kind == "done":
+                self._done = True
+            else:
+                self._done = True
+                raise payload
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+    def close(self):
+        if not self.closed:
+            self._stopped.set()
+            self._thread.join()
+            self._source.close()
+        super().close()
+
+
+# Open a plain, gzip or BGZF file for streaming. Returns the file object and a
+# function giving the position in the file on disk, for progress reporting.
+def open_input(path, text=False):
+    compression = detect_format(path)
+    source = open(path, "rb")
+    if compression == "bgzf":
+        stream = io.BufferedReader(ReadaheadStream(_inflate_parallel(_read_bgzf_blocks(source)), source), READ_SIZE)
+    elif compression == "gzip":
+        decompressed = gzip.GzipFile(fileobj=source)
+        chunks = iter(lambda: decompressed.read(READ_SIZE), b"")
+        stream = io.BufferedReader(ReadaheadStream(chunks, source), READ_SIZE)
+    else:
+        stream = source
+    if text:
+        stream = io.TextIOWrapper(stream)
+    return stream, source.tell
+
+
+###################################
+# Random access to BGZF sequences #
+###################################
+
+class BgzfReader:
+    def __init__(self, path, gzi_path=None, cache_blocks=64):
+        blocks, self.length = load_or_build_gzi(path, gzi_path)
+        self._compressed = array("Q", (block[0] for block in blocks))
+        self._uncompressed = array("Q", (block[1] for block in blocks))
+        self._end = os.path.getsize(path)
+        self._file = open(path, "rb")
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # Block number -> inflated data, least recently used first
+        self._cache_blocks = cache_blocks
+
+    def __len__(self):
+        return self.length
+
+    def close(self):
+        self._file.close()
+
+    def _read_compressed(self, number):
+        end = self._compressed[number + 1] if number + 1 < len(self._compressed) else self._end
+        with self._lock:
+            self._file.seek(self._compressed[number])
+            return self._file.read(end - self._compressed[number])
+
+    # The cache is shared by the viewer and background tasks, so it is only
+    # touched under the lock; inflating runs outside it
+    def _block(self, number):
+        with self._lock:
+            data = self._cache.get(number)
+            if data is not None:
+                self._cache.move_to_end(number)
+                return data
+        data = _inflate_block(self._read_compressed(number))
+        self._store(number, data)
+        return data
+
+    def _store(self, number, data):
+        with self._lock:
+            self._cache[number] = data
+            self._cache.move_to_end(number)
+            while len(self._cache) > self._cache_blocks:
+                self._cache.popitem(last=False)
+
+    # Bytes [start, end) of the uncompressed data
+    def read(self, start, end):
+        start, end = max(0, start), min(end, self.length)
+        if start >= end:
+            return b""
+        first = bisect_right(self._uncompressed, start) - 1
+        last = bisect_right(self._uncompressed, end - 1) - 1
+        numbers = range(first, last + 1)
+
+        # Long reads (exports, statistics) inflate their blocks in parallel
+        if len(numbers) > 2 * THREADS:
+            with ThreadPoolExecutor(max_workers=THREADS) as pool:
+                blocks = list(pool.map(lambda number: _inflate_block(self._read_compressed(number)), numbers))
+        else:
+            blocks = [self._block(number) for number in numbers]
+        data = b"".join(blocks)
+        offset = self._uncompressed[first]
+        return data[start - offset:end - offset]
+
+    def __getitem__(self, index):
+        start, stop, _ = index.indices(self.length)
+        return self.read(start, stop)
+
+
+#########################################
+# Random access to plain gzip sequences #
+#########################################
+
+class GzipReader:
+    # One pass over the file keeps a copy of the inflate state every
+    # CHECKPOINT_SPACING bytes; reads resume from the nearest checkpoint
+    def __init__(self, path, progress=None, spacing=CHECKPOINT_SPACING):
+        self._file = open(path, "rb")
+        self._lock = threading.Lock()
+        self._offsets = array("Q")  # Uncompressed offset of each checkpoint
+        self._points = []           # (compressed offset, inflate state)
+        self.length = self._build(os.path.getsize(path), progress, spacing)
+
+    def __len__(self):
+        return self.length
+
+    def close(self):
+        self._file.close()
+
+    def _build(self, total_size, progress, spacing):
+        decompressor = zlib.decompressobj(31)
+        compressed_offset = uncompressed_offset = 0
+        self._add_point(0, 0, decompressor)
+        next_point = spacing
+
+        while True:
+            data = self._file.read(READ_SIZE)
+            if not data:
+                break
+            compressed_offset += len(data)
+            uncompressed_offset, decompressor = self._inflate(decompressor, data, uncompressed_offset, None)
+            if uncompressed_offset >= next_point:
+                self._add_point(uncompressed_offset, compressed_offset, decompressor)
+                next_point = uncompressed_offset + spacing
+            if progress:
+                progress(compressed_offset, total_size)
+        return uncompressed_offset
+
+    def _add_point(self, uncompressed_offset, compressed_offset, decompressor):
+        self._offsets.append(uncompressed_offset)
+        self._points.append((compressed_offset, decompressor.copy()))
+
+    # Inflate data, continuing into following gzip members; output is collected
+    # into chunks when given. Returns the new offset and decompressor.
+    @staticmethod
+    def _inflate(decompressor, data, offset, chunks):
+        while data:
+            output = decompressor.decompress(data)
+            offset += len(output)
+            if chunks is not None:
+                chunks.append(output)
+            if not decompressor.eof:
+                break
+            data = decompressor.unused_data
+            decompressor = zlib.decompressobj(31)
+            if not data.strip(b"\x00"):
+                break  # Trailing padding after the last member
+        return offset, decompressor
+
+    # Bytes [start, end) of the uncompressed data
+    def read(self, start, end):
+        start, end = max(0, start), min(end, self.length)
+        if start >= end:
+            return b""
+        point = bisect_right(self._offsets, start) - 1
+        offset = self._offsets[point]
+        compressed_offset, decompressor = self._points[point]
+        decompressor = decompressor.copy()
+
+        chunks = []
+        with self._lock:
+            self._file.seek(compressed_offset)
+            produced = offset
+            while produced < end:
+                data = self._file.read(READ_SIZE)
+                if not data:
+                    break
+                produced, decompressor = self._inflate(decompressor, data, produced, chunks)
+        return b"".join(chunks)[start - offset:end - offset]
+
+    def __getitem__(self, index):
+        start, stop, _ = index.indices(self.length)
+        return self.read(start, stop)
+
+
+# Random access view of a compressed file, sliced with uncompressed offsets
+def open_random_access(path, progress=None):
+    if detect_format(path) == "bgzf":
+        return BgzfReader(path)
+    return GzipReader(path, progress)
@@ -0,0 +1,162 @@
+'''
+Diagnostics window showing where the time and memory of a session went.
+
+Lists the per-stage totals of the instrumentation recorder (calls, total,
+mean and longest time, CPU time and throughput), the memory in use and
+its peak, and the event counters, refreshed every second while open.
+Timing, tracemalloc and a cProfile capture are switched on and off here,
+and everything can be saved as JSON to attach to a bug report.
+'''
+
+#######################
+# Importing Libraries #
+#######################
+
+import tkinter as tk
+from tkinter import filedialog, messagebox, ttk
+
+from instrumentation import RATE_UNITS, profile_report, recorder
+
+REFRESH_MS = 1000
+# Column key, heading and width of the stage table
+COLUMNS = (("stage", "Stage", 220), ("calls", "Calls", 60), ("total", "Total (s)", 80), ("mean", "Mean (ms)", 80),
+           ("max", "Max (ms)", 80), ("cpu", "CPU (s)", 70), ("rate", "Throughput", 200))
+
+
+def format_rate(amounts, seconds):
+    for unit in RATE_UNITS:
+        if amounts.get(unit) and seconds > 0:
+            rate = amounts[unit] / seconds
+            if unit == "bytes":
+                return f"{rate / (1024 * 1024):,.1f} MB/s"
+            return f"{rate:,.0f} {unit}/s"
+    return ""
+
+
+# One line summary of the latest span and memory, for the status bar; empty while off
+def status_text():
+    if not recorder.enabled:
+        return ""
+    parts = []
+    latest = recorder.latest()
+    if latest is not None:
+        text = f"{latest['name']} {latest['seconds']:.3f} s"
+        rate = format_rate(latest, latest["seconds"])
+        parts.append(f"{text} ({rate})" if rate else text)
+    memory = recorder.memory()
+    parts.append(f"RSS {memory['rss_mb']:,.0f} MB (peak {memory['peak_rss_mb']:,.0f} MB)")
+    if "traced_mb" in memory:
+        parts.append(f"Python {memory['traced_mb']:,.0f} MB (peak {memory['traced_peak_mb']:,.0f} MB)")
+    if recorder.profiling:
+        parts.append("Profiling")
+    return "   |   ".join(parts)
+
+
+#####################################
+# Defining Diagnostics Window Class #
+#####################################
+
+class DiagnosticsWindow(tk.Toplevel):
+    def __init__(self, master, **kwargs):
+        super().__init__(master, **kwargs)
+        self.title("Diagnostics")
+        self.geometry("900x500")
+        self.enabled = tk.BooleanVar(value=recorder.enabled)
+        self.tracking = tk.BooleanVar(value=recorder.memory_tracking)
+        self.profiling = tk.BooleanVar(value=recorder.profiling)
+        self._refresh_id = None
+
+        controls = tk.Frame(self)
+        controls.pack(fill="x", padx=10, pady=5)
+        tk.Checkbutton(controls, text="Record timings", variable=self.enabled,
+                       command=lambda: recorder.set_enabled(self.enabled.get())).pack(side="left")
+        tk.Checkbutton(controls, text="Track Python memory (tracemalloc)", variable=self.tracking,
+                       command=lambda: recorder.set_memory_tracking(self.tracking.get())).pack(side="left", padx=5)
+        tk.Checkbutton(controls, text="Capture profile (cProfile)", variable=self.profiling,
+                       command=self.toggle_profile).pack(side="left", padx=5)
+        tk.Button(controls, text="Reset", command=self.reset).pack(side="left", padx=5)
+        tk.Button(controls, text="Save JSON...", command=self.save_json).pack(side="left", padx=5)
+
+        self.memory_label = tk.Label(self, text="", anchor="w")
+        self.memory_label.pack(fill="x", padx=10)
+
+        table = tk.Frame(self)
+        table.pack(fill="both", expand=True, padx=10, pady=5)
+        self.tree = ttk.Treeview(table, columns=[key for key, _, _ in COLUMNS], show="headings")
+        for key, heading, width in COLUMNS:
+            self.tree.heading(key, text=heading)
+            self.tree.column(key, width=width, anchor="w" if key in ("stage", "rate") else "e")
+        scrollbar = ttk.Scrollbar(table, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+
+        self.counters_label = tk.Label(self, text="", anchor="w", justify="left")
+        self.counters_label.pack(fill="x", padx=10, pady=(0, 5))
+
+        self.bind("<Destroy>", self._on_destroy)
+        self.refresh()
+
+    def refresh(self):
+        memory = recorder.memory()
+        text = f"Resident memory: {memory['rss_mb']:,.1f} MB, peak {memory['peak_rss_mb']:,.1f} MB"
+        if "traced_mb" in memory:
+            text += f"   Python allocations: {memory['traced_mb']:,.1f} MB, peak {memory['traced_peak_mb']:,.1f} MB"
+        if not recorder.enabled:
+            text += "   (timings are not being recorded)"
+        self.memory_label.config(text=text)
+
+        self.tree.delete(*self.tree.get_children())
+        for name, calls, seconds, mean, longest, cpu, amounts in recorder.stage_totals():
+            self.tree.insert("", "end", values=(name, calls, f"{seconds:.3f}", f"{mean * 1000:.2f}",
+                                                f"{longest * 1000:.2f}", f"{cpu:.3f}", format_rate(amounts, seconds)))
+        counters = recorder.snapshot()["counters"]
+        self.counters_label.config(text="   ".join(f"{name}: {value:,}" for name, value in sorted(counters.items())))
+        self._refresh_id = self.after(REFRESH_MS, self.refresh)
+
+    def reset(self):
+        recorder.reset()
+        self.tree.delete(*self.tree.get_children())
+
+    def save_json(self):
+        save_path = filedialog.asksaveasfilename(parent=self, defaultextension=".json",
+                                                 filetypes=[("JSON files", "*.json")])
+        if not save_path:
+            return
+        try:
+            recorder.write_json(save_path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not save diagnostics: {e}", parent=self)
+
+    # Starting captures the main thread and every background task started
+    # afterwards; stopping shows the slowest functions and offers to save the profile
+    def toggle_profile(self):
+        if self.profiling.get():
+            recorder.start_profile()
+            self.profiling.set(recorder.profiling)  # Another profiler may own the hook
+            return
+
+        stats = recorder.stop_profile()
+        if stats is None:
+            return
+        window = tk.Toplevel(self)
+        window.title("Profile")
+        text = tk.Text(window, wrap="none", font=("Courier", 10))
+        text.insert("1.0", profile_report(stats))
+        text.configure(state="disabled")
+        buttons = tk.Frame(window)
+        buttons.pack(side="bottom", fill="x")
+
+        def save():
+            save_path = filedialog.asksaveasfilename(parent=window, defaultextension=".prof",
+                                                     filetypes=[("Profile files", "*.prof")])
+            if save_path:
+                stats.dump_stats(save_path)
+
+        tk.Button(buttons, text="Save Profile...", command=save).pack(side="left", padx=5, pady=5)
+        text.pack(fill="both", expand=True)
+
+    def _on_destroy(self, event):
+        if event.widget is self and self._refresh_id is not None:
+            self.after_cancel(self._refresh_id)
+            self._refresh_id = None
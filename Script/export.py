@@ -0,0 +1,289 @@
+'''
+Export of sequences and annotation rows to files.
+
+Tk-free so the same writers serve the Export menu of the graphical
+interface and the command line tool. Sequences are streamed from an
+IndexedFasta in chunks and wrapped at a fixed line width.
+
+Batch exports take many regions at once (all features of a type, or a
+BED/region list), sort them by scaffold and position so each scaffold is
+read front to back once, and reverse-complement minus strand regions.
+Scaffolds are split over worker processes that write their part of the
+output to a temporary file, which is appended to the output in order.
+'''
+
+#######################
+# Importing Libraries #
+#######################
+
+import csv
+import multiprocessing
+import os
+import shutil
+import tempfile
+import uuid
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from annotations import ANNOTATION_COLUMNS
+from compressed import open_input
+from fasta_index import FastaIndexError, IndexedFasta, parse_region
+from instrumentation import timed
+
+FASTA_LINE_WIDTH = 80
+CHUNK_SIZE = FASTA_LINE_WIDTH * 12500  # ~1 MB of sequence per read
+BATCH_BASES = 8 * 1024 * 1024         # Sequence handed to one worker at a time
+BATCH_REGIONS = 20000
+CSV_COLUMNS = ("Name", "Scaffold", "Start", "End", "Strand", "Length", "Sequence")
+
+# A region to export, 1-based and inclusive as in GTF/GFF
+Region = namedtuple("Region", ["scaffold", "start", "end", "strand", "name"])
+
+COMPLEMENT = str.maketrans("ACGTUMRWSYKVHDBNacgtumrwsykvhdbn", "TGCAAKYWSRMBDHVNtgcaakywsrmbdhvn")
+
+
+def reverse_complement(sequence):
+    return sequence.translate(COMPLEMENT)[::-1]
+
+
+# Opens a temporary file next to save_path for writing, which replaces
+# save_path only once the block completes. A cancelled or failed export
+# leaves an existing file as it was and no partial file behind.
+@contextmanager
+def replace_on_success(save_path, newline=None):
+    temp_path = os.path.join(os.path.dirname(os.path.abspath(save_path)),
+                             f".{os.path.basename(save_path)}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(temp_path, "x", newline=newline) as handle:
+            yield handle
+        if os.path.exists(save_path):
+            shutil.copymode(save_path, temp_path)  # Overwriting keeps the file's permissions
+        os.replace(temp_path, save_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+
+############################################
+# Function to write a wrapped FASTA record #
+############################################
+
+def write_fasta_record(handle, header, chunks, width=FASTA_LINE_WIDTH):
+    handle.write(f">{header}\n")
+    carry = ""
+    for chunk in chunks:
+        chunk = carry + chunk
+        full = len(chunk) - len(chunk) % width
+        for i in range(0, full, width):
+            handle.write(chunk[i:i+width] + "\n")
+        carry = chunk[full:]
+    if carry:
+        handle.write(carry + "\n")
+
+
+# Chunks of [start, end) (0-based), last chunk first and complemented on the minus strand
+def region_chunks(fasta, scaffold, start, end, strand="+", chunk_size=CHUNK_SIZE):
+    if strand != "-":
+        yield from fasta.iter_chunks(scaffold, chunk_size, start, end)
+        return
+    chunk_starts = range(start, end, chunk_size)
+    for chunk_start in reversed(chunk_starts):
+        yield reverse_complement(fasta.fetch(scaffold, chunk_start, min(chunk_start + chunk_size, end)))
+
+
+#################################
+# Functions to export sequences #
+#################################
+
+def export_scaffold(fasta, scaffold, save_path, width=FASTA_LINE_WIDTH):
+    with open(save_path, "w") as f:
+        write_fasta_record(f, scaffold, fasta.iter_chunks(scaffold, CHUNK_SIZE), width)
+
+
+# start and end are 1-based and inclusive, as in GTF/GFF
+def export_region(fasta, scaffold, start, end, save_path, width=FASTA_LINE_WIDTH, strand="+"):
+    with open(save_path, "w") as f:
+        write_fasta_record(f, region_header(Region(scaffold, start, end, strand, "")),
+                           region_chunks(fasta, scaffold, start - 1, end, strand), width)
+
+
+######################################
+# Function to export annotation rows #
+######################################
+
+def export_annotation_rows(store, rows, save_path):
+    with open(save_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(ANNOTATION_COLUMNS)
+        for row in rows:
+            writer.writerow(store.row(row))
+
+
+######################################
+# Functions to collect batch regions #
+######################################
+
+# Regions for annotation rows, optionally limited to feature types and widened by flank bases
+def regions_from_annotations(store, rows=None, features=None, flank=0):
+    rows = range(len(store)) if rows is None else rows
+    features = set(features) if features else None
+    for row in rows:
+        scaffold, _, feature, start, end, strand, _, _, gene_name = store.row(row)
+        if features is not None and feature not in features:
+            continue
+        name = gene_name if gene_name != "Unknown" else feature
+        yield Region(scaffold, max(1, start - flank), end + flank, strand, name)
+
+
+# BED (0-based, half-open, optional name and strand columns) or one
+# samtools style "scaffold:start-end" region per line
+def read_regions(file_path, flank=0):
+    file, _ = open_input(file_path, text=True)
+    with file:
+        for number, line in enumerate(file, start=1):
+            if not line.strip() or line.startswith(("#", "track", "browser")):
+                continue
+            parts = line.rstrip("\r\n").split("\t")
+            try:
+                if len(parts) >= 3:
+                    start, end = int(parts[1]) + 1, int(parts[2])
+                    name = parts[3] if len(parts) > 3 and parts[3] != "." else ""
+                    strand = parts[5] if len(parts) > 5 and parts[5] in ("+", "-") else "+"
+                    scaffold = parts[0]
+                else:
+                    scaffold, start, end = parse_region(parts[0])
+                    start, end, strand, name = start or 1, end, "+", ""
+            except (ValueError, FastaIndexError):
+                raise FastaIndexError(f"Invalid region on line {number} of {os.path.basename(file_path)}") from None
+            yield Region(scaffold, max(1, start - flank), end + flank if end else None, strand, name)
+
+
+def region_header(region):
+    header = f"{region.scaffold}:{region.start}-{region.end}"
+    if region.strand == "-":
+        header += "(-)"
+    return f"{region.name} {header}" if region.name else header
+
+
+#####################################
+# Functions to export batch regions #
+#####################################
+
+# Regions clipped to the scaffold, grouped by scaffold in assembly order and sorted by start
+def group_regions(fasta, regions):
+    by_scaffold = {}
+    skipped = 0
+    for region in regions:
+        length = fasta.lengths.get(region.scaffold)
+        if length is None:
+            skipped += 1
+            continue
+        end = length if region.end is None else min(region.end, length)
+        if region.start > end:
+            skipped += 1
+            continue
+        by_scaffold.setdefault(region.scaffold, []).append(region._replace(end=end))
+    groups = [(name, sorted(by_scaffold[name], key=lambda region: (region.start, region.end)))
+              for name in fasta.names() if name in by_scaffold]
+    return groups, skipped
+
+
+def write_regions(fasta, regions, handle, output_format="fasta", strand_aware=True, width=FASTA_LINE_WIDTH):
+    writer = csv.writer(handle) if output_format == "csv" else None
+    for region in regions:
+        strand = region.strand if strand_aware else "+"
+        chunks = region_chunks(fasta, region.scaffold, region.start - 1, region.end, strand)
+        if writer is None:
+            write_fasta_record(handle, region_header(region._replace(strand=strand)), chunks, width)
+        else:
+            writer.writerow((region.name, region.scaffold, region.start, region.end, region.strand,
+                             region.end - region.start + 1, "".join(chunks)))
+
+
+_worker_entries = None  # Index entries of the FASTA, handed to each worker by _init_worker
+
+
+# Runs once in each worker process, so a FASTA without a usable .fai on disk
+# is not indexed again for every batch
+def _init_worker(entries):
+    global _worker_entries
+    _worker_entries = entries
+
+
+# Runs in a worker process: writes one batch of regions to a part file
+def _export_part(fasta_path, regions, part_path, output_format, strand_aware, width):
+    with IndexedFasta(fasta_path, entries=_worker_entries) as fasta, open(part_path, "w", newline="") as handle:
+        write_regions(fasta, regions, handle, output_format, strand_aware, width)
+    return len(regions)
+
+
+def _batches(groups):
+    batch, bases = [], 0
+    for _, regions in groups:
+        for region in regions:
+            batch.append(region)
+            bases += region.end - region.start + 1
+            if bases >= BATCH_BASES or len(batch) >= BATCH_REGIONS:
+                yield batch
+                batch, bases = [], 0
+    if batch:
+        yield batch
+
+
+# Export many regions to FASTA or CSV. Returns (exported, skipped), where
+# skipped counts regions on scaffolds missing from the FASTA or past their end.
+@timed("export.regions")
+def export_regions(fasta, regions, save_path, output_format="fasta", strand_aware=True,
+                   workers=1, progress=None, width=FASTA_LINE_WIDTH):
+    groups, skipped = group_regions(fasta, regions)
+    exported = _write_export(fasta, groups, save_path, output_format, strand_aware, workers, progress, width)
+    return exported, skipped
+
+
+def _write_export(fasta, groups, save_path, output_format, strand_aware, workers, progress, width):
+    total = sum(len(group) for _, group in groups)
+    done = 0
+
+    with replace_on_success(save_path, newline="") as handle:
+        if output_format == "csv":
+            csv.writer(handle).writerow(CSV_COLUMNS)
+
+        # Worker processes open the FASTA themselves, which needs a file with
+        # cheap random access (not an in-memory store or a plain gzip file)
+        if workers <= 1 or len(groups) < 2 or getattr(fasta, "compression", "gzip") == "gzip":
+            for batch in _batches(groups):
+                write_regions(fasta, batch, handle, output_format, strand_aware, width)
+                done += len(batch)
+                if progress:
+                    progress(done, total)
+            return done
+
+        handle.flush()
+        part_directory = tempfile.mkdtemp(prefix=".export-", dir=os.path.dirname(os.path.abspath(save_path)))
+        # Spawned rather than forked workers, so this is safe from the GUI's worker thread
+        context = multiprocessing.get_context("spawn")
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                                     initargs=(list(fasta.entries.values()),)) as pool:
+                futures = []
+                for number, batch in enumerate(_batches(groups)):
+                    part_path = os.path.join(part_directory, f"{number}.part")
+                    futures.append((pool.submit(_export_part, fasta.path, batch, part_path,
+                                                output_format, strand_aware, width), part_path))
+                # Parts are appended in order, each as soon as it and all before it are done
+                try:
+                    for future, part_path in futures:
+                        done += future.result()
+                        with open(part_path, "r", newline="") as part:
+                            shutil.copyfileobj(part, handle)
+                        os.unlink(part_path)
+                        if progress:
+                            progress(done, total)
+                except BaseException:
+                    pool.shutdown(cancel_futures=True)  # Cancelled or failed, drop the queued batches
+                    raise
+        finally:
+            shutil.rmtree(part_directory, ignore_errors=True)
+    return done
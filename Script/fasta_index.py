@@ -0,0 +1,290 @@
+'''
+Indexed random access to FASTA files.
+
+A samtools faidx compatible index (.fai) is built once next to the FASTA
+file and reused on later opens. Sequences are read from a memory-mapped
+view of the file, so only the bytes covering the requested region are
+touched and the assembly is never held in memory as Python strings.
+
+Compressed FASTA is indexed on its uncompressed bytes, as samtools does,
+and read through the random access readers of the compressed module.
+'''
+
+#######################
+# Importing Libraries #
+#######################
+
+import mmap
+import os
+from collections import namedtuple
+
+from compressed import detect_format, open_input, open_random_access
+from instrumentation import recorder
+
+# One line of a .fai file (same column order as samtools faidx)
+FaiEntry = namedtuple("FaiEntry", ["name", "length", "offset", "line_bases", "line_width"])
+
+PROGRESS_INTERVAL = 8 * 1024 * 1024  # Bytes between progress callbacks
+
+
+class FastaIndexError(Exception):
+    pass
+
+
+############################################
+# Function to build a .fai index in a pass #
+############################################
+
+# When a stats collector is passed, every sequence line is also streamed to it
+def build_fai(fasta_path, progress=None, stats=None):
+    total_size = os.path.getsize(fasta_path)
+
+    # Offsets are in the uncompressed data, progress follows the file on disk
+    file, disk_position = open_input(fasta_path)
+    with file:
+        report = (lambda: progress(min(disk_position(), total_size), total_size)) if progress else None
+        entries = _index_lines(file, 0, stats, report)
+
+    if progress:
+        progress(total_size, total_size)
+    return entries
+
+
+# Index entries of the records in bytes [start, end) of a plain FASTA file,
+# where start is 0 or the offset of a '>' header line (see parallel_parse)
+def build_fai_range(fasta_path, start, end, stats=None):
+    with open(fasta_path, "rb") as file:
+        file.seek(start)
+        return _index_lines(_lines_until(file, end - start), start, stats)
+
+
+def _lines_until(file, size):
+    while size > 0:
+        line = file.readline()
+        if not line:
+            return
+        size -= len(line)
+        yield line
+
+
+# Index entries of FASTA lines, the first of which starts at byte position;
+# report() is called about every PROGRESS_INTERVAL bytes
+def _index_lines(lines, position, stats=None, report=None):
+    entries = []
+    name = None
+    length = offset = line_bases = line_width = 0
+    short_line_seen = False
+    next_report = position + PROGRESS_INTERVAL
+
+    for line in lines:
+        line_start = position
+        position += len(line)
+        if report and position >= next_report:
+            report()
+            next_report = position + PROGRESS_INTERVAL
+
+        if line.startswith(b">"):
+            if name is not None:
+                entries.append(FaiEntry(name, length, offset, line_bases, line_width))
+            header = line[1:].split()
+            if not header:
+                raise FastaIndexError(f"Empty FASTA header at byte {line_start}")
+            name = header[0].decode()
+            if stats:
+                stats.start_scaffold(name)
+            length = line_bases = line_width = 0
+            offset = position
+            short_line_seen = False
+            continue
+
+        if name is None:
+            if line.strip():
+                raise FastaIndexError("FASTA file does not start with a '>' header")
+            continue
+
+        if stats:
+            stats.add_sequence(line)
+        bases = len(line.rstrip(b"\r\n"))
+        if bases == 0:
+            # Blank lines are only tolerated after the last sequence line
+            short_line_seen = True
+            continue
+        if short_line_seen:
+            raise FastaIndexError(f"Different line length in sequence '{name}'")
+        if line_bases == 0:
+            line_bases, line_width = bases, len(line)
+        elif bases > line_bases:
+            raise FastaIndexError(f"Different line length in sequence '{name}'")
+        elif bases < line_bases or len(line) != line_width:
+            short_line_seen = True
+        length += bases
+
+    if name is not None:
+        entries.append(FaiEntry(name, length, offset, line_bases, line_width))
+    return entries
+
+
+############################################
+# Functions to read and write .fai indexes #
+############################################
+
+def write_fai(entries, fai_path):
+    with open(fai_path, "w") as file:
+        for entry in entries:
+            file.write("\t".join(str(value) for value in entry) + "\n")
+
+
+def read_fai(fai_path):
+    entries = []
+    with open(fai_path, "r") as file:
+        for line in file:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) < 5:
+                continue
+            entries.append(FaiEntry(parts[0], *(int(value) for value in parts[1:5])))
+    return entries
+
+
+# Entries of the index next to the FASTA, or None when it is missing, unreadable
+# or older than the FASTA
+def read_current_fai(fasta_path, fai_path=None):
+    fai_path = fai_path or fasta_path + ".fai"
+    if os.path.exists(fai_path) and os.path.getmtime(fai_path) >= os.path.getmtime(fasta_path):
+        try:
+            return read_fai(fai_path)
+        except (OSError, ValueError):
+            pass
+    return None
+
+
+def load_or_build_fai(fasta_path, fai_path=None, progress=None, stats=None):
+    fai_path = fai_path or fasta_path + ".fai"
+
+    # Reuse the index unless the FASTA was modified after it was written
+    entries = read_current_fai(fasta_path, fai_path)
+    if entries is not None:
+        return entries
+
+    with recorder.span("fasta.index", bytes=os.path.getsize(fasta_path)):
+        entries = build_fai(fasta_path, progress, stats)
+    try:
+        write_fai(entries, fai_path)
+    except OSError:
+        pass  # Read-only location, keep the index in memory only
+    return entries
+
+
+#################################
+# Function to parse region text #
+#################################
+
+def parse_region(region, names=()):
+    # Accepts "scaffold", "scaffold:start" and "scaffold:start-end" (1-based, inclusive)
+    region = region.strip()
+    if region in names or ":" not in region:
+        return region, None, None
+
+    name, _, span = region.rpartition(":")
+    span = span.replace(",", "")
+    try:
+        if "-" in span:
+            start_text, end_text = span.split("-", 1)
+            start = int(start_text) if start_text else 1
+            end = int(end_text) if end_text else None
+        else:
+            start, end = int(span), None
+    except ValueError:
+        raise FastaIndexError(f"Invalid region '{region}'")
+
+    if start < 1 or (end is not None and end < start):
+        raise FastaIndexError(f"Invalid region '{region}'")
+    return name, start, end
+
+
+#####################################################
+# Shared interface of the random access FASTA types #
+#####################################################
+
+# Subclasses provide .lengths and fetch(name, start, end)
+class SequenceAccess:
+    def __contains__(self, name):
+        return name in self.lengths
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def names(self):
+        return list(self.lengths)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Fetch a samtools style "scaffold:start-end" region (1-based, inclusive)
+    def fetch_region(self, region):
+        name, start, end = parse_region(region, self.lengths)
+        if start is None:
+            return self.fetch(name)
+        return self.fetch(name, start - 1, end)
+
+    # Yield a scaffold in fixed size pieces without materialising it whole
+    def iter_chunks(self, name, chunk_size=1_000_000, start=0, end=None):
+        end = self.lengths[name] if end is None else min(end, self.lengths[name])
+        for chunk_start in range(start, end, chunk_size):
+            yield self.fetch(name, chunk_start, min(chunk_start + chunk_size, end))
+
+
+###########################################
+# Memory-mapped random access FASTA class #
+###########################################
+
+class IndexedFasta(SequenceAccess):
+    # Index entries may be passed in (e.g. from the on-disk cache) to skip the .fai
+    def __init__(self, fasta_path, fai_path=None, progress=None, stats=None, entries=None):
+        self.path = fasta_path
+        if entries is None:
+            entries = load_or_build_fai(fasta_path, fai_path, progress, stats)
+        self.entries = {entry.name: entry for entry in entries}
+        self.lengths = {name: entry.length for name, entry in self.entries.items()}
+
+        self._file = None
+        self.compression = detect_format(fasta_path)  # "plain", "gzip" or "bgzf"
+        if self.compression != "plain":
+            self._map = open_random_access(fasta_path, progress)
+        elif os.path.getsize(fasta_path) > 0:
+            self._file = open(fasta_path, "rb")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._map = b""
+
+    def close(self):
+        if hasattr(self._map, "close"):
+            self._map.close()
+        if self._file is not None:
+            self._file.close()
+
+    # Byte offset of a 0-based base position within a scaffold
+    def _byte_offset(self, entry, position):
+        if entry.line_bases == 0:
+            return entry.offset
+        lines, column = divmod(position, entry.line_bases)
+        return entry.offset + lines * entry.line_width + column
+
+    # Fetch bases [start, end) of a scaffold using 0-based, half-open coordinates
+    def fetch(self, name, start=0, end=None):
+        entry = self.entries.get(name)
+        if entry is None:
+            raise KeyError(name)
+
+        start = max(0, start)
+        end = entry.length if end is None else min(end, entry.length)
+        if start >= end:
+            return ""
+
+        raw = self._map[self._byte_offset(entry, start):self._byte_offset(entry, end)]
+        return raw.replace(b"\n", b"").replace(b"\r", b"").decode("ascii")
@@ -0,0 +1,261 @@
+'''
+Gene -> transcript -> exon/CDS hierarchy of an annotation file.
+
+Built from the parsed rows while the GTF/GFF loads. GFF3 links features
+through ID/Parent attributes, GTF through gene_id/transcript_id, and both
+end up in the same hash-indexed graph. Genes and transcripts refer to
+their rows in the AnnotationStore, where coordinates and strands live,
+so the graph itself only holds identifiers and row numbers.
+
+On top of the graph, spliced mRNA and CDS sequences are assembled from a
+FASTA (reverse-complemented on the minus strand), translated, and
+written out in batches in assembly order.
+'''
+
+#######################
+# Importing Libraries #
+#######################
+
+from array import array
+
+from annotations import attribute_values, parse_attributes
+from export import FASTA_LINE_WIDTH, replace_on_success, reverse_complement, write_fasta_record
+from instrumentation import timed
+
+EXON_FEATURES = {"exon"}
+CDS_FEATURES = {"CDS"}
+GENE_FEATURES = {"gene", "pseudogene", "ncRNA_gene"}
+GTF_TRANSCRIPT_FEATURES = {"transcript", "mRNA"}
+
+BASES = "TCAG"
+AMINO_ACIDS = "FFLLSSSSYY**CC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG"
+# Standard genetic code (NCBI table 1)
+CODON_TABLE = {a + b + c: AMINO_ACIDS[16 * i + 4 * j + k]
+               for i, a in enumerate(BASES) for j, b in enumerate(BASES) for k, c in enumerate(BASES)}
+
+
+###############################
+# Gene and transcript records #
+###############################
+
+class Gene:
+    __slots__ = ("id", "name", "row", "transcripts")
+
+    def __init__(self, gene_id):
+        self.id = gene_id
+        self.name = gene_id
+        self.row = None        # Row of the gene line, if the file has one
+        self.transcripts = []  # Transcript ids
+
+
+class Transcript:
+    __slots__ = ("id", "gene_id", "name", "row", "exon_rows", "cds_rows", "protein_id")
+
+    def __init__(self, transcript_id):
+        self.id = transcript_id
+        self.gene_id = None
+        self.name = transcript_id
+        self.row = None  # Row of the mRNA/transcript line, if the file has one
+        self.exon_rows = array("q")
+        self.cds_rows = array("q")
+        self.protein_id = None
+
+
+###########################
+# Feature hierarchy graph #
+###########################
+
+class FeatureGraph:
+    def __init__(self):
+        self.genes = {}        # Gene id -> Gene
+        self.transcripts = {}  # Transcript id -> Transcript
+        self.row_transcripts = {}  # Row of a gene/transcript/exon/CDS line -> transcript ids
+        self._features = {}    # GFF3 ID -> (row, feature type, parent ids, name)
+        self._gtf_genes = {}   # GTF transcript_id -> gene_id
+
+    def _transcript(self, transcript_id):
+        transcript = self.transcripts.get(transcript_id)
+        if transcript is None:
+            transcript = self.transcripts[transcript_id] = Transcript(transcript_id)
+        return transcript
+
+    # Rows as returned by parse_annotation_line; first_row is the store index of rows[0]
+    def add_rows(self, first_row, rows):
+        for row_number, row in enumerate(rows, start=first_row):
+            feature = row[2]
+            attributes = parse_attributes(row[9])
+            transcript_id = attributes.get("transcript_id")
+            gene_id = attributes.get("gene_id")
+
+            if "ID" in attributes or "Parent" in attributes:  # GFF3
+                parents = attribute_values(attributes, "Parent")
+                if "ID" in attributes and feature not in EXON_FEATURES and feature not in CDS_FEATURES:
+                    name = attributes.get("Name") or attributes.get("gene") or attributes["ID"]
+                    self._features[attributes["ID"]] = (row_number, feature, parents, name)
+                if feature in EXON_FEATURES or feature in CDS_FEATURES:
+                    for parent in parents:
+                        self._add_part(parent, feature, row_number, attributes)
+
+            elif transcript_id or gene_id:  # GTF
+                if transcript_id and gene_id:
+                    self._gtf_genes[transcript_id] = gene_id
+                if feature in EXON_FEATURES or feature in CDS_FEATURES:
+                    if transcript_id:
+                        self._add_part(transcript_id, feature, row_number, attributes)
+                elif feature in GENE_FEATURES and gene_id:
+                    gene = self.genes.setdefault(gene_id, Gene(gene_id))
+                    gene.row = row_number
+                    gene.name = attributes.get("gene_name") or attributes.get("gene") or gene_id
+                elif transcript_id and feature in GTF_TRANSCRIPT_FEATURES:
+                    self._transcript(transcript_id).row = row_number
+
+    def _add_part(self, transcript_id, feature, row_number, attributes):
+        transcript = self._transcript(transcript_id)
+        if feature in CDS_FEATURES:
+            transcript.cds_rows.append(row_number)
+            transcript.protein_id = transcript.protein_id or attributes.get("protein_id")
+        else:
+            transcript.exon_rows.append(row_number)
+
+    # Add an unfinalized graph over rows numbered from offset, as if its rows had
+    # been added here after the current ones
+    def merge(self, other, offset):
+        for gene_id, theirs in other.genes.items():
+            gene = self.genes.setdefault(gene_id, Gene(gene_id))
+            gene.row, gene.name = theirs.row + offset, theirs.name  # Only gene lines create genes before finalize
+        for transcript_id, theirs in other.transcripts.items():
+            transcript = self._transcript(transcript_id)
+            transcript.exon_rows.extend(row + offset for row in theirs.exon_rows)
+            transcript.cds_rows.extend(row + offset for row in theirs.cds_rows)
+            if theirs.row is not None:
+                transcript.row = theirs.row + offset
+            transcript.protein_id = transcript.protein_id or theirs.protein_id
+        for feature_id, (row, feature, parents, name) in other._features.items():
+            self._features[feature_id] = (row + offset, feature, parents, name)
+        self._gtf_genes.update(other._gtf_genes)
+
+    # Link transcripts to genes once every row has been added
+    def finalize(self):
+        for transcript in self.transcripts.values():
+            feature = self._features.get(transcript.id)
+            if feature is not None:  # GFF3: the transcript line, whose parent is the gene
+                row, feature_type, parents, name = feature
+                transcript.row, transcript.name = row, name
+                if feature_type in GENE_FEATURES or not parents:
+                    gene_id = transcript.id  # CDS directly under a gene (e.g. prokaryotes)
+                else:
+                    gene_id = parents[0]
+            else:
+                gene_id = self._gtf_genes.get(transcript.id, transcript.id)
+
+            gene = self.genes.get(gene_id)
+            if gene is None:
+                gene = self.genes[gene_id] = Gene(gene_id)
+                if gene_id in self._features:
+                    gene.row, _, _, gene.name = self._features[gene_id]
+            transcript.gene_id = gene_id
+            gene.transcripts.append(transcript.id)
+
+        for transcript in self.transcripts.values():
+            rows = list(transcript.exon_rows) + list(transcript.cds_rows)
+            if transcript.row is not None:
+                rows.append(transcript.row)
+            gene_row = self.genes[transcript.gene_id].row
+            if gene_row is not None:
+                rows.append(gene_row)
+            for row in rows:
+                self.row_transcripts.setdefault(row, []).append(transcript.id)
+        self._features, self._gtf_genes = {}, {}
+        return self
+
+    # Transcripts of the gene a row belongs to (gene, transcript, exon or CDS line)
+    def transcripts_for_row(self, row):
+        return self.row_transcripts.get(row, [])
+
+
+#####################################
+# Spliced sequences and translation #
+#####################################
+
+# Exon (or CDS) segments as (start, end), 1-based inclusive, in genome order
+def transcript_segments(store, transcript, kind="mrna"):
+    rows = transcript.cds_rows if kind == "cds" or not transcript.exon_rows else transcript.exon_rows
+    return sorted((store.start[row], store.end[row]) for row in rows)
+
+
+def transcript_location(store, transcript):
+    rows = transcript.exon_rows or transcript.cds_rows
+    if not rows:
+        return None, "+"
+    return store.scaffold[rows[0]], store.strand[rows[0]]
+
+
+def transcript_sequence(fasta, store, transcript, kind="mrna"):
+    scaffold, strand = transcript_location(store, transcript)
+    segments = transcript_segments(store, transcript, kind)
+    if scaffold is None or not segments:
+        return ""
+    sequence = "".join(fasta.fetch(scaffold, start - 1, end) for start, end in segments)
+    if strand == "-":
+        sequence = reverse_complement(sequence)
+
+    # A CDS starting mid-codon (partial gene) is trimmed by the phase of its first segment
+    if kind == "cds" and transcript.cds_rows:
+        first = min if strand != "-" else max
+        first_row = first(transcript.cds_rows, key=lambda row: store.start[row])
+        phase = store.frame[first_row]
+        if phase in ("1", "2"):
+            sequence = sequence[int(phase):]
+    return sequence
+
+
+def translate(sequence):
+    sequence = sequence.upper().replace("U", "T")
+    return "".join(CODON_TABLE.get(sequence[i:i + 3], "X") for i in range(0, len(sequence) - 2, 3))
+
+
+##################################
+# Function to export transcripts #
+##################################
+
+def transcript_header(store, graph, transcript, kind):
+    scaffold, strand = transcript_location(store, transcript)
+    segments = transcript_segments(store, transcript, "cds" if kind != "mrna" else "mrna")
+    gene = graph.genes.get(transcript.gene_id)
+    name = transcript.protein_id if kind == "protein" and transcript.protein_id else transcript.id
+    header = f"{name} transcript={transcript.id} gene={transcript.gene_id}"
+    if gene is not None and gene.name != gene.id:
+        header += f" name={gene.name}"
+    return header + f" {scaffold}:{segments[0][0]}-{segments[-1][1]}({strand})"
+
+
+# kind is "mrna" (spliced exons), "cds" or "protein". Transcripts are written
+# in assembly order; those without a CDS (for cds/protein) or whose scaffold
+# is not in the FASTA are skipped. Returns (exported, skipped).
+@timed("export.transcripts")
+def export_transcripts(fasta, store, graph, save_path, kind="mrna", transcript_ids=None,
+                       progress=None, width=FASTA_LINE_WIDTH):
+    transcript_ids = graph.transcripts if transcript_ids is None else transcript_ids
+    order = {name: index for index, name in enumerate(fasta.names())}
+    selected, skipped = [], 0
+    for transcript_id in transcript_ids:
+        transcript = graph.transcripts.get(transcript_id)
+        scaffold = transcript_location(store, transcript)[0] if transcript is not None else None
+        if scaffold not in order or (kind != "mrna" and not transcript.cds_rows):
+            skipped += 1
+            continue
+        selected.append((order[scaffold], transcript_segments(store, transcript)[0][0], transcript_id))
+    selected.sort()
+
+    with replace_on_success(save_path) as handle:
+        for done, (_, _, transcript_id) in enumerate(selected, start=1):
+            transcript = graph.transcripts[transcript_id]
+            sequence = transcript_sequence(fasta, store, transcript, "mrna" if kind == "mrna" else "cds")
+            if kind == "protein":
+                sequence = translate(sequence).rstrip("*")
+            write_fasta_record(handle, transcript_header(store, graph, transcript, kind), [sequence], width)
+            if progress and done % 1000 == 0:
+                progress(done, len(selected))
+    if progress:
+        progress(len(selected), len(selected))
+    return len(selected), skipped
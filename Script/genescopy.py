@@ -0,0 +1,411 @@
+'''
+Command line interface for GeneScoPy.
+
+Runs the Tk-free core (FASTA statistics, GTF/GFF summaries, region
+export) without a display, so assemblies can be processed on compute
+nodes and in scripts. Many assemblies are fanned out over a process
+pool, one job per FASTA/GTF pair, with a configurable worker count and
+memory budget.
+
+Examples:
+    python Script/genescopy.py stats a.fasta b.fasta,b.gff --workers 8 --outdir qc
+    python Script/genescopy.py export a.fasta --gtf a.gff --feature CDS --output cds.fasta
+    python Script/genescopy.py transcripts a.fasta a.gff --kind protein --output proteins.faa
+    python Script/genescopy.py motif a.fasta EcoRI=GAATTC,TATAWAWR --output sites.bed
+    python Script/genescopy.py query a.gff "feature=CDS length>300" --by scaffold,feature
+    python Script/genescopy.py --diagnostics timings.json --profile run.prof stats a.fasta,a.gff --workers 1
+'''
+
+#######################
+# Importing Libraries #
+#######################
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from annotation_query import CATEGORICAL_COLUMNS, QueryError, frame_from_file, parse_filters
+from annotations import summarize_annotations
+from assembly_stats import MIN_GAP, stats_from_fasta
+from cache import FileCache
+from export import export_annotation_rows, export_regions, read_regions, regions_from_annotations
+from feature_graph import export_transcripts
+from fasta_index import FastaIndexError, IndexedFasta
+from instrumentation import profile_report, recorder
+from motif_search import MAX_HITS, MotifError, parse_patterns, search_fasta
+from parallel_parse import parse_annotations
+
+FASTA_EXTENSIONS = (".fasta", ".fa", ".fna", ".faa", ".fas")
+
+# Columns of the combined summary table written for a batch
+SUMMARY_COLUMNS = ("name", "total_length", "scaffolds", "n50", "l50", "n90", "l90", "aun",
+                   "gc_fraction", "n_fraction", "contigs", "contig_n50", "annotation_rows")
+
+
+############################
+# Functions to define jobs #
+############################
+
+def job_name(fasta_path):
+    name = os.path.basename(fasta_path)
+    if name.endswith(".gz"):
+        name = name[:-3]
+    for extension in FASTA_EXTENSIONS:
+        if name.endswith(extension):
+            return name[:-len(extension)]
+    return name
+
+
+# A job is given as "FASTA" or "FASTA,GTF"
+def parse_job(spec):
+    fasta, _, gtf = spec.partition(",")
+    return {"name": job_name(fasta), "fasta": fasta, "gtf": gtf or None}
+
+
+# Manifest: tab separated fasta, optional gtf and optional name per line
+def read_manifest(manifest_path):
+    jobs = []
+    with open(manifest_path, "r") as file:
+        for line in file:
+            if not line.strip() or line.startswith("#"):
+                continue
+            parts = line.rstrip("\n").split("\t")
+            job = parse_job(parts[0])
+            if len(parts) > 1 and parts[1]:
+                job["gtf"] = parts[1]
+            if len(parts) > 2 and parts[2]:
+                job["name"] = parts[2]
+            jobs.append(job)
+    return jobs
+
+
+####################################
+# Functions run inside the workers #
+####################################
+
+def limit_memory(megabytes):
+    if not megabytes:
+        return
+    try:
+        import resource
+    except ImportError:
+        return  # Not available on Windows, the budget is not enforced there
+    limit = megabytes * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def cached(cache, kind, path, compute):
+    value = cache.get(kind, path) if cache else None
+    if value is None:
+        value = compute()
+        if cache:
+            cache.put(kind, path, value)
+    return value
+
+
+def run_stats_job(job, min_gap=MIN_GAP, use_cache=True):
+    started = time.perf_counter()
+    cache = FileCache() if use_cache else None
+    result = {"name": job["name"], "fasta": job["fasta"], "gtf": job["gtf"]}
+    result["assembly"] = cached(cache, f"assembly-summary-{min_gap}", job["fasta"],
+                                lambda: stats_from_fasta(job["fasta"], min_gap=min_gap).summary())
+    if job["gtf"]:
+        result["annotation"] = cached(cache, "annotation-summary", job["gtf"],
+                                      lambda: summarize_annotations(job["gtf"]))
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+#############################
+# Functions to write output #
+#############################
+
+def flatten(values, prefix=""):
+    flat = {}
+    for key, value in values.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def write_result(result, outdir, formats):
+    base = os.path.join(outdir, result["name"])
+    if "json" in formats:
+        with open(base + ".stats.json", "w") as file:
+            json.dump(result, file, indent=2)
+    if "tsv" in formats:
+        with open(base + ".stats.tsv", "w") as file:
+            for key, value in flatten(result).items():
+                file.write(f"{key}\t{value}\n")
+
+
+def write_summary(results, summary_path):
+    with open(summary_path, "w", newline="") as file:
+        writer = csv.writer(file, delimiter="\t")
+        writer.writerow(SUMMARY_COLUMNS)
+        for result in results:
+            row = dict(result["assembly"], name=result["name"],
+                       annotation_rows=result.get("annotation", {}).get("rows", ""))
+            writer.writerow([row.get(column, "") for column in SUMMARY_COLUMNS])
+
+
+####################################
+# Function to run jobs over a pool #
+####################################
+
+def run_jobs(function, jobs, workers, memory_mb, **kwargs):
+    # Yields (job, result, error) as jobs finish
+    if workers <= 1:
+        limit_memory(memory_mb)  # The jobs run in this process, so the budget applies to it
+        for job in jobs:
+            try:
+                yield job, function(job, **kwargs), None
+            except Exception as e:
+                yield job, None, e
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=limit_memory, initargs=(memory_mb,)) as pool:
+        futures = {pool.submit(function, job, **kwargs): job for job in jobs}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
+
+
+############################
+# Command line subcommands #
+############################
+
+def command_stats(args):
+    jobs = [parse_job(spec) for spec in args.inputs]
+    if args.manifest:
+        jobs.extend(read_manifest(args.manifest))
+    if not jobs:
+        print("No assemblies given.", file=sys.stderr)
+        return 2
+    # Output files are named after the jobs, so two jobs of one name would overwrite each other
+    names = [job["name"] for job in jobs]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        print(f"Assemblies with the same name: {', '.join(duplicates)}. "
+              "Rename the files or give names in the third column of a --manifest.", file=sys.stderr)
+        return 2
+
+    os.makedirs(args.outdir, exist_ok=True)
+    formats = set(args.format.split(","))
+    results, failed = [], 0
+    workers = min(args.workers, len(jobs))
+    for job, result, error in run_jobs(run_stats_job, jobs, workers, args.memory_mb,
+                                       min_gap=args.min_gap, use_cache=not args.no_cache):
+        if error is not None:
+            failed += 1
+            print(f"[failed] {job['name']}: {error}", file=sys.stderr)
+            continue
+        write_result(result, args.outdir, formats)
+        results.append(result)
+        print(f"[done] {job['name']} ({result['seconds']} s)", file=sys.stderr)
+
+    results.sort(key=lambda result: result["name"])
+    write_summary(results, os.path.join(args.outdir, "summary.tsv"))
+    return 1 if failed else 0
+
+
+def command_export(args):
+    if not args.gtf and not args.regions:
+        print("Give annotations with --gtf and/or a BED or region list with --regions.", file=sys.stderr)
+        return 2
+
+    def regions():
+        if args.gtf:
+            store, _, _ = parse_annotations(args.gtf, workers=args.workers, index=False, graph=False)
+            yield from regions_from_annotations(store, features=args.feature, flank=args.flank)
+        if args.regions:
+            yield from read_regions(args.regions, args.flank)
+
+    try:
+        with IndexedFasta(args.fasta) as fasta:
+            exported, skipped = export_regions(fasta, regions(), args.output, args.format,
+                                               strand_aware=not args.no_strand, workers=args.workers)
+    except (OSError, FastaIndexError) as e:
+        print(f"[failed] {e}", file=sys.stderr)
+        return 1
+    print(f"[done] {exported} regions written to {args.output}", file=sys.stderr)
+    if skipped:
+        print(f"[skipped] {skipped} regions outside the FASTA", file=sys.stderr)
+    return 0
+
+
+def command_transcripts(args):
+    try:
+        store, _, graph = parse_annotations(args.gtf, workers=args.workers, index=False)
+
+        transcript_ids = None
+        if args.transcript or args.gene:
+            transcript_ids = list(args.transcript or [])
+            for gene_id in args.gene or []:
+                gene = graph.genes.get(gene_id)
+                if gene is None:
+                    print(f"[skipped] unknown gene {gene_id}", file=sys.stderr)
+                else:
+                    transcript_ids.extend(gene.transcripts)
+
+        with IndexedFasta(args.fasta) as fasta:
+            exported, skipped = export_transcripts(fasta, store, graph, args.output, args.kind, transcript_ids)
+    except (OSError, FastaIndexError) as e:
+        print(f"[failed] {e}", file=sys.stderr)
+        return 1
+    print(f"[done] {exported} transcripts written to {args.output}", file=sys.stderr)
+    if skipped:
+        print(f"[skipped] {skipped} transcripts without a CDS or outside the FASTA", file=sys.stderr)
+    return 0
+
+
+def command_motif(args):
+    try:
+        patterns = parse_patterns(args.patterns)
+        with IndexedFasta(args.fasta) as fasta:
+            hits = search_fasta(fasta, patterns, workers=args.workers, max_hits=args.max_hits)
+        if args.output:
+            hits.write_bed(args.output)
+    except MotifError as e:
+        print(f"[failed] {e}", file=sys.stderr)
+        return 2
+    except (OSError, FastaIndexError) as e:
+        print(f"[failed] {e}", file=sys.stderr)
+        return 1
+    for name, count in hits.counts().items():
+        print(f"{name}\t{count}")
+    if hits.truncated:
+        print(f"[truncated] stopped after {len(hits)} hits, raise --max-hits for more", file=sys.stderr)
+    if args.output:
+        print(f"[done] {len(hits)} hits written to {args.output}", file=sys.stderr)
+    return 0
+
+
+def command_query(args):
+    try:
+        filters = parse_filters(args.filters)
+        by = tuple(column for column in args.by.split(",") if column)
+        unknown = [column for column in by if column not in CATEGORICAL_COLUMNS]
+        if unknown or not by:
+            raise QueryError(f"Group by one or more of {', '.join(CATEGORICAL_COLUMNS)}")
+    except QueryError as e:
+        print(f"[failed] {e}", file=sys.stderr)
+        return 2
+
+    try:
+        frame = frame_from_file(args.gtf, workers=args.workers)
+        mask = frame.mask(filters)
+        if args.rows:
+            export_annotation_rows(frame.store, frame.rows(mask), args.rows)
+    except OSError as e:
+        print(f"[failed] {e}", file=sys.stderr)
+        return 1
+
+    writer = csv.writer(sys.stdout, delimiter="\t", lineterminator="\n")
+    writer.writerow(by + ("count", "total_length", "mean_length"))
+    for values, count, total, mean in frame.summary(mask, by):
+        writer.writerow(values + (count, total, round(mean, 1)))
+    print(f"[done] {frame.count(mask)} of {frame.size} rows match", file=sys.stderr)
+    if args.rows:
+        print(f"[done] matching rows written to {args.rows}", file=sys.stderr)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="genescopy", description="Headless GeneScoPy tools.")
+    parser.add_argument("--diagnostics", metavar="JSON",
+                        help="Record stage timings and memory of this process and write them to a JSON file")
+    parser.add_argument("--trace-memory", action="store_true", help="Also track Python allocations (with --diagnostics)")
+    parser.add_argument("--profile", metavar="PROF",
+                        help="Save a cProfile of this process and print its slowest functions to stderr")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    stats = subparsers.add_parser("stats", help="Assembly and annotation statistics for many assemblies")
+    stats.add_argument("inputs", nargs="*", metavar="FASTA[,GTF]", help="Assembly, optionally paired with a GTF/GFF")
+    stats.add_argument("--manifest", help="Tab separated file of fasta, gtf and name columns")
+    stats.add_argument("--outdir", default="genescopy_stats", help="Directory for per-assembly results")
+    stats.add_argument("--format", default="json,tsv", help="Comma separated output formats: json, tsv")
+    stats.add_argument("--min-gap", type=int, default=MIN_GAP, help="Shortest N run that splits contigs")
+    stats.add_argument("--no-cache", action="store_true", help="Do not read or write the on-disk cache")
+    add_pool_arguments(stats)
+    stats.set_defaults(handler=command_stats)
+
+    export = subparsers.add_parser("export", help="Sequences of many annotated features or BED regions")
+    export.add_argument("fasta", help="Assembly to take sequences from")
+    export.add_argument("--gtf", help="Export annotated features from this GTF/GFF")
+    export.add_argument("--feature", action="append", help="Feature type to export (repeatable, default: all)")
+    export.add_argument("--regions", help="BED file or list of scaffold:start-end regions")
+    export.add_argument("--flank", type=int, default=0, help="Bases added on both sides of every region")
+    export.add_argument("--format", choices=("fasta", "csv"), default="fasta", help="Output format")
+    export.add_argument("--no-strand", action="store_true", help="Do not reverse-complement minus strand regions")
+    export.add_argument("--output", "-o", required=True, help="Output file")
+    export.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    export.set_defaults(handler=command_export)
+
+    transcripts = subparsers.add_parser("transcripts", help="Spliced mRNA, CDS or protein sequences of transcripts")
+    transcripts.add_argument("fasta", help="Assembly to take sequences from")
+    transcripts.add_argument("gtf", help="GTF/GFF3 annotation with exon and CDS features")
+    transcripts.add_argument("--kind", choices=("mrna", "cds", "protein"), default="cds", help="Sequence to write")
+    transcripts.add_argument("--transcript", action="append", help="Transcript id to export (repeatable, default: all)")
+    transcripts.add_argument("--gene", action="append", help="Export all transcripts of this gene id (repeatable)")
+    transcripts.add_argument("--output", "-o", required=True, help="Output FASTA file")
+    transcripts.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    transcripts.set_defaults(handler=command_transcripts)
+
+    motif = subparsers.add_parser("motif", help="Find exact or IUPAC sequence motifs on both strands")
+    motif.add_argument("fasta", help="Assembly to search")
+    motif.add_argument("patterns", help="Comma separated sequences, optionally named as name=SEQUENCE")
+    motif.add_argument("--max-hits", type=int, default=MAX_HITS, help="Stop collecting after this many hits")
+    motif.add_argument("--output", "-o", help="Write hits as BED (counts per pattern are always printed)")
+    motif.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    motif.set_defaults(handler=command_motif)
+
+    query = subparsers.add_parser("query", help="Filter annotation rows and summarise them per group")
+    query.add_argument("gtf", help="GTF/GFF annotation")
+    query.add_argument("filters", nargs="?", default="",
+                       help='Filters that must all hold, e.g. "feature=CDS strand=+ start>=1Mb length>300"')
+    query.add_argument("--by", default="scaffold,feature", help="Comma separated columns to group by")
+    query.add_argument("--rows", help="Also write the matching rows to this CSV file")
+    query.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    query.set_defaults(handler=command_query)
+    return parser
+
+
+def add_pool_arguments(parser):
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--memory-mb", type=int, default=0, help="Address space limit per worker (or of this process with one worker) in MB (0 = none)")
+
+
+# Timings cover the main process; jobs fanned out to worker processes are
+# only seen as a whole, so run with --workers 1 to break a job into stages
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.diagnostics:
+        recorder.set_enabled(True)
+        recorder.set_memory_tracking(args.trace_memory)
+    if args.profile:
+        recorder.start_profile()
+    try:
+        with recorder.span(f"command.{args.command}"):
+            return args.handler(args)
+    finally:
+        if args.profile:
+            stats = recorder.stop_profile(args.profile)
+            if stats is not None:
+                print(profile_report(stats, limit=20), file=sys.stderr)
+                print(f"[done] profile written to {args.profile}", file=sys.stderr)
+        if args.diagnostics:
+            recorder.write_json(args.diagnostics)
+            print(f"[done] diagnostics written to {args.diagnostics}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+'''
+Zoomable overview of a scaffold drawn from precomputed genome tracks.
+
+GC %, GC skew, N fraction and gene density are drawn as one row each,
+with one value per pixel read from the track pyramids of genome_tracks,
+so a redraw at any zoom level only sums a few bins per pixel. Each row
+is a single line or polygon item on the canvas. The mouse wheel zooms
+around the pointer, dragging pans, and a click moves the sequence viewer
+there. The range shown in the viewer is marked with a rectangle.
+'''
+
+#######################
+# Importing Libraries #
+#######################
+
+import tkinter as tk
+
+# Track key, label and drawing style, top to bottom
+ROWS = (("gc", "GC %", "line"), ("skew", "GC skew", "line"), ("n", "N", "area"),
+        ("genes", "Genes/Mb", "area"), ("features", "Features/Mb", "area"))
+ROW_HEIGHT = 30
+AXIS_HEIGHT = 16
+LABEL_WIDTH = 90
+MIN_SPAN = 10000  # Narrowest range the overview zooms to, in bases
+COLORS = {"gc": "#1f77b4", "skew": "#9467bd", "n": "#7f7f7f", "genes": "#2ca02c", "features": "#2ca02c"}
+
+
+#########################################
+# Defining Genome Overview Widget Class #
+#########################################
+
+class GenomeOverview(tk.Frame):
+    def __init__(self, master, **kwargs):
+        super().__init__(master, **kwargs)
+        self.sources = []     # GenomeTracks objects the rows are read from
+        self.name = None
+        self.length = 0
+        self.start = 0        # Range shown, 0-based half-open
+        self.end = 0
+        self.cursor = None    # Range shown in the sequence viewer
+        self.navigate = None  # Called as navigate(position) when the overview is clicked
+        self._profile = {}
+        self._press = None    # (x, start) where a drag began
+
+        self.canvas = tk.Canvas(self, height=4 * ROW_HEIGHT + AXIS_HEIGHT, background="white",
+                                highlightthickness=0)
+        self.canvas.pack(fill="x")
+        self.readout = tk.Label(self, text="", anchor="w")
+        self.readout.pack(fill="x")
+
+        self.canvas.bind("<Configure>", lambda event: self.render())
+        self.canvas.bind("<MouseWheel>", lambda event: self.zoom(0.8 if event.delta > 0 else 1.25, event.x))
+        self.canvas.bind("<Button-4>", lambda event: self.zoom(0.8, event.x))
+        self.canvas.bind("<Button-5>", lambda event: self.zoom(1.25, event.x))
+        self.canvas.bind("<ButtonPress-1>", self._on_press)
+        self.canvas.bind("<B1-Motion>", self._on_drag)
+        self.canvas.bind("<ButtonRelease-1>", self._on_release)
+        self.canvas.bind("<Motion>", self._on_motion)
+        self.canvas.bind("<Leave>", lambda event: self.readout.config(text=""))
+
+    ########################
+    # Data source and view #
+    ########################
+
+    def set_sources(self, *sources):
+        self.sources = [source for source in sources if source is not None]
+        self.render()
+
+    def show(self, name, length):
+        self.name, self.length = name, length
+        self.start, self.end = 0, length
+        self.cursor = None
+        self.render()
+
+    def clear(self):
+        self.name, self.length = None, 0
+        self.cursor = None
+        self.render()
+
+    # Mark the range shown in the sequence viewer, following it if it leaves the view
+    def set_cursor(self, start, end):
+        self.cursor = (start, end)
+        if end <= self.start or start >= self.end:
+            span = self.end - self.start
+            self._set_range((start + end) // 2 - span // 2, span)
+        else:
+            self._draw_cursor()
+
+    def zoom(self, factor, x):
+        if self.name is None:
+            return
+        position = self._position(x)
+        span = int(min(self.length, max(MIN_SPAN, (self.end - self.start) * factor)))
+        self._set_range(int(position - (x - LABEL_WIDTH) / self._plot_width() * span), span)
+
+    def _set_range(self, start, span):
+        start = max(0, min(start, self.length - span))
+        self.start, self.end = start, min(self.length, start + span)
+        self.render()
+
+    def _plot_width(self):
+        return max(1, self.canvas.winfo_width() - LABEL_WIDTH)
+
+    def _position(self, x):
+        fraction = min(1.0, max(0.0, (x - LABEL_WIDTH) / self._plot_width()))
+        return int(self.start + fraction * (self.end - self.start))
+
+    def _x(self, position):
+        return LABEL_WIDTH + (position - self.start) / max(1, self.end - self.start) * self._plot_width()
+
+    #######################
+    # Rendering functions #
+    #######################
+
+    def render(self):
+        self.canvas.delete("all")
+        self._profile = {}
+        width = self._plot_width()
+        if self.name is None or self.length == 0 or width < 10:
+            return
+
+        for source in self.sources:
+            self._profile.update(source.profile(self.name, self.start, self.end, width, self.length))
+        rows = [row for row in ROWS if row[0] in self._profile]
+        for index, (key, label, style) in enumerate(rows):
+            self._draw_row(index * ROW_HEIGHT, key, label, style, self._profile[key])
+        self._draw_axis(len(rows) * ROW_HEIGHT)
+        self._draw_cursor()
+
+    def _draw_row(self, top, key, label, style, values):
+        present = [value for value in values if value is not None]
+        if key == "skew":  # Symmetric around zero
+            high = max((abs(value) for value in present), default=0) or 1
+            low = -high
+        elif key == "n":
+            low, high = 0.0, 1.0
+        else:
+            low = min(present, default=0) if style == "line" else 0
+            high = max(present, default=0)
+            if high <= low:
+                high = low + 1
+
+        bottom = top + ROW_HEIGHT - 4
+        scale = (ROW_HEIGHT - 8) / (high - low)
+        self.canvas.create_line(0, top + ROW_HEIGHT, LABEL_WIDTH + self._plot_width(), top + ROW_HEIGHT,
+                                fill="#dddddd")
+        self.canvas.create_text(4, top + 4, text=label, anchor="nw", font=("TkDefaultFont", 8, "bold"))
+        self.canvas.create_text(4, top + 16, text=f"{low:.3g} to {high:.3g}", anchor="nw", font=("TkDefaultFont", 7))
+
+        # Each unbroken stretch of values becomes one item; pixels without data are left blank
+        segments, segment = [], []
+        for column, value in enumerate(values):
+            if value is None:
+                if segment:
+                    segments.append(segment)
+                segment = []
+            else:
+                segment.append((LABEL_WIDTH + column, bottom - (value - low) * scale))
+        if segment:
+            segments.append(segment)
+
+        for segment in segments:
+            if style == "area":
+                last_x, last_y = segment[-1]
+                points = [(segment[0][0], bottom)] + segment + [(last_x + 1, last_y), (last_x + 1, bottom)]
+                self.canvas.create_polygon(*[c for point in points for c in point], fill=COLORS[key], outline="")
+            elif len(segment) > 1:
+                self.canvas.create_line(*[c for point in segment for c in point], fill=COLORS[key])
+            else:
+                x, y = segment[0]
+                self.canvas.create_line(x, y, x + 1, y, fill=COLORS[key])
+
+    def _draw_axis(self, top):
+        width = self._plot_width()
+        for tick in range(5):
+            x = LABEL_WIDTH + tick * (width - 1) / 4
+            self.canvas.create_line(x, top, x, top + 4, fill="grey")
+            anchor = "nw" if tick == 0 else "ne" if tick == 4 else "n"
+            self.canvas.create_text(x, top + 3, text=f"{self._position(x):,}", anchor=anchor,
+                                    font=("TkDefaultFont", 7), fill="grey")
+
+    def _draw_cursor(self):
+        self.canvas.delete("cursor")
+        if self.cursor is None or self.name is None:
+            return
+        start, end = self.cursor
+        if end <= self.start or start >= self.end:
+            return
+        left = max(LABEL_WIDTH, self._x(start))
+        right = max(left + 2, min(LABEL_WIDTH + self._plot_width(), self._x(end)))
+        self.canvas.create_rectangle(left, 0, right, int(self.canvas["height"]) - AXIS_HEIGHT,
+                                     outline="red", tags="cursor")
+
+    ##################
+    # Mouse handlers #
+    ##################
+
+    def _on_press(self, event):
+        self._press = (event.x, self.start)
+
+    def _on_drag(self, event):
+        if self._press is None or self.name is None:
+            return
+        x, start = self._press
+        span = self.end - self.start
+        self._set_range(start + int((x - event.x) / self._plot_width() * span), span)
+
+    def _on_release(self, event):
+        if self._press is not None and abs(event.x - self._press[0]) < 3 and event.x >= LABEL_WIDTH:
+            if self.navigate and self.name is not None:
+                self.navigate(self._position(event.x))
+        self._press = None
+
+    def _on_motion(self, event):
+        column = event.x - LABEL_WIDTH
+        if self.name is None or column < 0:
+            self.readout.config(text="")
+            return
+        parts = [f"{self.name}:{self._position(event.x) + 1:,}"]
+        for key, label, _ in ROWS:
+            values = self._profile.get(key)
+            if values and column < len(values) and values[column] is not None:
+                value = values[column]
+                parts.append(f"{label} {value:.1%}" if key == "n" else f"{label} {value:.3g}")
+        self.readout.config(text="   ".join(parts))
@@ -0,0 +1,189 @@
+'''
+Multi-resolution genome tracks.
+
+Base composition is counted in 1 kb bins while the FASTA streams past on
+loading (in the same pass that collects the assembly statistics), and
+gene starts are binned once the annotation has been parsed. Every track
+of a scaffold is kept as a pyramid of levels, each one summing ten bins
+of the level below (1 kb, 10 kb, 100 kb, 1 Mb), so a view of any width
+is drawn from the coarsest level that still resolves it and never reads
+more than a few bins per pixel, whatever the length of the scaffold.
+
+Counts are sums, so GC %, GC skew, N fraction and gene density of any
+window are exact ratios of the summed bins.
+'''
+
+#######################
+# Importing Libraries #
+#######################
+
+from array import array
+
+from feature_graph import GENE_FEATURES
+from instrumentation import timed
+
+BIN_SIZE = 1000     # Bases per bin of the finest level
+LEVEL_FACTOR = 10   # Bins of a level summed into one bin of the next
+LEVEL_COUNT = 4
+
+COMPOSITION_TRACKS = ("g", "c", "at", "n")
+# Each base becomes the one-letter class it is counted as, case-insensitively
+CLASS_TABLE = bytes.maketrans(b"GgCcAaTtNn", b"GGCCWWWWNN")
+
+
+###################################
+# Pyramid of one scaffold's track #
+###################################
+
+class TrackPyramid:
+    __slots__ = ("bin_size", "levels")
+
+    def __init__(self, bins, bin_size=BIN_SIZE):
+        self.bin_size = bin_size
+        self.levels = [bins]
+        while len(self.levels) < LEVEL_COUNT and len(self.levels[-1]) > 1:
+            below = self.levels[-1]
+            self.levels.append(array("I", [sum(below[i:i + LEVEL_FACTOR])
+                                           for i in range(0, len(below), LEVEL_FACTOR)]))
+
+    # Sums over count equal windows of [start, end) and the bases each sum covers.
+    # Every bin is counted in exactly one window; windows narrower than a bin repeat it.
+    def window_sums(self, start, end, count, length):
+        width = (end - start) / count
+        level = 0
+        while level + 1 < len(self.levels) and self.bin_size * LEVEL_FACTOR ** (level + 1) <= width:
+            level += 1
+        bins = self.levels[level]
+        size = self.bin_size * LEVEL_FACTOR ** level
+
+        sums, spans = [], []
+        for i in range(count):
+            first = int(start + i * width) // size
+            window_end = -(-end // size) if i == count - 1 else int(start + (i + 1) * width) // size
+            last = max(first + 1, window_end)
+            sums.append(sum(bins[first:last]))
+            spans.append(max(0, min(last * size, length) - first * size))
+        return sums, spans
+
+
+########################################
+# Tracks of every scaffold of a genome #
+########################################
+
+class GenomeTracks:
+    def __init__(self, bin_size=BIN_SIZE):
+        self.bin_size = bin_size
+        self.scaffolds = {}  # Scaffold -> {track name: TrackPyramid}
+
+    def __contains__(self, scaffold):
+        return scaffold in self.scaffolds
+
+    def add(self, scaffold, track, bins):
+        self.scaffolds.setdefault(scaffold, {})[track] = TrackPyramid(bins, self.bin_size)
+
+    # Per-window values over [start, end) of a scaffold of the given length:
+    # "gc" (%), "skew" ((G - C) / (G + C)), "n" (fraction) and "genes" or
+    # "features" (per Mb), for whichever tracks exist. None where undefined.
+    def profile(self, scaffold, start, end, count, length):
+        tracks = self.scaffolds.get(scaffold, {})
+        profile = {}
+        if "g" in tracks:
+            g, spans = tracks["g"].window_sums(start, end, count, length)
+            c, _ = tracks["c"].window_sums(start, end, count, length)
+            at, _ = tracks["at"].window_sums(start, end, count, length)
+            n, _ = tracks["n"].window_sums(start, end, count, length)
+            profile["gc"] = [100 * (gi + ci) / (gi + ci + ai) if gi + ci + ai else None
+                             for gi, ci, ai in zip(g, c, at)]
+            profile["skew"] = [(gi - ci) / (gi + ci) if gi + ci else None for gi, ci in zip(g, c)]
+            profile["n"] = [ni / span if span else None for ni, span in zip(n, spans)]
+        for name in ("genes", "features"):
+            if name in tracks:
+                counts, spans = tracks[name].window_sums(start, end, count, length)
+                profile[name] = [1e6 * value / span if span else None for value, span in zip(counts, spans)]
+        return profile
+
+
+#############################################
+# Builders for composition and gene density #
+#############################################
+
+# Fed the sequence of each scaffold in blocks without line breaks, as
+# StatsCollector passes them on
+class TrackBuilder:
+    def __init__(self, bin_size=BIN_SIZE):
+        self.bin_size = bin_size
+        self.tracks = GenomeTracks(bin_size)
+        self._name = None
+        self._bins = None
+        self._carry = b""  # Start of a bin that continues in the next block
+
+    def start_scaffold(self, name):
+        self._finish_scaffold()
+        self._name = name
+        self._bins = {track: array("H") for track in COMPOSITION_TRACKS}
+
+    def add_block(self, block):
+        if self._name is None:
+            return
+        data = self._carry + block.translate(CLASS_TABLE)
+        full = len(data) - len(data) % self.bin_size
+        self._count(data, 0, full)
+        self._carry = data[full:]
+
+    def finish(self):
+        self._finish_scaffold()
+        return self.tracks
+
+    def _count(self, data, begin, end):
+        g, c, at, n = (self._bins[track] for track in COMPOSITION_TRACKS)
+        count = data.count
+        for i in range(begin, end, self.bin_size):
+            j = i + self.bin_size
+            g.append(count(b"G", i, j))
+            c.append(count(b"C", i, j))
+            at.append(count(b"W", i, j))
+            n.append(count(b"N", i, j))
+
+    def _finish_scaffold(self):
+        if self._name is None:
+            return
+        if self._carry:
+            self._count(self._carry, 0, len(self._carry))
+        for track, bins in self._bins.items():
+            self.tracks.add(self._name, track, bins)
+        self._name, self._bins, self._carry = None, None, b""
+
+
+# Gene starts per bin, genes taken from the feature graph. Without any,
+# gene lines are binned, or every annotation row as a "features" track.
+@timed("annotations.gene_density")
+def gene_density(store, graph=None, bin_size=BIN_SIZE):
+    rows = []
+    if graph is not None:
+        for gene in graph.genes.values():
+            row = gene.row
+            if row is None and gene.transcripts:
+                transcript = graph.transcripts[gene.transcripts[0]]
+                parts = transcript.exon_rows or transcript.cds_rows
+                row = transcript.row if transcript.row is not None else (parts[0] if parts else None)
+            if row is not None:
+                rows.append(row)
+    track = "genes"
+    if not rows:
+        gene_codes = {code for feature, code in store.feature.lookup.items() if feature in GENE_FEATURES}
+        rows = [row for row, code in enumerate(store.feature.codes) if code in gene_codes]
+    if not rows:
+        rows, track = range(len(store)), "features"
+
+    by_scaffold = {}
+    scaffold_codes, starts = store.scaffold.codes, store.start
+    for row in rows:
+        by_scaffold.setdefault(scaffold_codes[row], []).append(max(0, starts[row] - 1) // bin_size)
+
+    tracks = GenomeTracks(bin_size)
+    for code, positions in by_scaffold.items():
+        bins = array("I", [0]) * (max(positions) + 1)
+        for position in positions:
+            bins[position] += 1
+        tracks.add(store.scaffold.categories[code], track, bins)
+    return tracks
@@ -0,0 +1,349 @@
+'''
+Lightweight performance instrumentation.
+
+Stages of work are wrapped in timing spans:
+
+    with recorder.span("fasta.index", bytes=size):
+        ...
+
+Each finished span records its wall and CPU time, the amounts it was
+given (bytes, rows, bases, ...) and the resident memory at its end, is
+added to per-stage totals (calls, time, throughput) and, when a log is
+set, written as one JSON line. Counters count events, and tracemalloc
+can track Python allocations while a session is being diagnosed. A
+cProfile capture covers the main thread and every background task.
+
+Instrumentation is off unless GENESCOPY_PROFILE is set or it is turned
+on from the GUI or the command line. While off, span() returns one shared
+object whose enter and exit do nothing, so instrumented code pays a
+method call per stage and nothing per row.
+
+Environment variables:
+    GENESCOPY_PROFILE=1               turn instrumentation on at start up
+    GENESCOPY_PROFILE_LOG=spans.jsonl append every span as a JSON line
+    GENESCOPY_TRACE_MEMORY=1          also track Python allocations
+'''
+
+#######################
+# Importing Libraries #
+#######################
+
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+try:
+    import resource  # Not available on Windows, where peak memory is not reported
+except ImportError:
+    resource = None
+
+RECENT_SPANS = 500  # Finished spans kept for the diagnostics panel
+RATE_UNITS = ("bytes", "rows", "bases", "regions", "transcripts")  # Amounts reported per second
+
+
+##################################
+# Functions to measure resources #
+##################################
+
+def rss_bytes():
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+# Resets the kernel's peak RSS of this process (Linux only); False where not possible
+def reset_peak_rss():
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_bytes():
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def megabytes(size):
+    return round(size / (1024 * 1024), 2)
+
+
+###############################
+# Spans recorded while on/off #
+###############################
+
+class Span:
+    __slots__ = ("recorder", "name", "amounts", "wall", "cpu")
+
+    def __init__(self, recorder, name, amounts):
+        self.recorder = recorder
+        self.name = name
+        self.amounts = amounts
+
+    def __enter__(self):
+        self.cpu = time.thread_time()
+        self.wall = time.perf_counter()
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        seconds = time.perf_counter() - self.wall
+        self.recorder.record(self.name, seconds, time.thread_time() - self.cpu,
+                             failed=kind is not None, **self.amounts)
+        return False
+
+    # Amounts only known inside the span (rows parsed, hits found, ...)
+    def add(self, **amounts):
+        for key, amount in amounts.items():
+            self.amounts[key] = self.amounts.get(key, 0) + amount
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        return False
+
+    def add(self, **amounts):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+###########################
+# Defining Recorder Class #
+###########################
+
+class Recorder:
+    def __init__(self, enabled=False, log_path=None, trace_memory=False):
+        self.enabled = enabled
+        self.log_path = log_path  # JSON lines, one per finished span
+        self.started = time.time()
+        self.totals = {}          # Span name -> [calls, seconds, cpu seconds, max seconds, {amount: total}]
+        self.counters = {}
+        self.recent = deque(maxlen=RECENT_SPANS)
+        self.profiler = None      # cProfile of the main thread while a capture runs
+        self._thread_profiles = []
+        self._lock = threading.Lock()
+        if trace_memory:
+            self.set_memory_tracking(True)
+
+    @classmethod
+    def from_environment(cls):
+        return cls(enabled=os.environ.get("GENESCOPY_PROFILE", "") not in ("", "0"),
+                   log_path=os.environ.get("GENESCOPY_PROFILE_LOG") or None,
+                   trace_memory=os.environ.get("GENESCOPY_TRACE_MEMORY", "") not in ("", "0"))
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+
+    def span(self, name, **amounts):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, amounts)
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            with self._lock:
+                self.counters[name] = self.counters.get(name, 0) + amount
+
+    # A stage timed by the caller, for work that cannot sit inside a with block (e.g. between yields)
+    def record(self, name, seconds, cpu_seconds=None, failed=False, **amounts):
+        if not self.enabled:
+            return
+        entry = {"event": "span", "name": name, "time": round(time.time(), 3), "seconds": round(seconds, 6),
+                 "thread": threading.current_thread().name, "rss_mb": megabytes(rss_bytes())}
+        if cpu_seconds is not None:
+            entry["cpu_seconds"] = round(cpu_seconds, 6)
+        if failed:
+            entry["failed"] = True
+        entry.update(amounts)
+        for unit in RATE_UNITS:
+            if unit in amounts and seconds > 0:
+                entry[f"{unit}_per_second"] = round(amounts[unit] / seconds, 1)
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            entry["traced_mb"], entry["traced_peak_mb"] = megabytes(current), megabytes(peak)
+
+        with self._lock:
+            total = self.totals.get(name)
+            if total is None:
+                total = self.totals[name] = [0, 0.0, 0.0, 0.0, {}]
+            total[0] += 1
+            total[1] += seconds
+            total[2] += cpu_seconds or 0.0
+            total[3] = max(total[3], seconds)
+            for key, amount in amounts.items():
+                if isinstance(amount, (int, float)) and not isinstance(amount, bool):
+                    total[4][key] = total[4].get(key, 0) + amount
+            self.recent.append(entry)
+            if self.log_path:
+                self._write_log(entry)
+
+    def _write_log(self, entry):
+        try:
+            with open(self.log_path, "a") as file:
+                file.write(json.dumps(entry) + "\n")
+        except OSError:
+            self.log_path = None  # Logging is best effort, a bad path turns it off
+
+    def latest(self):
+        with self._lock:
+            return self.recent[-1] if self.recent else None
+
+    def reset(self):
+        with self._lock:
+            self.totals.clear()
+            self.counters.clear()
+            self.recent.clear()
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        reset_peak_rss()
+
+    ########################
+    # Memory and profiling #
+    ########################
+
+    def set_memory_tracking(self, tracking):
+        if tracking and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif not tracking and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def start_profile(self):
+        if self.profiler is not None:
+            return
+        self._thread_profiles = []
+        self.profiler = cProfile.Profile()
+        try:
+            self.profiler.enable()
+        except ValueError:  # Another profiler (a debugger, coverage) owns the hook
+            self.profiler = None
+
+    # Run function under its own profile while a capture is on; used by
+    # background tasks, since a cProfile only sees the thread that enabled it
+    def profiled(self, function, *args):
+        if self.profiler is None:
+            return function(*args)
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            return function(*args)
+        try:
+            return function(*args)
+        finally:
+            profile.disable()
+            with self._lock:
+                self._thread_profiles.append(profile)
+
+    # Stops the capture; returns pstats.Stats over every profiled thread, or None
+    def stop_profile(self, save_path=None):
+        if self.profiler is None:
+            return None
+        self.profiler.disable()
+        stats = pstats.Stats(self.profiler)
+        with self._lock:
+            for profile in self._thread_profiles:
+                stats.add(profile)
+            self._thread_profiles = []
+        self.profiler = None
+        if save_path:
+            stats.dump_stats(save_path)
+        return stats
+
+    @property
+    def profiling(self):
+        return self.profiler is not None
+
+    @property
+    def memory_tracking(self):
+        return tracemalloc.is_tracing()
+
+    ###################
+    # Reading results #
+    ###################
+
+    # Per-stage totals, slowest first: (name, calls, seconds, mean, max, cpu seconds, amounts)
+    def stage_totals(self):
+        with self._lock:
+            totals = [(name, calls, seconds, seconds / calls, longest, cpu, dict(amounts))
+                      for name, (calls, seconds, cpu, longest, amounts) in self.totals.items()]
+        totals.sort(key=lambda stage: -stage[2])
+        return totals
+
+    def memory(self):
+        memory = {"rss_mb": megabytes(rss_bytes()), "peak_rss_mb": megabytes(peak_rss_bytes())}
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            memory.update(traced_mb=megabytes(current), traced_peak_mb=megabytes(peak))
+        return memory
+
+    def snapshot(self):
+        stages = []
+        for name, calls, seconds, mean, longest, cpu, amounts in self.stage_totals():
+            stage = {"name": name, "calls": calls, "seconds": round(seconds, 6), "mean_seconds": round(mean, 6),
+                     "max_seconds": round(longest, 6), "cpu_seconds": round(cpu, 6), **amounts}
+            for unit in RATE_UNITS:
+                if unit in amounts and seconds > 0:
+                    stage[f"{unit}_per_second"] = round(amounts[unit] / seconds, 1)
+            stages.append(stage)
+        with self._lock:
+            counters, recent = dict(self.counters), list(self.recent)
+        return {"enabled": self.enabled, "time": round(time.time(), 3),
+                "uptime_seconds": round(time.time() - self.started, 3), "python": sys.version.split()[0],
+                "platform": sys.platform, "memory": self.memory(), "stages": stages, "counters": counters,
+                "recent": recent}
+
+    def write_json(self, save_path):
+        with open(save_path, "w") as file:
+            json.dump(self.snapshot(), file, indent=2)
+
+
+# Top functions of a profile by cumulative time, as text
+def profile_report(stats, limit=30):
+    stream = io.StringIO()
+    stats.stream = stream
+    stats.sort_stats("cumulative").print_stats(limit)
+    return stream.getvalue()
+
+
+# The recorder shared by the whole application
+recorder = Recorder.from_environment()
+
+
+# Decorator timing every call of a function as a span while instrumentation is on
+def timed(name):
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not recorder.enabled:
+                return function(*args, **kwargs)
+            with Span(recorder, name, {}):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
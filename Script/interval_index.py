@@ -0,0 +1,149 @@
+'''
+Interval index for region queries over annotation rows.
+
+Features of each scaffold are arranged as a nested containment list
+(NCList): every list is sorted by start and none of its intervals
+contains another, so both starts and ends increase along a list and the
+first overlapping interval is found by binary search. Intervals that are
+contained in another one live in that interval's sublist. An overlap
+query therefore costs O(log n + k). Extra copies of the features sorted by
+end and by start answer nearest-feature lookups.
+
+Coordinates follow GTF/GFF: 1-based and inclusive at both ends.
+'''
+
+#######################
+# Importing Libraries #
+#######################
+
+from array import array
+from bisect import bisect_left, bisect_right
+
+from instrumentation import timed
+
+
+#####################################
+# NCList for the rows of a scaffold #
+#####################################
+
+class ScaffoldIntervals:
+    def __init__(self, starts, ends, rows):
+        # Sort by start, longest first, so a container always precedes its contents
+        order = sorted(range(len(rows)), key=lambda i: (starts[i], -ends[i]))
+
+        # Attach every interval to the innermost interval that contains it
+        children = {-1: []}
+        stack = []
+        for i in order:
+            while stack and ends[stack[-1]] < ends[i]:
+                stack.pop()
+            children[stack[-1] if stack else -1].append(i)
+            children[i] = []
+            stack.append(i)
+
+        # Lay every sublist out contiguously; sub_begin/sub_end point at a node's children
+        self.starts = array("q")
+        self.ends = array("q")
+        self.rows = array("I")
+        self.sub_begin = array("q")
+        self.sub_end = array("q")
+
+        pending = [(-1, None)]  # (interval, slot of its parent entry)
+        while pending:
+            node, parent_slot = pending.pop()
+            members = children[node]
+            if not members:
+                continue
+            begin = len(self.rows)
+            if parent_slot is not None:
+                self.sub_begin[parent_slot] = begin
+                self.sub_end[parent_slot] = begin + len(members)
+            for i in members:
+                self.starts.append(starts[i])
+                self.ends.append(ends[i])
+                self.rows.append(rows[i])
+                self.sub_begin.append(0)
+                self.sub_end.append(0)
+            for offset, i in enumerate(members):
+                pending.append((i, begin + offset))
+        self.top_end = len(children[-1])
+
+        # Separate views sorted by end and by start for nearest-feature queries
+        by_end = sorted(range(len(rows)), key=lambda i: ends[i])
+        self.sorted_ends = array("q", (ends[i] for i in by_end))
+        self.rows_by_end = array("I", (rows[i] for i in by_end))
+        by_start = sorted(range(len(rows)), key=lambda i: starts[i])
+        self.sorted_starts = array("q", (starts[i] for i in by_start))
+        self.rows_by_start = array("I", (rows[i] for i in by_start))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def overlap(self, start, end):
+        hits = []
+        lists = [(0, self.top_end)]
+        while lists:
+            begin, stop = lists.pop()
+            # Ends increase along a list, skip everything that ends before the query
+            position = bisect_left(self.ends, start, begin, stop)
+            while position < stop and self.starts[position] <= end:
+                hits.append(self.rows[position])
+                if self.sub_end[position] > self.sub_begin[position]:
+                    lists.append((self.sub_begin[position], self.sub_end[position]))
+                position += 1
+        return hits
+
+    # Closest feature ending before position and closest starting after it
+    def flanking(self, position):
+        upstream = bisect_left(self.sorted_ends, position) - 1
+        downstream = bisect_right(self.sorted_starts, position)
+        before = self.rows_by_end[upstream] if upstream >= 0 else None
+        after = self.rows_by_start[downstream] if downstream < len(self.sorted_starts) else None
+        return before, after
+
+
+###########################################
+# Per-scaffold interval index for a store #
+###########################################
+
+class IntervalIndex:
+    @timed("annotations.interval_index")
+    def __init__(self, store):
+        grouped = {}
+        scaffold_codes = store.scaffold.codes
+        for row in range(len(store)):
+            grouped.setdefault(scaffold_codes[row], []).append(row)
+
+        self.store = store
+        self.scaffolds = {}
+        for code, rows in grouped.items():
+            self.scaffolds[store.scaffold.categories[code]] = ScaffoldIntervals(
+                [store.start[row] for row in rows], [store.end[row] for row in rows], rows)
+
+    # Rows overlapping scaffold:start-end, ordered by start position
+    def overlap(self, scaffold, start, end):
+        intervals = self.scaffolds.get(scaffold)
+        if intervals is None:
+            return []
+        hits = intervals.overlap(start, end)
+        hits.sort(key=lambda row: (self.store.start[row], row))
+        return hits
+
+    # Overlapping rows if any, otherwise the closest row on either side
+    def nearest(self, scaffold, start, end=None):
+        end = start if end is None else end
+        hits = self.overlap(scaffold, start, end)
+        if hits or scaffold not in self.scaffolds:
+            return hits
+
+        before, _ = self.scaffolds[scaffold].flanking(start)
+        _, after = self.scaffolds[scaffold].flanking(end)
+        candidates = []
+        if before is not None:
+            candidates.append((start - self.store.end[before], before))
+        if after is not None:
+            candidates.append((self.store.start[after] - end, after))
+        if not candidates:
+            return []
+        best = min(distance for distance, _ in candidates)
+        return [row for distance, row in candidates if distance == best]
@@ -0,0 +1,316 @@
+'''
+Sequence motif search over every scaffold of an assembly.
+
+Patterns may be exact sequences, IUPAC-degenerate motifs (N, R, Y, ...)
+or sets of either. A set is merged into one prefix tree, turned into a
+single regular expression, so every position of the genome is examined
+once for all patterns, as an Aho-Corasick automaton would, but inside
+the C regex engine. The minus strand is searched by scanning the forward
+sequence for the reverse complement of each pattern, so no reverse
+complemented copy of the genome is made. Matching ignores case, so
+soft-masked sequence is searched too.
+
+Scaffolds are cut into overlapping chunks that are scanned on a process
+pool. Hits are kept in compact columns and can be written as BED.
+'''
+
+#######################
+# Importing Libraries #
+#######################
+
+import multiprocessing
+import re
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+
+from fasta_index import IndexedFasta
+from instrumentation import timed
+
+CHUNK_SIZE = 8 * 1024 * 1024  # Bases scanned per task
+MAX_HITS = 2_000_000           # Hits kept before the search stops collecting
+
+IUPAC = {
+    "A": "A", "C": "C", "G": "G", "T": "T", "U": "T",
+    "R": "AG", "Y": "CT", "S": "CG", "W": "AT", "K": "GT", "M": "AC",
+    "B": "CGT", "D": "AGT", "H": "ACT", "V": "ACG", "N": "ACGT",
+}
+IUPAC_COMPLEMENT = str.maketrans("ACGTURYSWKMBDHVN", "TGCAAYRSWMKVHDBN")
+
+
+class MotifError(ValueError):
+    pass
+
+
+#####################################
+# Functions to compile pattern sets #
+#####################################
+
+# "GAATTC", "EcoRI=GAATTC" or several separated by commas/whitespace -> [(name, sequence)]
+def parse_patterns(text):
+    patterns = []
+    for item in re.split(r"[,\s]+", text.strip()):
+        if not item:
+            continue
+        name, _, sequence = item.rpartition("=")
+        sequence = sequence.upper()
+        if not sequence or any(base not in IUPAC for base in sequence):
+            raise MotifError(f"'{item}' is not a DNA or IUPAC sequence")
+        patterns.append((name or sequence, sequence))
+    if not patterns:
+        raise MotifError("No pattern given")
+    return patterns
+
+
+def reverse_complement_pattern(sequence):
+    return sequence.translate(IUPAC_COMPLEMENT)[::-1]
+
+
+def _token(base):
+    bases = IUPAC[base]
+    return bases if len(bases) == 1 else f"[{bases}]"
+
+
+# Regular expression of a prefix tree over the patterns' tokens
+def _trie_regex(sequences):
+    trie = {}
+    for sequence in sequences:
+        node = trie
+        for base in sequence:
+            node = node.setdefault(_token(base), {})
+        node[""] = {}  # End of a pattern
+
+    def build(node):
+        ends_here = "" in node
+        branches = [token + build(child) for token, child in sorted(node.items()) if token]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if ends_here:  # A shorter pattern ends here, the longer ones continue
+            return "(?:" + body + ")?"
+        return body
+
+    return re.compile(build(trie))
+
+
+class MotifSet:
+    def __init__(self, patterns):
+        self.names = [name for name, _ in patterns]
+        self.sequences = [sequence for _, sequence in patterns]
+        self.lengths = [len(sequence) for sequence in self.sequences]
+        self.max_length = max(self.lengths)
+
+        # Palindromic patterns (e.g. GAATTC) are only reported once, on the plus strand
+        self.strands = {"+": list(range(len(patterns)))}
+        self.strands["-"] = [index for index, sequence in enumerate(self.sequences)
+                             if reverse_complement_pattern(sequence) != sequence]
+
+        self._scanners = {}
+        for strand, indexes in self.strands.items():
+            if not indexes:
+                continue
+            oriented = {index: (self.sequences[index] if strand == "+"
+                                else reverse_complement_pattern(self.sequences[index])) for index in indexes}
+            self._scanners[strand] = (_trie_regex(oriented.values()), self._identifier(oriented))
+
+    # Function telling which patterns start at a position where the combined regex matched
+    @staticmethod
+    def _identifier(oriented):
+        exact = {}    # Length -> {sequence: [pattern indexes]}
+        degenerate = []
+        for index, sequence in oriented.items():
+            if all(base in "ACGT" for base in sequence):
+                exact.setdefault(len(sequence), {}).setdefault(sequence, []).append(index)
+            else:
+                degenerate.append((index, re.compile("".join(_token(base) for base in sequence))))
+
+        def identify(text, position):
+            found = []
+            for length, table in exact.items():
+                found.extend(table.get(text[position:position + length], ()))
+            for index, regex in degenerate:
+                if regex.match(text, position):
+                    found.append(index)
+            return found
+        return identify
+
+    # Hits in text (already uppercase) starting before limit, as (start, pattern index, strand);
+    # the first max_hits in position order over both strands
+    def scan(self, text, limit=None, offset=0, max_hits=MAX_HITS):
+        limit = len(text) if limit is None else limit
+        hits = []
+        for strand, (regex, identify) in self._scanners.items():
+            search = regex.search
+            position = 0
+            strand_hits = 0
+            while strand_hits < max_hits:
+                match = search(text, position)
+                if match is None or match.start() >= limit:
+                    break
+                start = match.start()
+                for index in identify(text, start):
+                    hits.append((offset + start, index, strand))
+                    strand_hits += 1
+                position = start + 1  # Overlapping hits are reported too
+            if len(hits) >= max_hits:
+                # Keep the first max_hits so far; the next strand only needs
+                # scanning up to (and including) the position of the last one
+                hits.sort()
+                del hits[max_hits:]
+                limit = min(limit, hits[-1][0] - offset + 1)
+        hits.sort()
+        return hits
+
+
+@lru_cache(maxsize=8)
+def compile_patterns(patterns):
+    return MotifSet(list(patterns))
+
+
+##############################
+# Hit list in column storage #
+##############################
+
+class MotifHits:
+    def __init__(self, motif_set, scaffold_names):
+        self.motif_set = motif_set
+        self.scaffold_names = list(scaffold_names)
+        self.scaffolds = array("I")  # Index into scaffold_names
+        self.starts = array("q")     # 0-based
+        self.patterns = array("I")
+        self.strands = bytearray()
+        self.truncated = False       # Stopped collecting at the hit limit
+        self._ranges = {}            # Scaffold name -> (first, end) hit numbers, hits are in assembly order
+
+    def __len__(self):
+        return len(self.starts)
+
+    # (scaffold, start, end, strand, pattern name) with 0-based, half-open coordinates
+    def __getitem__(self, index):
+        pattern = self.patterns[index]
+        start = self.starts[index]
+        return (self.scaffold_names[self.scaffolds[index]], start, start + self.motif_set.lengths[pattern],
+                chr(self.strands[index]), self.motif_set.names[pattern])
+
+    def extend(self, scaffold_index, hits):
+        name = self.scaffold_names[scaffold_index]
+        first = self._ranges.get(name, (len(self),))[0]
+        for start, pattern, strand in hits:
+            self.scaffolds.append(scaffold_index)
+            self.starts.append(start)
+            self.patterns.append(pattern)
+            self.strands.append(ord(strand))
+        if len(self) > first:
+            self._ranges[name] = (first, len(self))
+
+    # Counts per pattern name
+    def counts(self):
+        counts = dict.fromkeys(self.motif_set.names, 0)
+        for pattern in self.patterns:
+            counts[self.motif_set.names[pattern]] += 1
+        return counts
+
+    # Hits within [start, end) of a scaffold as (start, end) intervals, for viewer overlays
+    def intervals(self, scaffold, start, end):
+        if scaffold not in self._ranges:
+            return []
+        first, last = self._ranges[scaffold]
+        lengths = self.motif_set.lengths
+        intervals = []
+        for i in range(bisect_left(self.starts, start - self.motif_set.max_length + 1, first, last), last):
+            if self.starts[i] >= end:
+                break
+            hit_end = self.starts[i] + lengths[self.patterns[i]]
+            if hit_end > start:
+                intervals.append((self.starts[i], hit_end))
+        return intervals
+
+    def write_bed(self, save_path):
+        with open(save_path, "w") as f:
+            for index in range(len(self)):
+                scaffold, start, end, strand, name = self[index]
+                f.write(f"{scaffold}\t{start}\t{end}\t{name}\t0\t{strand}\n")
+
+
+####################################
+# Functions to search the assembly #
+####################################
+
+# Scaffold pieces of CHUNK_SIZE, each read with max_length - 1 bases of overlap
+def _chunks(fasta, chunk_size):
+    for scaffold_index, name in enumerate(fasta.names()):
+        for start in range(0, fasta.lengths[name], chunk_size):
+            yield scaffold_index, name, start, min(start + chunk_size, fasta.lengths[name])
+
+
+def _scan_chunk(fasta, motif_set, name, start, end, max_hits=MAX_HITS):
+    text = fasta.fetch(name, start, min(end + motif_set.max_length - 1, fasta.lengths[name])).upper()
+    return motif_set.scan(text, limit=end - start, offset=start, max_hits=max_hits)
+
+
+_worker_fasta = None
+
+
+# Runs once in each worker process: opens the FASTA with the parent's index
+# entries, so a FASTA without a usable .fai on disk is not indexed again
+def _init_worker(fasta_path, entries):
+    global _worker_fasta
+    _worker_fasta = IndexedFasta(fasta_path, entries=entries)
+
+
+# Runs in a worker process
+def _scan_chunk_worker(patterns, name, start, end, max_hits):
+    return _scan_chunk(_worker_fasta, compile_patterns(patterns), name, start, end, max_hits)
+
+
+# patterns is a list of (name, sequence). Hits come back in assembly order.
+@timed("motif.search")
+def search_fasta(fasta, patterns, workers=1, progress=None, max_hits=MAX_HITS, chunk_size=CHUNK_SIZE):
+    patterns = tuple(patterns)
+    motif_set = compile_patterns(patterns)
+    chunks = list(_chunks(fasta, chunk_size))
+    total = sum(fasta.lengths.values())
+    hits = MotifHits(motif_set, fasta.names())
+    results = {}  # Finished chunks waiting for the ones before them
+    state = {"next": 0, "done": 0}
+
+    # Appends finished chunks in order; False once a hit past the limit is found.
+    # Chunks collect one hit more than the limit, to tell a full result from a cut one.
+    def collect(number, chunk_hits):
+        results[number] = chunk_hits
+        state["done"] += chunks[number][3] - chunks[number][2]
+        if progress:
+            progress(state["done"], total)
+        while state["next"] in results:
+            chunk_hits = results.pop(state["next"])
+            room = max_hits - len(hits)
+            hits.extend(chunks[state["next"]][0], chunk_hits[:room])
+            state["next"] += 1
+            if len(chunk_hits) > room:  # Only truncated once a hit is actually dropped
+                hits.truncated = True
+                return False
+        return True
+
+    # Worker processes reopen the FASTA, which needs a file with cheap random access
+    if workers <= 1 or len(chunks) < 2 or getattr(fasta, "compression", "gzip") == "gzip":
+        for number, (_, name, start, end) in enumerate(chunks):
+            if not collect(number, _scan_chunk(fasta, motif_set, name, start, end, max_hits + 1)):
+                break
+        return hits
+
+    # Spawned rather than forked workers, so this is safe from the GUI's worker thread
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                             initargs=(fasta.path, list(fasta.entries.values()))) as pool:
+        futures = {pool.submit(_scan_chunk_worker, patterns, name, start, end, max_hits + 1): number
+                   for number, (_, name, start, end) in enumerate(chunks)}
+        try:
+            for future in as_completed(futures):
+                if not collect(futures[future], future.result()):
+                    pool.shutdown(cancel_futures=True)
+                    break
+        except BaseException:
+            pool.shutdown(cancel_futures=True)  # Cancelled or failed, drop the queued chunks
+            raise
+    return hits
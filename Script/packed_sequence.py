@@ -0,0 +1,238 @@
+'''
+Compact in-memory sequence store.
+
+When a whole assembly has to stay resident, bases are packed at 2 bits
+each (A, C, G, T) into a bytes buffer, a quarter of the size of the text.
+What does not fit in 2 bits is kept in sorted side tables: runs of N,
+other IUPAC codes and lowercase (soft-masked) intervals. Packing and
+unpacking work on whole buffers through big-integer shifts and
+bytes.translate, so no Python loop runs per base.
+
+PackedFasta offers the same interface as IndexedFasta (names, lengths,
+fetch, fetch_region, iter_chunks), so it can stand in for it in the
+viewer, exports and statistics.
+'''
+
+#######################
+# Importing Libraries #
+#######################
+
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+
+from fasta_index import SequenceAccess
+from instrumentation import timed
+
+CODES = b"ACGT"
+UNPACK_TABLE = bytes.maketrans(bytes(range(4)), CODES)
+N_RUN_PATTERN = re.compile(rb"N+")
+OTHER_PATTERN = re.compile(rb"[^ACGTN]")
+LOWER_PATTERN = re.compile(rb"[a-z]+")
+CHUNK_SIZE = 4 * 1024 * 1024  # Bases packed at a time while building
+
+# Number of 2-bit fields with a given code in each possible byte
+COUNT_TABLES = [bytes(sum((byte >> shift) & 3 == code for shift in (6, 4, 2, 0)) for byte in range(256))
+                for code in range(4)]
+
+
+def _pack_table():
+    table = bytearray(256)  # Anything that is not A, C, G or T packs as A (code 0)
+    for code, base in enumerate(CODES):
+        table[base] = code
+    return bytes(table)
+
+
+PACK_TABLE = _pack_table()
+
+
+################################################
+# Functions to pack and unpack 2-bit sequences #
+################################################
+
+# codes holds values 0-3 and a multiple of 4 of them; 4 codes go into each byte
+def _pack(codes):
+    size = len(codes) // 4
+    value = 0
+    for i, shift in enumerate((6, 4, 2, 0)):
+        # Each byte only has its low 2 bits set, so shifts never carry into the next byte
+        value |= int.from_bytes(codes[i::4], "big") << shift
+    return value.to_bytes(size, "big")
+
+
+def _unpack(packed):
+    size = len(packed)
+    value = int.from_bytes(packed, "big")
+    mask = int.from_bytes(b"\x03" * size, "big")
+    codes = bytearray(4 * size)
+    for i, shift in enumerate((6, 4, 2, 0)):
+        codes[i::4] = ((value >> shift) & mask).to_bytes(size, "big")
+    return codes
+
+
+# Total overlap of [start, end) with sorted, non-overlapping runs
+def _covered(starts, ends, start, end):
+    total = 0
+    i = bisect_right(ends, start)
+    while i < len(starts) and starts[i] < end:
+        total += min(ends[i], end) - max(starts[i], start)
+        i += 1
+    return total
+
+
+def _add_run(starts, ends, start, end):
+    if ends and ends[-1] == start:
+        ends[-1] = end  # Continues a run from the previous chunk
+    else:
+        starts.append(start)
+        ends.append(end)
+
+
+#################################
+# Packed sequence of a scaffold #
+#################################
+
+class PackedSequence:
+    __slots__ = ("name", "length", "packed", "n_starts", "n_ends",
+                 "other_positions", "other_bases", "lower_starts", "lower_ends")
+
+    def __init__(self, name):
+        self.name = name
+        self.length = 0
+        self.packed = bytearray()
+        self.n_starts, self.n_ends = array("q"), array("q")            # Runs of N, 0-based half-open
+        self.other_positions, self.other_bases = array("q"), bytearray()  # IUPAC codes other than N
+        self.lower_starts, self.lower_ends = array("q"), array("q")    # Soft-masked runs
+
+    def __len__(self):
+        return self.length
+
+    # Sequences are appended in chunks; all but the last must hold a multiple of 4 bases
+    def append(self, data):
+        offset = self.length
+        for match in LOWER_PATTERN.finditer(data):
+            _add_run(self.lower_starts, self.lower_ends, offset + match.start(), offset + match.end())
+        data = data.upper()
+        for match in N_RUN_PATTERN.finditer(data):
+            _add_run(self.n_starts, self.n_ends, offset + match.start(), offset + match.end())
+        for match in OTHER_PATTERN.finditer(data):
+            if match.group() != b"N":
+                self.other_positions.append(offset + match.start())
+                self.other_bases += match.group()
+
+        codes = data.translate(PACK_TABLE)
+        codes += bytes(-len(codes) % 4)
+        self.packed += _pack(codes)
+        self.length += len(data)
+
+    # Bases [start, end) as text, 0-based half-open
+    def fetch(self, start=0, end=None):
+        start = max(0, start)
+        end = self.length if end is None else min(end, self.length)
+        if start >= end:
+            return ""
+
+        first = start // 4
+        sequence = _unpack(self.packed[first:-(-end // 4)])
+        base = first * 4
+        sequence = sequence[start - base:end - base].translate(UNPACK_TABLE)
+
+        # Side tables are applied over the decoded window only
+        i = bisect_right(self.n_ends, start)
+        while i < len(self.n_starts) and self.n_starts[i] < end:
+            run_start, run_end = max(self.n_starts[i], start), min(self.n_ends[i], end)
+            sequence[run_start - start:run_end - start] = b"N" * (run_end - run_start)
+            i += 1
+        for i in range(bisect_left(self.other_positions, start), bisect_left(self.other_positions, end)):
+            sequence[self.other_positions[i] - start] = self.other_bases[i]
+        i = bisect_right(self.lower_ends, start)
+        while i < len(self.lower_starts) and self.lower_starts[i] < end:
+            run_start, run_end = max(self.lower_starts[i], start) - start, min(self.lower_ends[i], end) - start
+            sequence[run_start:run_end] = sequence[run_start:run_end].lower()
+            i += 1
+        return sequence.decode("ascii")
+
+    # Counts of A, C, G, T, N and other codes in [start, end), case-insensitive
+    def base_counts(self, start=0, end=None):
+        start = max(0, start)
+        end = self.length if end is None else min(end, self.length)
+        counts = [0, 0, 0, 0]
+        if start < end:
+            # Whole bytes are counted through lookup tables, the partial bytes at either end by decoding
+            first, last = -(-start // 4), end // 4
+            if first < last:
+                window = self.packed[first:last]
+                for code, table in enumerate(COUNT_TABLES):
+                    translated = window.translate(table)
+                    counts[code] = sum(value * translated.count(value) for value in (1, 2, 3, 4))
+                edges = [(start, min(end, first * 4)), (max(start, last * 4), end)]
+            else:
+                edges = [(start, end)]
+            for edge_start, edge_end in edges:
+                if edge_start < edge_end:
+                    base = edge_start // 4 * 4
+                    codes = _unpack(self.packed[edge_start // 4:-(-edge_end // 4)])
+                    codes = codes[edge_start - base:edge_end - base]
+                    for code in range(4):
+                        counts[code] += codes.count(code)
+
+        # N and other codes were packed as A
+        n = _covered(self.n_starts, self.n_ends, start, end)
+        other = bisect_left(self.other_positions, end) - bisect_left(self.other_positions, start)
+        counts[0] -= n + other
+        return {"A": counts[0], "C": counts[1], "G": counts[2], "T": counts[3], "N": n, "other": other}
+
+    def gc_fraction(self, start=0, end=None):
+        counts = self.base_counts(start, end)
+        acgt = counts["A"] + counts["C"] + counts["G"] + counts["T"]
+        return (counts["G"] + counts["C"]) / acgt if acgt else 0.0
+
+    def soft_masked(self, start=0, end=None):
+        end = self.length if end is None else min(end, self.length)
+        return _covered(self.lower_starts, self.lower_ends, max(0, start), end)
+
+    # Packed bytes plus side tables
+    def memory_size(self):
+        return (len(self.packed) + len(self.other_bases)
+                + 8 * (2 * len(self.n_starts) + len(self.other_positions) + 2 * len(self.lower_starts)))
+
+
+####################################
+# Packed store of a whole assembly #
+####################################
+
+class PackedFasta(SequenceAccess):
+    def __init__(self, sequences=()):
+        self.sequences = {sequence.name: sequence for sequence in sequences}
+        self.lengths = {name: sequence.length for name, sequence in self.sequences.items()}
+
+    # Pack every scaffold of an IndexedFasta (or any other SequenceAccess)
+    @classmethod
+    @timed("fasta.pack")
+    def from_fasta(cls, fasta, progress=None):
+        sequences = []
+        total = sum(fasta.lengths.values())
+        done = 0
+        for name in fasta.names():
+            sequence = PackedSequence(name)
+            for chunk in fasta.iter_chunks(name, CHUNK_SIZE):
+                sequence.append(chunk.encode("ascii"))
+                done += len(chunk)
+                if progress:
+                    progress(done, total)
+            sequence.packed = bytes(sequence.packed)
+            sequences.append(sequence)
+        return cls(sequences)
+
+    def __getitem__(self, name):
+        return self.sequences[name]
+
+    # Fetch bases [start, end) of a scaffold using 0-based, half-open coordinates
+    def fetch(self, name, start=0, end=None):
+        sequence = self.sequences.get(name)
+        if sequence is None:
+            raise KeyError(name)
+        return sequence.fetch(start, end)
+
+    def memory_size(self):
+        return sum(sequence.memory_size() for sequence in self.sequences.values())
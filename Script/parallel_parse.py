@@ -0,0 +1,233 @@
+'''
+Multi-core parsing of large GTF/GFF and FASTA files.
+
+A plain (uncompressed) file is cut at byte offsets into pieces of about
+PIECE_SIZE: annotation files just after a newline, FASTA files just
+before a '>' header, so every piece holds whole lines or whole records.
+Pieces are parsed on a process pool, each worker reading only its own
+byte range, and the partial results are merged in file order:
+
+- annotations come back as a columnar AnnotationStore, an unfinalized
+  SearchIndex and FeatureGraph over rows numbered from 0; merging
+  translates category codes and shifts row numbers, so the result is
+  the same as a serial parse.
+- FASTA pieces come back as .fai entries (with absolute offsets),
+  per-scaffold statistics and composition tracks, which are
+  concatenated.
+
+Small files, compressed input (which cannot be entered at an arbitrary
+offset) and workers <= 1 are parsed serially in this process. A FASTA
+made of one huge scaffold has no record boundary to cut at and is read
+by a single worker.
+'''
+
+#######################
+# Importing Libraries #
+#######################
+
+import io
+import mmap
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from annotations import AnnotationStore, parse_annotation_line, read_annotations
+from assembly_stats import MIN_GAP, AssemblyStats, StatsCollector
+from compressed import detect_format
+from fasta_index import build_fai, build_fai_range, read_current_fai, write_fai
+from feature_graph import FeatureGraph
+from genome_tracks import GenomeTracks, TrackBuilder
+from instrumentation import timed
+from search_index import SearchIndex
+
+PIECE_SIZE = 64 * 1024 * 1024        # Most bytes parsed per task
+MIN_PIECE_SIZE = 4 * 1024 * 1024     # Fewest, so small pieces do not drown in pickling
+PIECES_PER_WORKER = 4                # Keeps workers busy when pieces take uneven time
+MIN_PARALLEL_SIZE = 32 * 1024 * 1024  # Smaller files are parsed serially
+CHUNK_ROWS = 20000                    # Rows parsed before they are indexed, as in the serial loader
+
+
+##################################
+# Function to cut a file up      #
+##################################
+
+# Offsets [0, ..., size] cutting a plain file into about size / piece_size
+# ranges. Each cut is placed just after the '\n' of the next occurrence of
+# marker (b"\n" for lines, b"\n>" for FASTA records) at or after the target.
+def split_offsets(path, piece_size=PIECE_SIZE, marker=b"\n"):
+    size = os.path.getsize(path)
+    offsets = [0]
+    if size > piece_size:
+        with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for target in range(piece_size, size, piece_size):
+                if target <= offsets[-1]:
+                    continue  # The previous cut ran past this target
+                found = data.find(marker, target - 1)
+                if found < 0:
+                    break
+                if found + 1 < size:
+                    offsets.append(found + 1)
+    offsets.append(size)
+    return offsets
+
+
+def _piece_size(path, workers):
+    size = os.path.getsize(path) // (workers * PIECES_PER_WORKER)
+    return min(PIECE_SIZE, max(MIN_PIECE_SIZE, size))
+
+
+def _parallel(path, workers):
+    return workers > 1 and os.path.getsize(path) >= MIN_PARALLEL_SIZE and detect_format(path) == "plain"
+
+
+# Run worker(path, start, end, *args) over the ranges on a process pool and
+# hand results to merge(result, done_bytes) in file order
+def _map_ranges(path, offsets, workers, worker, args, merge):
+    ranges = list(zip(offsets, offsets[1:]))
+    results = {}  # Finished pieces waiting for the ones before them
+    following = 0
+    done = 0
+    # Spawned rather than forked workers, so this is safe from the GUI's worker thread
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges)), mp_context=context) as pool:
+        futures = {pool.submit(worker, path, start, end, *args): number
+                   for number, (start, end) in enumerate(ranges)}
+        try:
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+                while following in results:
+                    start, end = ranges[following]
+                    done += end - start
+                    merge(results.pop(following), done)
+                    following += 1
+        except BaseException:
+            pool.shutdown(cancel_futures=True)  # Cancelled or failed, drop the queued pieces
+            raise
+
+
+#######################################
+# Parallel GTF/GFF annotation parsing #
+#######################################
+
+# Runs in a worker process
+def _parse_annotation_range(path, start, end, index, graph):
+    with open(path, "rb") as file:
+        file.seek(start)
+        data = file.read(end - start)
+    store = AnnotationStore()
+    search_index = SearchIndex() if index else None
+    feature_graph = FeatureGraph() if graph else None
+
+    def add(rows):
+        if search_index is not None:
+            search_index.add_rows(len(store), rows)
+        if feature_graph is not None:
+            feature_graph.add_rows(len(store), rows)
+        store.extend(rows)
+
+    # Decoded with universal newlines, exactly as read_annotations reads the whole file
+    rows = []
+    for line in io.TextIOWrapper(io.BytesIO(data)):
+        row = parse_annotation_line(line)
+        if row is not None:
+            rows.append(row)
+            if len(rows) >= CHUNK_ROWS:
+                add(rows)
+                rows = []
+    add(rows)
+    if search_index is not None:
+        search_index._token_cache = {}  # Not needed by the parent, so not sent back
+    return store, search_index, feature_graph
+
+
+# Parse a GTF/GFF file into (store, search index, feature graph), the index
+# and graph finalized, or None when not asked for. Rows are added to store
+# (a new one by default) as pieces are merged; on_merged(store) is called
+# after each, so a table can grow while the file loads.
+@timed("annotations.parse_all")
+def parse_annotations(path, workers=1, progress=None, index=True, graph=True, store=None, on_merged=None):
+    store = AnnotationStore() if store is None else store
+    search_index = SearchIndex() if index else None
+    feature_graph = FeatureGraph() if graph else None
+
+    if not _parallel(path, workers):
+        for chunk in read_annotations(path, chunk_size=CHUNK_ROWS, progress=progress):
+            if search_index is not None:
+                search_index.add_rows(len(store), chunk)
+            if feature_graph is not None:
+                feature_graph.add_rows(len(store), chunk)
+            store.extend(chunk)
+            if on_merged:
+                on_merged(store)
+    else:
+        total = os.path.getsize(path)
+
+        def merge(result, done):
+            part_store, part_index, part_graph = result
+            offset = len(store)
+            if search_index is not None:
+                search_index.merge(part_index, offset)
+            if feature_graph is not None:
+                feature_graph.merge(part_graph, offset)
+            store.merge(part_store)
+            if on_merged:
+                on_merged(store)
+            if progress:
+                progress(done, total)
+
+        offsets = split_offsets(path, _piece_size(path, workers))
+        _map_ranges(path, offsets, workers, _parse_annotation_range, (index, graph), merge)
+
+    return (store, search_index.finalize() if search_index is not None else None,
+            feature_graph.finalize() if feature_graph is not None else None)
+
+
+##############################
+# Parallel FASTA indexing    #
+##############################
+
+# Runs in a worker process
+def _scan_fasta_range(path, start, end, min_gap):
+    builder = TrackBuilder()
+    collector = StatsCollector(min_gap, builder)
+    entries = build_fai_range(path, start, end, collector)
+    return entries, collector.finish().scaffolds, builder.finish().scaffolds
+
+
+# One pass over a FASTA collecting AssemblyStats and composition GenomeTracks,
+# and its .fai entries. An up to date .fai next to the file is reused as it
+# is; otherwise the entries built in the pass are written there when possible.
+@timed("fasta.scan")
+def scan_fasta(path, workers=1, progress=None, min_gap=MIN_GAP):
+    existing = read_current_fai(path)
+    entries, scaffolds = [], []
+    tracks = GenomeTracks()
+
+    if not _parallel(path, workers):
+        builder = TrackBuilder()
+        collector = StatsCollector(min_gap, builder)
+        entries = build_fai(path, progress, collector)
+        scaffolds = collector.finish().scaffolds
+        tracks = builder.finish()
+    else:
+        total = os.path.getsize(path)
+
+        def merge(result, done):
+            part_entries, part_scaffolds, part_tracks = result
+            entries.extend(part_entries)
+            scaffolds.extend(part_scaffolds)
+            tracks.scaffolds.update(part_tracks)
+            if progress:
+                progress(done, total)
+
+        offsets = split_offsets(path, _piece_size(path, workers), b"\n>")
+        _map_ranges(path, offsets, workers, _scan_fasta_range, (min_gap,), merge)
+
+    if existing is None:
+        try:
+            write_fai(entries, path + ".fai")
+        except OSError:
+            pass  # Read-only location, keep the index in memory only
+    else:
+        entries = existing
+    return entries, AssemblyStats(scaffolds, min_gap), tracks
@@ -0,0 +1,143 @@
+'''
+Inverted index for free-text search over annotation rows.
+
+Every row is tokenised once while the GTF/GFF loads. Each field keeps a
+map of lowercase token -> array of row indexes plus a sorted vocabulary,
+so a query term is answered by a binary search for its prefix instead of
+a scan over every row. Queries may scope terms to a field, for example
+"feature:CDS gene:psbA"; unscoped terms match any indexed field.
+'''
+
+#######################
+# Importing Libraries #
+#######################
+
+import re
+from array import array
+from bisect import bisect_left
+
+from instrumentation import timed
+
+TOKEN_PATTERN = re.compile(r"[0-9a-z]+")
+
+# Indexed fields and their position in a parsed annotation row
+SEARCH_FIELDS = {"scaffold": 0, "source": 1, "feature": 2, "product": 7, "gene_name": 8, "attributes": 9}
+
+# Field names accepted in "field:value" query terms
+FIELD_ALIASES = {
+    "scaffold": "scaffold", "seqid": "scaffold", "chr": "scaffold",
+    "source": "source",
+    "feature": "feature", "type": "feature",
+    "product": "product",
+    "gene": "gene_name", "gene_name": "gene_name", "name": "gene_name",
+    "attr": "attributes", "attributes": "attributes",
+}
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+##################################
+# Function to parse search query #
+##################################
+
+def parse_query(query):
+    # Returns a list of (field or None, token) pairs, all of which must match
+    terms = []
+    for word in query.split():
+        field = None
+        name, sep, value = word.partition(":")
+        if sep and name.lower() in FIELD_ALIASES:
+            field, word = FIELD_ALIASES[name.lower()], value
+        for token in tokenize(word):
+            terms.append((field, token))
+    return terms
+
+
+#######################################
+# Inverted index over annotation rows #
+#######################################
+
+class SearchIndex:
+    def __init__(self):
+        self.postings = {field: {} for field in SEARCH_FIELDS}
+        self.vocabulary = {}      # Field -> sorted tokens, built by finalize()
+        self._token_cache = {}    # Tokens of repeated short values (scaffold, feature, ...)
+        self.row_count = 0
+
+    # Index rows as returned by parse_annotation_line, numbered from first_row
+    def add_rows(self, first_row, rows):
+        cache = self._token_cache
+        for offset, row in enumerate(rows):
+            row_index = first_row + offset
+            for field, position in SEARCH_FIELDS.items():
+                text = row[position]
+                if field == "attributes":
+                    tokens = set(tokenize(text))
+                else:
+                    tokens = cache.get(text)
+                    if tokens is None:
+                        tokens = cache[text] = set(tokenize(text))
+                postings = self.postings[field]
+                for token in tokens:
+                    rows_for_token = postings.get(token)
+                    if rows_for_token is None:
+                        rows_for_token = postings[token] = array("I")
+                    rows_for_token.append(row_index)
+        self.row_count = max(self.row_count, first_row + len(rows))
+
+    # Add the postings of an unfinalized index over rows numbered from offset
+    def merge(self, other, offset):
+        for field, postings in self.postings.items():
+            for token, rows in other.postings[field].items():
+                shifted = array("I", map(offset.__add__, rows)) if offset else rows
+                mine = postings.get(token)
+                if mine is None:
+                    postings[token] = shifted
+                else:
+                    mine.extend(shifted)
+        self.row_count = max(self.row_count, offset + other.row_count)
+
+    def finalize(self):
+        self.vocabulary = {field: sorted(postings) for field, postings in self.postings.items()}
+        self._token_cache = {}
+        return self
+
+    ##############################
+    # Query evaluation functions #
+    ##############################
+
+    # Rows where a token in the field starts with prefix
+    def _prefix_rows(self, field, prefix):
+        vocabulary = self.vocabulary.get(field, [])
+        postings = self.postings[field]
+        rows = set()
+        position = bisect_left(vocabulary, prefix)
+        while position < len(vocabulary) and vocabulary[position].startswith(prefix):
+            rows.update(postings[vocabulary[position]])
+            position += 1
+        return rows
+
+    def _term_rows(self, field, token):
+        if field is not None:
+            return self._prefix_rows(field, token)
+        rows = set()
+        for name in SEARCH_FIELDS:
+            rows |= self._prefix_rows(name, token)
+        return rows
+
+    # Sorted row indexes matching every term of the query
+    @timed("search.query")
+    def search(self, query):
+        terms = parse_query(query)
+        if not terms:
+            return []
+
+        result = None
+        for field, token in terms:
+            rows = self._term_rows(field, token)
+            result = rows if result is None else result & rows
+            if not result:
+                return []
+        return sorted(result)
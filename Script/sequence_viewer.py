@@ -0,0 +1,206 @@
+'''
+Windowed sequence viewer for scaffolds of any length.
+
+Only the lines currently on screen (plus a small buffer) are written into
+the Text widget, with a fixed number of bases per line and a coordinate
+ruler. Scrolling is handled by the viewer itself, which fetches more
+sequence on demand. Highlights are kept as coordinate intervals and are
+drawn as tags over the visible lines only, so the size of the scaffold
+never reaches Tk.
+'''
+
+#######################
+# Importing Libraries #
+#######################
+
+import tkinter as tk
+from tkinter import font as tkfont
+from tkinter import ttk
+
+from instrumentation import timed
+
+
+#########################################
+# Defining Sequence Viewer Widget Class #
+#########################################
+
+class SequenceViewer(tk.Frame):
+    def __init__(self, master, line_width=100, buffer_lines=2, **kwargs):
+        super().__init__(master, **kwargs)
+        self.line_width = line_width      # Bases per line
+        self.buffer_lines = buffer_lines  # Extra lines rendered below the window
+        self.fetch = None                 # Called as fetch(start, end) with 0-based, half-open coordinates
+        self.name = None
+        self.length = 0
+        self.top_line = 0
+        self.visible_lines = 1
+        self.highlights = {}              # Tag -> list of (start, end) intervals, 0-based half-open
+        self.overlay_provider = None      # Called as provider(name, start, end) -> {tag: intervals}
+        self.view_listener = None         # Called as listener(start, end) after every render
+        self._cache_start = 0
+        self._cache = ""
+
+        self.text = tk.Text(self, wrap="none", font=("Courier", 11), state="disabled")
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.yview)
+        self.xscrollbar = ttk.Scrollbar(self, orient="horizontal", command=self.text.xview)
+        self.text.configure(xscrollcommand=self.xscrollbar.set)
+
+        self.scrollbar.pack(side="right", fill="y")
+        self.xscrollbar.pack(side="bottom", fill="x")
+        self.text.pack(side="left", fill="both", expand=True)
+
+        self.text.tag_configure("ruler", foreground="grey")
+        self.text.tag_configure("feature", background="#fff2a8")
+        self.text.tag_configure("motif", background="#b8e6b8")
+        self.text.tag_configure("highlight", background="cyan")
+
+        self.text.bind("<Configure>", self._on_resize)
+        self.text.bind("<MouseWheel>", lambda event: self.scroll(-3 if event.delta > 0 else 3))
+        self.text.bind("<Button-4>", lambda event: self.scroll(-3))
+        self.text.bind("<Button-5>", lambda event: self.scroll(3))
+
+    ########################
+    # Data source and tags #
+    ########################
+
+    def show(self, name, length, fetch, position=0):
+        self.name, self.length, self.fetch = name, length, fetch
+        self._cache_start, self._cache = 0, ""
+        self.highlights = {}
+        self.top_line = 0
+        self.scroll_to(position)
+
+    def clear(self):
+        self.name, self.length, self.fetch = None, 0, None
+        self._cache_start, self._cache = 0, ""
+        self.highlights = {}
+        self.top_line = 0
+        self.render()
+
+    def tag_configure(self, tag, **options):
+        self.text.tag_configure(tag, **options)
+        self.text.tag_raise("highlight")
+
+    def set_highlight(self, tag, intervals):
+        self.highlights[tag] = sorted(intervals)
+        self.render()
+
+    def clear_highlight(self, tag):
+        if self.highlights.pop(tag, None) is not None:
+            self.render()
+
+    # First and last base (0-based, half-open) currently rendered
+    def visible_range(self):
+        start = self.top_line * self.line_width
+        end = min(self.length, (self.top_line + self.visible_lines + self.buffer_lines) * self.line_width)
+        return start, end
+
+    #######################
+    # Scrolling functions #
+    #######################
+
+    @property
+    def total_lines(self):
+        return -(-self.length // self.line_width)
+
+    def scroll(self, lines):
+        self._set_top(self.top_line + lines)
+
+    def scroll_to(self, position):
+        self._set_top(position // self.line_width)
+
+    # Scroll only if position is off screen, then centre it
+    def see(self, position):
+        line = position // self.line_width
+        if not self.top_line <= line < self.top_line + self.visible_lines:
+            self._set_top(line - self.visible_lines // 2)
+
+    def _set_top(self, line):
+        self.top_line = max(0, min(line, self.total_lines - self.visible_lines))
+        self.render()
+
+    # Scrollbar protocol: ("moveto", fraction) or ("scroll", n, "units"/"pages")
+    def yview(self, *args):
+        if not args:
+            return
+        if args[0] == "moveto":
+            self._set_top(int(float(args[1]) * self.total_lines))
+        elif args[0] == "scroll":
+            self.scroll(int(args[1]) * (self.visible_lines if args[2] == "pages" else 1))
+
+    ###################
+    # Sequence access #
+    ###################
+
+    # Serve small scrolls from a cached slice a few screens wide
+    def _fetch_cached(self, start, end):
+        cache_end = self._cache_start + len(self._cache)
+        if not (self._cache_start <= start and end <= cache_end):
+            margin = 2 * (self.visible_lines + self.buffer_lines) * self.line_width
+            self._cache_start = max(0, start - margin)
+            self._cache = self.fetch(self._cache_start, min(self.length, end + margin))
+        return self._cache[start - self._cache_start:end - self._cache_start]
+
+    #######################
+    # Rendering functions #
+    #######################
+
+    def _ruler(self):
+        ticks = [" "] * self.line_width
+        for position in range(10, self.line_width + 1, 10):
+            label = str(position)
+            ticks[position - len(label):position] = label
+        return "".join(ticks)
+
+    @timed("view.render")
+    def render(self):
+        self.text.configure(state="normal")
+        self.text.delete(1.0, tk.END)
+
+        if self.fetch is None or self.length == 0:
+            self.text.configure(state="disabled")
+            self.scrollbar.set(0.0, 1.0)
+            return
+
+        start, end = self.visible_range()
+        sequence = self._fetch_cached(start, end)
+        gutter = len(f"{self.length:,}") + 1
+
+        lines = [" " * gutter + self._ruler()]
+        for offset in range(0, len(sequence), self.line_width):
+            lines.append(f"{start + offset + 1:>{gutter - 1},} {sequence[offset:offset + self.line_width]}")
+        self.text.insert(1.0, "\n".join(lines))
+
+        self.text.tag_add("ruler", "1.0", "1.end")
+        for line in range(2, len(lines) + 1):
+            self.text.tag_add("ruler", f"{line}.0", f"{line}.{gutter}")
+
+        # Overlays are clipped to the rendered lines and drawn one line segment at a time
+        overlays = dict(self.overlay_provider(self.name, start, end)) if self.overlay_provider else {}
+        overlays.update(self.highlights)
+        for tag, intervals in overlays.items():
+            for interval_start, interval_end in intervals:
+                self._tag_interval(tag, max(interval_start, start), min(interval_end, end), start, gutter)
+        self.text.tag_raise("highlight")
+
+        self.text.configure(state="disabled")
+        total = max(1, self.total_lines)
+        self.scrollbar.set(self.top_line / total, min(1.0, (self.top_line + self.visible_lines) / total))
+        if self.view_listener:
+            self.view_listener(start, min(self.length, start + self.visible_lines * self.line_width))
+
+    def _tag_interval(self, tag, interval_start, interval_end, window_start, gutter):
+        position = interval_start
+        while position < interval_end:
+            line, column = divmod(position - window_start, self.line_width)
+            segment_end = min(interval_end, position - column + self.line_width)
+            self.text.tag_add(tag, f"{line + 2}.{gutter + column}",
+                              f"{line + 2}.{gutter + column + segment_end - position}")
+            position = segment_end
+
+    def _on_resize(self, event):
+        line_height = tkfont.Font(font=self.text["font"]).metrics("linespace")
+        visible = max(1, event.height // max(1, line_height) - 1)  # One line goes to the ruler
+        if visible != self.visible_lines:
+            self.visible_lines = visible
+            self._set_top(self.top_line)
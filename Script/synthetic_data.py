@@ -0,0 +1,189 @@
+'''
+Seeded generator of synthetic assemblies and annotations.
+
+Writes a FASTA (scaffolds of varied length with a set GC content, N gaps
+and soft-masked stretches) and a matching GFF3 or GTF annotation (genes
+with one or two transcripts of several exons and CDS) of any size, from
+the scale of the O. tauri test data up to tens of Gb and millions of
+features. The same seed always produces the same files.
+
+Sequence is made a block at a time: random bytes are turned into bases
+with one bytes.translate, gaps and soft-masking are slice assignments,
+and line breaks are put back with a single strided assignment, so tens
+of Gb are written at disk speed rather than base by base.
+'''
+
+#######################
+# Importing Libraries #
+#######################
+
+import random
+
+LINE_WIDTH = 60
+BLOCK_LINES = 100_000  # Lines of sequence generated at a time (~6 MB)
+GAP_RATE = 1 / 200_000      # N gaps per base
+MASK_RATE = 1 / 20_000      # Soft-masked stretches per base
+FEATURES_PER_GENE = 12      # Average annotation lines per gene, used to size the gene count
+GENE_WORDS = ("kinase", "transporter", "synthase", "reductase", "binding protein", "helicase",
+              "phosphatase", "ribosomal protein", "photosystem protein", "hypothetical protein")
+
+# Sizes of the ready-made scales: genome size, scaffold count and annotation lines
+SCALES = {
+    "tauri": (13_000_000, 20, 100_000),
+    "small": (100_000_000, 200, 500_000),
+    "medium": (1_000_000_000, 1_000, 2_000_000),
+    "large": (10_000_000_000, 5_000, 5_000_000),
+    "huge": (30_000_000_000, 20_000, 10_000_000),
+}
+
+
+def _base_table(gc):
+    # 256 byte values split between G, C, A and T in proportion to the GC content
+    strong = round(256 * gc)
+    counts = [strong // 2, strong - strong // 2, (256 - strong) // 2, 256 - strong - (256 - strong) // 2]
+    table = b"".join(base * count for base, count in zip((b"G", b"C", b"A", b"T"), counts))
+    return bytes.maketrans(bytes(range(256)), table)
+
+
+# Scaffold lengths adding up to genome_size: a few long ones and a tail of short ones
+def scaffold_lengths(genome_size, scaffolds, seed=0):
+    rng = random.Random(seed)
+    weights = [rng.paretovariate(1.2) for _ in range(scaffolds)]
+    weights.sort(reverse=True)
+    total = sum(weights)
+    lengths = [max(1_000, int(genome_size * weight / total)) for weight in weights]
+    lengths[0] += genome_size - sum(lengths)  # Rounding goes to the longest scaffold
+    return [(f"scaffold_{index + 1}", length) for index, length in enumerate(lengths)]
+
+
+##################################
+# Function to write the assembly #
+##################################
+
+def write_fasta(path, lengths, seed=0, gc=0.45, width=LINE_WIDTH, progress=None):
+    rng = random.Random(seed)
+    table = _base_table(gc)
+    total = sum(length for _, length in lengths)
+    done = 0
+    with open(path, "wb") as handle:
+        for name, length in lengths:
+            handle.write(f">{name} synthetic length={length}\n".encode())
+            for block_start in range(0, length, BLOCK_LINES * width):
+                size = min(BLOCK_LINES * width, length - block_start)
+                handle.write(_sequence_block(rng, table, size, width))
+                done += size
+                if progress:
+                    progress(done, total)
+
+
+def _sequence_block(rng, table, size, width):
+    lines = -(-size // width)
+    block = bytearray(rng.randbytes(size + lines).translate(table))
+
+    # Positions below are in wrapped coordinates: a base at p sits at p + p // width
+    def wrapped(position):
+        return position + position // width
+
+    for _ in range(_events(rng, size * MASK_RATE)):
+        start = rng.randrange(size)
+        end = min(size, start + rng.randint(100, 5_000))
+        block[wrapped(start):wrapped(end)] = block[wrapped(start):wrapped(end)].lower()
+    for _ in range(_events(rng, size * GAP_RATE)):
+        start = rng.randrange(size)
+        end = min(size, start + rng.choice((100, 100, 500, 5_000, 50_000)))
+        block[wrapped(start):wrapped(end)] = b"N" * (wrapped(end) - wrapped(start))
+
+    # Line breaks overwrite every width+1-th byte; the last line may be short
+    block[width::width + 1] = b"\n" * len(range(width, len(block), width + 1))
+    del block[size + lines:]
+    block[-1:] = b"\n"
+    return bytes(block)
+
+
+# Number of events expected at a rate, as a whole number with the fraction drawn at random
+def _events(rng, expected):
+    whole = int(expected)
+    return whole + (rng.random() < expected - whole)
+
+
+####################################
+# Function to write the annotation #
+####################################
+
+# Genes spread over the scaffolds in proportion to their length. GFF3 uses
+# ID/Parent, GTF gene_id/transcript_id. Returns the number of lines written.
+def write_annotation(path, lengths, features, seed=0, annotation_format="gff3", progress=None):
+    rng = random.Random(seed + 1)
+    total_length = sum(length for _, length in lengths)
+    genes = max(1, features // FEATURES_PER_GENE)
+    lines = 0
+    gene_number = 0
+    with open(path, "w") as handle:
+        if annotation_format == "gff3":
+            handle.write("##gff-version 3\n")
+        for name, length in lengths:
+            count = round(genes * length / total_length)
+            # Evenly spaced slots, each holding one gene at a random offset
+            slot = length // max(1, count)
+            for index in range(count):
+                if slot < 600:
+                    break
+                gene_number += 1
+                start = index * slot + rng.randrange(1, slot // 3)
+                end = min(length, start + rng.randint(300, max(301, slot * 2 // 3)))
+                lines += _write_gene(handle, rng, name, gene_number, start, end, annotation_format)
+                if progress and gene_number % 10_000 == 0:
+                    progress(gene_number, genes)
+    return lines
+
+
+def _write_gene(handle, rng, scaffold, number, start, end, annotation_format):
+    strand = rng.choice("+-")
+    gene_id = f"GENE{number:07d}"
+    symbol = f"syn{number}"
+    product = f"{rng.choice(GENE_WORDS)} {number % 997}"
+    records = [("gene", start, end, ".", {"ID": gene_id, "Name": symbol, "gene_biotype": "protein_coding"})]
+
+    for isoform in range(1 + (rng.random() < 0.2)):
+        transcript_id = f"{gene_id}.t{isoform + 1}"
+        protein_id = f"PROT{number:07d}.{isoform + 1}"
+        exons = _exons(rng, start, end)
+        records.append(("mRNA", exons[0][0], exons[-1][1], ".",
+                        {"ID": transcript_id, "Parent": gene_id, "product": product}))
+        for exon_number, (exon_start, exon_end) in enumerate(exons, start=1):
+            records.append(("exon", exon_start, exon_end, ".",
+                            {"ID": f"{transcript_id}.exon{exon_number}", "Parent": transcript_id}))
+
+        # CDS phases follow the reading frame from the 5' end of the transcript
+        phase = 0
+        for exon_start, exon_end in (exons if strand == "+" else reversed(exons)):
+            records.append(("CDS", exon_start, exon_end, str(phase),
+                            {"ID": f"cds-{protein_id}", "Parent": transcript_id, "protein_id": protein_id,
+                             "product": product}))
+            phase = (phase - (exon_end - exon_start + 1)) % 3
+
+    for feature, feature_start, feature_end, frame, attributes in records:
+        if annotation_format == "gff3":
+            text = ";".join(f"{key}={value}" for key, value in attributes.items())
+        else:
+            text = _gtf_attributes(feature, gene_id, symbol, attributes)
+            feature = "transcript" if feature == "mRNA" else feature
+        handle.write(f"{scaffold}\tsynthetic\t{feature}\t{feature_start}\t{feature_end}\t.\t{strand}\t{frame}\t{text}\n")
+    return len(records)
+
+
+def _exons(rng, start, end):
+    count = min(rng.randint(1, 8), max(1, (end - start) // 150))
+    cuts = sorted(rng.sample(range(start + 1, end), 2 * (count - 1))) if count > 1 else []
+    bounds = [start] + cuts + [end]
+    return [(bounds[i], bounds[i + 1] - (i + 2 < len(bounds))) for i in range(0, len(bounds) - 1, 2)]
+
+
+def _gtf_attributes(feature, gene_id, symbol, attributes):
+    transcript_id = attributes.get("ID", "") if feature == "mRNA" else attributes.get("Parent", "")
+    text = f'gene_id "{gene_id}"; transcript_id "{"" if feature == "gene" else transcript_id}"; gene_name "{symbol}";'
+    if "product" in attributes:
+        text += f' product "{attributes["product"]}";'
+    if "protein_id" in attributes:
+        text += f' protein_id "{attributes["protein_id"]}";'
+    return text
@@ -0,0 +1,217 @@
+'''
+Virtual table widget for very large annotation files.
+
+A ttk.Treeview only ever holds as many items as fit on screen. Scrolling
+rewrites the values of those items from a row getter, so the cost of
+scrolling does not depend on how many rows the data source has.
+
+A view (an ascending list of row indexes, e.g. the result of a filter)
+can be set to show only some rows. The selection API always speaks in
+data source row indexes, whether a view is set or not.
+'''
+
+#######################
+# Importing Libraries #
+#######################
+
+import tkinter as tk
+from bisect import bisect_left
+from tkinter import ttk
+
+from instrumentation import timed
+
+
+#######################################
+# Defining Virtual Table Widget Class #
+#######################################
+
+class VirtualTable(tk.Frame):
+    def __init__(self, master, columns, headings, row_getter, **kwargs):
+        super().__init__(master, **kwargs)
+        self.row_getter = row_getter  # Called as row_getter(index) -> tuple of values
+        self.source_count = 0  # Rows in the data source
+        self.view = None       # Ascending row indexes shown, or None for all rows
+        self.row_count = 0     # Rows shown
+        self.top = 0           # Position of the first visible row
+        self.visible = 1       # Number of item slots in the Treeview
+        self.selected = None   # Position (not slot, not row index) of the selected row, or None
+
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", selectmode="browse")
+        for column, heading in zip(columns, headings):
+            self.tree.heading(column, text=heading)
+
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.yview)
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<<TreeviewSelect>>", self._on_tree_select)
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda event: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda event: self.scroll(3))
+        self.tree.bind("<Up>", lambda event: self._step_selection(-1))
+        self.tree.bind("<Down>", lambda event: self._step_selection(1))
+        self.tree.bind("<Prior>", lambda event: self._step_selection(-self.visible))
+        self.tree.bind("<Next>", lambda event: self._step_selection(self.visible))
+
+    ###################
+    # Data source API #
+    ###################
+
+    def set_row_count(self, count):
+        self.source_count = count
+        if self.view is None:
+            self._set_shown(count)
+
+    # Show only the given rows (ascending), or every row again with None
+    def set_view(self, rows):
+        selected = self.selection()
+        self.view = rows
+        self.selected = None
+        self.top = 0
+        self._set_shown(self.source_count if rows is None else len(rows))
+        if selected is not None:
+            self.selected = self._position(selected)
+            if self.selected is not None:
+                self.see(self.selected)
+
+    def clear(self):
+        self.selected = None
+        self.top = 0
+        self.view = None
+        self.set_row_count(0)
+
+    def _set_shown(self, count):
+        self.row_count = count
+        if self.selected is not None and self.selected >= count:
+            self.selected = None
+        self.top = max(0, min(self.top, count - self.visible))
+        self._render()
+
+    # Row index at a position and back; a row outside the view has no position
+    def _row(self, position):
+        return position if self.view is None else self.view[position]
+
+    def _position(self, row):
+        if self.view is None:
+            return row if 0 <= row < self.row_count else None
+        position = bisect_left(self.view, row)
+        return position if position < len(self.view) and self.view[position] == row else None
+
+    ##########################################
+    # Selection API (row indexes, not items) #
+    ##########################################
+
+    def selection(self):
+        return None if self.selected is None else self._row(self.selected)
+
+    def select(self, row):
+        self._select_position(None if row is None else self._position(row))
+
+    def _select_position(self, position):
+        if position is None or not 0 <= position < self.row_count:
+            self.selected = None
+        else:
+            self.selected = position
+            self.see(position)
+        self._render()
+        self.event_generate("<<TableSelect>>")
+
+    def clear_selection(self):
+        self.selected = None
+        self._render()
+
+    def see(self, position):
+        if position < self.top:
+            self.top = position
+        elif position >= self.top + self.visible:
+            self.top = position - self.visible + 1
+        self._render()
+
+    ###########################
+    # Scrolling and rendering #
+    ###########################
+
+    def scroll(self, rows):
+        top = max(0, min(self.top + rows, self.row_count - self.visible))
+        if top != self.top:
+            self.top = top
+            self._render()
+
+    # Scrollbar protocol: ("moveto", fraction) or ("scroll", n, "units"/"pages")
+    def yview(self, *args):
+        if not args:
+            return
+        if args[0] == "moveto":
+            self.top = max(0, min(int(float(args[1]) * self.row_count), self.row_count - self.visible))
+            self._render()
+        elif args[0] == "scroll":
+            step = int(args[1]) * (self.visible if args[2] == "pages" else 1)
+            self.scroll(step)
+
+    @timed("table.render")
+    def _render(self):
+        items = self.tree.get_children()
+        selected_item = None
+        for slot, item in enumerate(items):
+            position = self.top + slot
+            if position < self.row_count:
+                self.tree.item(item, values=self.row_getter(self._row(position)))
+                if position == self.selected:
+                    selected_item = item
+            else:
+                self.tree.item(item, values=())
+
+        # Mirror the row selection onto whichever slot currently shows it
+        if selected_item is None:
+            if self.tree.selection():
+                self.tree.selection_set(())
+        elif self.tree.selection() != (selected_item,):
+            self.tree.selection_set(selected_item)
+
+        if self.row_count:
+            first = self.top / self.row_count
+            last = min(1.0, (self.top + self.visible) / self.row_count)
+        else:
+            first, last = 0.0, 1.0
+        self.scrollbar.set(first, last)
+
+    def _on_resize(self, event):
+        items = self.tree.get_children()
+        bbox = self.tree.bbox(items[0]) if items else None
+        header, row_height = (bbox[1], bbox[3]) if bbox else (25, 20)
+        visible = max(1, (event.height - header) // max(1, row_height))
+        if visible == len(items):
+            return
+
+        self.visible = visible
+        for item in items[visible:]:
+            self.tree.delete(item)
+        for slot in range(len(items), visible):
+            self.tree.insert("", "end", iid=f"slot{slot}")
+        self.top = max(0, min(self.top, self.row_count - self.visible))
+        self._render()
+
+    ##################
+    # Event handlers #
+    ##################
+
+    def _on_tree_select(self, event):
+        items = self.tree.selection()
+        if not items:
+            return
+        position = self.top + self.tree.index(items[0])
+        if position >= self.row_count:
+            self.tree.selection_set(())
+        elif position != self.selected:
+            self.selected = position
+            self.event_generate("<<TableSelect>>")
+
+    def _on_mousewheel(self, event):
+        self.scroll(-3 if event.delta > 0 else 3)
+
+    def _step_selection(self, rows):
+        if self.row_count:
+            current = self.top if self.selected is None else self.selected
+            self._select_position(max(0, min(current + rows, self.row_count - 1)))
+        return "break"
@@ -0,0 +1,75 @@
+'''
+Shared fixtures: a small seeded synthetic assembly with GFF3 and GTF
+annotations, written once per test session, and its gzip and BGZF
+compressed copies.
+
+The application modules live side by side in Script/ and import each
+other by name, so that directory is put on the path here; spawned worker
+processes inherit it.
+'''
+
+import gzip
+import os
+import shutil
+import struct
+import sys
+import zlib
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Script"))
+
+from synthetic_data import scaffold_lengths, write_annotation, write_fasta  # noqa: E402
+
+SEED = 7
+GENOME_SIZE = 3_000_000
+SCAFFOLDS = 12
+FEATURES = 6_000
+LINE_WIDTH = 70  # Not the generator's default, so line arithmetic is exercised
+BGZF_EOF = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+
+
+def write_bgzf(data, path, block_size=65280):
+    # Minimal BGZF writer (as bgzip produces): gzip members with a BC extra field holding the block size
+    with open(path, "wb") as handle:
+        for start in range(0, len(data), block_size):
+            piece = data[start:start + block_size]
+            compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+            body = compressor.compress(piece) + compressor.flush()
+            handle.write(b"\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff" + struct.pack("<H", 6)
+                         + b"BC" + struct.pack("<HH", 2, len(body) + 25))
+            handle.write(body + struct.pack("<II", zlib.crc32(piece), len(piece)))
+        handle.write(BGZF_EOF)
+
+
+@pytest.fixture(scope="session")
+def dataset(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("synthetic")
+    lengths = scaffold_lengths(GENOME_SIZE, SCAFFOLDS, seed=SEED)
+    paths = {"lengths": lengths, "fasta": str(directory / "genome.fa"),
+             "gff3": str(directory / "genome.gff3"), "gtf": str(directory / "genome.gtf")}
+    write_fasta(paths["fasta"], lengths, seed=SEED, width=LINE_WIDTH)
+    write_annotation(paths["gff3"], lengths, FEATURES, seed=SEED)
+    write_annotation(paths["gtf"], lengths, FEATURES, seed=SEED, annotation_format="gtf")
+    return paths
+
+
+# Copy of the synthetic FASTA in a directory of its own, so tests that write
+# or remove a .fai do not affect each other
+@pytest.fixture
+def fasta_copy(dataset, tmp_path):
+    path = str(tmp_path / "genome.fa")
+    shutil.copyfile(dataset["fasta"], path)
+    return path
+
+
+@pytest.fixture(scope="session")
+def compressed_fastas(dataset, tmp_path_factory):
+    directory = tmp_path_factory.mktemp("compressed")
+    with open(dataset["fasta"], "rb") as handle:
+        data = handle.read()
+    gzip_path, bgzf_path = str(directory / "genome.fa.gz"), str(directory / "genome.bgzf.fa.gz")
+    with gzip.open(gzip_path, "wb") as handle:
+        handle.write(data)
+    write_bgzf(data, bgzf_path, block_size=16384)  # Small blocks, so fetches cross many of them
+    return {"gzip": gzip_path, "bgzf": bgzf_path}
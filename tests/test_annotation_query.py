@@ -0,0 +1,104 @@
+import random
+
+import pytest
+
+from annotation_query import AnnotationFrame, QueryError, parse_filters
+from annotations import AnnotationStore
+from parallel_parse import parse_annotations
+
+NUMERIC_OPERATORS = (">=", ">", "<=", "<", "=", "!=")
+
+
+def value(store, row, column):
+    if column == "length":
+        return store.end[row] - store.start[row] + 1
+    return store.column(column)[row]
+
+
+def brute_rows(store, filters):
+    rows = []
+    for row in range(len(store)):
+        for column, op, expected in filters:
+            actual = value(store, row, column)
+            if isinstance(actual, str):
+                names = expected if isinstance(expected, tuple) else expected.split(",")
+                matched = {"=": actual in names, "!=": actual not in names,
+                           "~": expected.lower() in actual.lower()}[op]
+            else:
+                matched = {">=": actual >= expected, ">": actual > expected, "<=": actual <= expected,
+                           "<": actual < expected, "=": actual == expected, "!=": actual != expected}[op]
+            if not matched:
+                break
+        else:
+            rows.append(row)
+    return rows
+
+
+def random_query(rng, store):
+    row = rng.randrange(len(store))
+    filters = []
+    for _ in range(rng.randint(1, 3)):
+        column = rng.choice(("scaffold", "feature", "strand", "gene_name", "product", "start", "end", "length"))
+        if column in ("start", "end", "length"):
+            op = rng.choice(NUMERIC_OPERATORS)
+            # Values taken from the data, so = and the edges of ranges are hit
+            number = value(store, rng.randrange(len(store)), column) + rng.choice((-1, 0, 0, 1))
+            filters.append(f"{column}{op}{number}")
+        else:
+            text = value(store, row, column)
+            op = rng.choice(("=", "!=", "~"))
+            if op == "~":
+                text = text[:rng.randint(1, 4)] if text else "x"
+            if not text or " " in text:
+                continue
+            filters.append(f"{column}{op}{text}")
+    return " ".join(filters)
+
+
+@pytest.fixture(scope="module")
+def frame(dataset):
+    return AnnotationFrame(parse_annotations(dataset["gff3"], index=False, graph=False)[0])
+
+
+def test_masks_match_brute_force(frame):
+    rng = random.Random(5)
+    store = frame.store
+    assert len(store.gene_name.categories) > 256  # Codes span more than one byte plane
+    for _ in range(150):
+        query = random_query(rng, store)
+        expected = brute_rows(store, parse_filters(query))
+        mask = frame.mask(query)
+        assert list(frame.rows(mask)) == expected, query
+        assert frame.count(mask) == len(expected)
+
+
+def test_many_code_groups_and_negative_coordinates():
+    # More distinct high code bytes than MAX_CODE_GROUPS, and a negative start (slow numeric path)
+    store = AnnotationStore()
+    for row in range(6_000):
+        store.append(("chr", "src", "gene", row - 5, row + 10, "+", ".", "", f"g{row}"))
+    frame = AnnotationFrame(store)
+    names = ",".join(f"g{row}" for row in range(0, 6_000, 7))
+    filters = parse_filters(f"gene_name={names} start<100")
+    assert list(frame.rows(frame.mask(filters))) == brute_rows(store, filters)
+    filters = parse_filters(f"gene_name!={names} start>=3")
+    assert list(frame.rows(frame.mask(filters))) == brute_rows(store, filters)
+
+
+def test_summary_matches_brute_force(frame):
+    store = frame.store
+    mask = frame.mask("feature=CDS")
+    expected = {}
+    for row in brute_rows(store, parse_filters("feature=CDS")):
+        key = (store.scaffold[row], store.strand[row])
+        count, total = expected.get(key, (0, 0))
+        expected[key] = (count + 1, total + value(store, row, "length"))
+    summary = frame.summary(mask, ("scaffold", "strand"))
+    assert {key: (count, total) for key, count, total, _ in summary} == expected
+    assert [group[1] for group in summary] == sorted((group[1] for group in summary), reverse=True)
+
+
+def test_bad_filters():
+    for text in ("length~3", "colour=red", "feature>CDS", "start>=abc"):
+        with pytest.raises(QueryError):
+            parse_filters(text)
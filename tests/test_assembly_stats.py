@@ -0,0 +1,60 @@
+import pytest
+
+import assembly_stats
+from assembly_stats import contiguity, stats_from_fasta, stats_from_index
+from fasta_index import IndexedFasta
+
+# s1 has a 10 base gap (a contig break), s2 a 5 base N run (too short to
+# break) and soft-masked bases, s3 starts with a 12 base gap
+SCAFFOLDS = {"s1": "A" * 30 + "N" * 10 + "GGGGCCCCTT" * 4,
+             "s2": "acgt" * 5 + "NNNNN" + "ACGT" * 5,
+             "s3": "N" * 12 + "ACGT" * 2}
+
+
+def test_contiguity_known_values():
+    nx, lx, aun = contiguity([10, 50, 80, 20, 40, 70, 30])  # 300 bases
+    assert nx == {10: 80, 20: 80, 30: 70, 40: 70, 50: 70, 60: 50, 70: 40, 80: 40, 90: 30}
+    assert lx == {10: 1, 20: 1, 30: 2, 40: 2, 50: 2, 60: 3, 70: 4, 80: 4, 90: 5}
+    assert aun == 16800 / 300
+    assert contiguity([]) == ({}, {}, 0.0)
+    assert contiguity([100]) == ({x: 100 for x in range(10, 100, 10)}, {x: 1 for x in range(10, 100, 10)}, 100.0)
+
+
+@pytest.fixture(params=[assembly_stats.FLUSH_SIZE, 8])
+def summary(request, tmp_path, monkeypatch):
+    # Also with tiny blocks, so N runs continue across block boundaries
+    monkeypatch.setattr(assembly_stats, "FLUSH_SIZE", request.param)
+    path = str(tmp_path / "small.fa")
+    with open(path, "w") as handle:
+        for name, sequence in SCAFFOLDS.items():
+            handle.write(f">{name} description\n")
+            handle.writelines(sequence[i:i + 7] + "\n" for i in range(0, len(sequence), 7))
+    summary = stats_from_fasta(path).summary()
+    with IndexedFasta(path) as fasta:
+        assert stats_from_index(fasta, chunk_size=9).summary() == summary
+    return summary
+
+
+def test_summary_known_values(summary):
+    assert (summary["total_length"], summary["scaffolds"]) == (145, 3)
+    assert (summary["largest_scaffold"], summary["smallest_scaffold"]) == ("s1", "s3")
+    assert (summary["n50"], summary["l50"], summary["n90"], summary["l90"]) == (80, 1, 20, 3)
+    assert summary["aun"] == (80 ** 2 + 45 ** 2 + 20 ** 2) / 145
+    assert (summary["gaps"], summary["gap_length"]) == (2, 22)
+    assert summary["gc_fraction"] == 56 / 118
+    assert summary["n_fraction"] == 27 / 145
+    assert summary["soft_masked_fraction"] == 20 / 145
+    # Contigs of 30, 40, 45 and 8 bases
+    assert (summary["contigs"], summary["contig_length"], summary["largest_contig"]) == (4, 123, 45)
+    assert (summary["contig_n50"], summary["contig_l50"]) == (40, 2)
+    assert summary["contig_aun"] == (45 ** 2 + 40 ** 2 + 30 ** 2 + 8 ** 2) / 123
+
+
+def test_min_gap():
+    collector = assembly_stats.StatsCollector(min_gap=5)
+    for name, sequence in SCAFFOLDS.items():
+        collector.start_scaffold(name)
+        collector.add_sequence(sequence.encode())
+    stats = collector.finish()
+    assert [list(stats.by_name[name].contig_lengths) for name in SCAFFOLDS] == [[30, 40], [20, 20], [8]]
+    assert stats.summary()["gaps"] == 3
@@ -0,0 +1,79 @@
+import os
+
+import pytest
+
+import cache as cache_module
+from cache import FileCache, fingerprint
+
+VALUE_SIZE = 10_000
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    paths = []
+    for name in ("a.fa", "b.fa", "c.fa"):
+        path = str(tmp_path / name)
+        with open(path, "w") as handle:
+            handle.write(f">{name}\n" + "ACGT" * 1000 + "\n")
+        paths.append(path)
+    return paths
+
+
+def test_round_trip_and_kinds(tmp_path, inputs):
+    cache = FileCache(str(tmp_path / "cache"))
+    assert cache.get("stats", inputs[0]) is None
+    assert cache.put("stats", inputs[0], {"n50": 4000})
+    assert cache.get("stats", inputs[0]) == {"n50": 4000}
+    assert cache.get("annotations", inputs[0]) is None
+    assert cache.get("stats", inputs[1]) is None
+    assert [name for name in os.listdir(cache.directory) if not name.endswith(".pkl")] == []
+
+
+def test_changed_file_misses(tmp_path, inputs):
+    cache = FileCache(str(tmp_path / "cache"))
+    path = inputs[0]
+    cache.put("stats", path, "old")
+    info = os.stat(path)
+    # Same size and modification time, only the content differs
+    with open(path, "r+") as handle:
+        handle.seek(10)
+        handle.write("T")
+    os.utime(path, ns=(info.st_atime_ns, info.st_mtime_ns))
+    assert fingerprint(path)[1:3] == (info.st_size, info.st_mtime_ns)
+    assert cache.get("stats", path) is None
+
+    cache.put("stats", path, "new")
+    os.utime(path, ns=(info.st_atime_ns, info.st_mtime_ns + 1_000_000_000))  # Touched
+    assert cache.get("stats", path) is None
+    cache.put("stats", path, "touched")
+    assert cache.get("stats", path) == "touched"
+
+
+def test_version_and_corrupt_entries_miss(tmp_path, inputs, monkeypatch):
+    cache = FileCache(str(tmp_path / "cache"))
+    cache.put("stats", inputs[0], "value")
+    with open(cache._entry_path("stats", inputs[0]), "wb") as handle:
+        handle.write(b"not a pickle")
+    assert cache.get("stats", inputs[0]) is None
+    cache.put("stats", inputs[1], "value")
+    monkeypatch.setattr(cache_module, "CACHE_VERSION", cache_module.CACHE_VERSION + 1)
+    assert cache.get("stats", inputs[1]) is None
+
+
+def test_least_recently_used_evicted(tmp_path, inputs):
+    cache = FileCache(str(tmp_path / "cache"), max_bytes=int(2.5 * VALUE_SIZE))
+    first, second, third = inputs
+    cache.put("stats", first, b"1" * VALUE_SIZE)
+    cache.put("stats", second, b"2" * VALUE_SIZE)
+    os.utime(cache._entry_path("stats", first), (1_000, 1_000))
+    os.utime(cache._entry_path("stats", second), (2_000, 2_000))
+    assert cache.get("stats", first) == b"1" * VALUE_SIZE  # Now the most recently used
+
+    cache.put("stats", third, b"3" * VALUE_SIZE)
+    assert cache.get("stats", second) is None
+    assert cache.get("stats", first) == b"1" * VALUE_SIZE
+    assert cache.get("stats", third) == b"3" * VALUE_SIZE
+    assert sum(size for _, size, _ in cache.entries()) <= cache.max_bytes
+
+    cache.clear()
+    assert cache.entries() == []
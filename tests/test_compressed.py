@@ -0,0 +1,50 @@
+import random
+import threading
+
+import pytest
+
+from compressed import BgzfReader, detect_format
+from fasta_index import IndexedFasta
+
+
+@pytest.mark.parametrize("kind", ["gzip", "bgzf"])
+def test_compressed_fetch_matches_plain(dataset, compressed_fastas, kind):
+    path = compressed_fastas[kind]
+    assert detect_format(path) == kind
+    rng = random.Random(2)
+    with IndexedFasta(dataset["fasta"]) as plain, IndexedFasta(path) as compressed:
+        assert compressed.compression == kind
+        assert compressed.entries == plain.entries
+        for _ in range(300):
+            name = rng.choice(plain.names())
+            start = rng.randrange(plain.lengths[name])
+            end = start + rng.choice((1, rng.randrange(1, 2_000), rng.randrange(1, 200_000)))
+            assert compressed.fetch(name, start, end) == plain.fetch(name, start, end)
+        name = plain.names()[-1]
+        assert compressed.fetch(name) == plain.fetch(name)
+
+
+def test_bgzf_reader_shared_between_threads(dataset, compressed_fastas):
+    with open(dataset["fasta"], "rb") as handle:
+        data = handle.read()
+    reader = BgzfReader(compressed_fastas["bgzf"], cache_blocks=4)  # Small cache, so blocks are evicted all the time
+    assert len(reader) == len(data)
+    errors = []
+
+    def read(seed):
+        rng = random.Random(seed)
+        try:
+            for _ in range(2_000):
+                start = rng.randrange(len(data))
+                end = start + rng.randrange(1, 20_000)
+                assert reader.read(start, end) == data[start:end]
+        except Exception as e:  # Reported from the main thread
+            errors.append(e)
+
+    threads = [threading.Thread(target=read, args=(seed,)) for seed in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    reader.close()
+    assert errors == []
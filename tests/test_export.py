@@ -0,0 +1,117 @@
+import csv
+import os
+
+import pytest
+
+from export import Region, export_regions, read_regions, regions_from_annotations
+from fasta_index import IndexedFasta
+from parallel_parse import parse_annotations
+
+COMPLEMENT = {"A": "T", "C": "G", "G": "C", "T": "A", "N": "N", "a": "t", "c": "g", "g": "c", "t": "a", "n": "n"}
+
+
+def read_records(path):
+    records, header = [], None
+    with open(path) as handle:
+        for line in handle:
+            line = line.rstrip("\n")
+            if line.startswith(">"):
+                header = line[1:]
+                records.append([header, ""])
+            else:
+                records[-1][1] += line
+    return [tuple(record) for record in records]
+
+
+def expected_sequence(fasta, region):
+    # Clipped to the scaffold end, reverse complemented base by base on the minus strand
+    end = min(region.end, fasta.lengths[region.scaffold])
+    sequence = fasta.fetch(region.scaffold, region.start - 1, end)
+    if region.strand == "-":
+        sequence = "".join(COMPLEMENT[base] for base in reversed(sequence))
+    return sequence
+
+
+@pytest.fixture(scope="module")
+def fasta(dataset):
+    with IndexedFasta(dataset["fasta"]) as fasta:
+        yield fasta
+
+
+@pytest.fixture(scope="module")
+def store(dataset):
+    return parse_annotations(dataset["gff3"], index=False, graph=False)[0]
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_annotation_regions_with_flank(fasta, store, tmp_path, workers):
+    regions = list(regions_from_annotations(store, features=["gene"], flank=100))
+    assert {region.strand for region in regions} == {"+", "-"}
+    save_path = str(tmp_path / "genes.fa")
+    exported, skipped = export_regions(fasta, regions, save_path, workers=workers, width=60)
+    assert (exported, skipped) == (len(regions), 0)
+
+    order = {name: index for index, name in enumerate(fasta.names())}
+    expected = {}
+    for region in regions:
+        end = min(region.end, fasta.lengths[region.scaffold])
+        header = f"{region.name} {region.scaffold}:{region.start}-{end}" + ("(-)" if region.strand == "-" else "")
+        expected[header] = expected_sequence(fasta, region)
+    records = read_records(save_path)
+    assert dict(records) == expected
+    # Assembly order, then position
+    positions = [(order[header.split()[-1].split(":")[0]], int(header.split(":")[1].split("-")[0]))
+                 for header, _ in records]
+    assert positions == sorted(positions)
+    with open(save_path) as handle:
+        assert max(len(line.rstrip("\n")) for line in handle if not line.startswith(">")) == 60
+
+
+def test_flank_clipped_and_unknown_scaffolds_skipped(fasta, tmp_path):
+    name = fasta.names()[0]
+    length = fasta.lengths[name]
+    regions = [Region(name, 1, 10, "-", "first"), Region(name, length - 4, length + 50, "+", "last"),
+               Region("missing", 1, 10, "+", "gone"), Region(name, length + 10, length + 20, "+", "past")]
+    save_path = str(tmp_path / "edges.csv")
+    assert export_regions(fasta, regions, save_path, output_format="csv") == (2, 2)
+    with open(save_path, newline="") as handle:
+        rows = list(csv.reader(handle))
+    assert rows[0] == ["Name", "Scaffold", "Start", "End", "Strand", "Length", "Sequence"]
+    assert rows[1] == ["first", name, "1", "10", "-", "10", expected_sequence(fasta, regions[0])]
+    assert rows[2] == ["last", name, str(length - 4), str(length), "+", "5", fasta.fetch(name, length - 5, length)]
+
+
+def test_strand_ignored_when_not_strand_aware(fasta, tmp_path):
+    name = fasta.names()[1]
+    save_path = str(tmp_path / "plus.fa")
+    export_regions(fasta, [Region(name, 101, 300, "-", "")], save_path, strand_aware=False)
+    assert read_records(save_path) == [(f"{name}:101-300", fasta.fetch(name, 100, 300))]
+
+
+def test_bed_regions(tmp_path):
+    path = str(tmp_path / "regions.bed")
+    with open(path, "w") as handle:
+        handle.write("track name=test\nchr1\t0\t100\tfirst\t0\t-\nchr2\t50\t60\n\nchr3:11-20\n")
+    assert list(read_regions(path, flank=5)) == [Region("chr1", 1, 105, "-", "first"),
+                                                 Region("chr2", 46, 65, "+", ""),
+                                                 Region("chr3", 6, 25, "+", "")]
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_failed_export_keeps_existing_file(fasta, store, tmp_path, workers):
+    save_path = str(tmp_path / "genes.fa")
+    with open(save_path, "w") as handle:
+        handle.write("previous export\n")
+
+    def cancel(done, total):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        export_regions(fasta, list(regions_from_annotations(store)), save_path, workers=workers, progress=cancel)
+    with open(save_path) as handle:
+        assert handle.read() == "previous export\n"
+    assert os.listdir(tmp_path) == ["genes.fa"]
+
+    missing = str(tmp_path / "missing" / "genes.fa")
+    with pytest.raises(FileNotFoundError):
+        export_regions(fasta, [Region(fasta.names()[0], 1, 10, "+", "")], missing)
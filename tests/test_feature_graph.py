@@ -0,0 +1,149 @@
+import os
+
+import pytest
+
+from export import reverse_complement
+from fasta_index import IndexedFasta
+from feature_graph import export_transcripts, transcript_sequence, translate
+from parallel_parse import parse_annotations
+
+# chr1, 1-based: t1 (+) has exons 1-12 and 21-32 with its CDS on 4-12 and 21-29;
+# t2 (-) has exons 41-46 and 50-60 and a partial CDS on 50-56 (phase 1) and 41-46
+SEQUENCE = "CCC" + "ATGGCCTTT" + "GGGGGGGG" + "AAATGGTAA" + "C" * 11 + "TCAGGG" + "AAA" + "TTTCATG" + "GGGG"
+GFF3 = """##gff-version 3
+chr1\tt\tgene\t1\t32\t.\t+\t.\tID=g1;Name=alpha
+chr1\tt\tmRNA\t1\t32\t.\t+\t.\tID=t1;Parent=g1
+chr1\tt\texon\t1\t12\t.\t+\t.\tID=t1.e1;Parent=t1
+chr1\tt\texon\t21\t32\t.\t+\t.\tID=t1.e2;Parent=t1
+chr1\tt\tCDS\t4\t12\t.\t+\t0\tID=t1.cds;Parent=t1
+chr1\tt\tCDS\t21\t29\t.\t+\t0\tID=t1.cds;Parent=t1
+chr1\tt\tncRNA\t13\t20\t.\t+\t.\tID=t3;Parent=g1
+chr1\tt\texon\t13\t20\t.\t+\t.\tID=t3.e1;Parent=t3
+chr1\tt\tgene\t41\t60\t.\t-\t.\tID=g2
+chr1\tt\tmRNA\t41\t60\t.\t-\t.\tID=t2;Parent=g2
+chr1\tt\texon\t41\t46\t.\t-\t.\tID=t2.e1;Parent=t2
+chr1\tt\texon\t50\t60\t.\t-\t.\tID=t2.e2;Parent=t2
+chr1\tt\tCDS\t50\t56\t.\t-\t1\tID=t2.cds;Parent=t2;protein_id=p2
+chr1\tt\tCDS\t41\t46\t.\t-\t0\tID=t2.cds;Parent=t2;protein_id=p2
+chr9\tt\tmRNA\t1\t10\t.\t+\t.\tID=t4
+chr9\tt\texon\t1\t10\t.\t+\t.\tID=t4.e1;Parent=t4
+"""
+GTF = """chr1\tt\tgene\t1\t32\t.\t+\t.\tgene_id "g1"; gene_name "alpha";
+chr1\tt\ttranscript\t1\t32\t.\t+\t.\tgene_id "g1"; transcript_id "t1";
+chr1\tt\texon\t1\t12\t.\t+\t.\tgene_id "g1"; transcript_id "t1";
+chr1\tt\texon\t21\t32\t.\t+\t.\tgene_id "g1"; transcript_id "t1";
+chr1\tt\tCDS\t4\t12\t.\t+\t0\tgene_id "g1"; transcript_id "t1";
+chr1\tt\tCDS\t21\t29\t.\t+\t0\tgene_id "g1"; transcript_id "t1";
+chr1\tt\texon\t13\t20\t.\t+\t.\tgene_id "g1"; transcript_id "t3";
+chr1\tt\texon\t41\t46\t.\t-\t.\tgene_id "g2"; transcript_id "t2";
+chr1\tt\texon\t50\t60\t.\t-\t.\tgene_id "g2"; transcript_id "t2";
+chr1\tt\tCDS\t50\t56\t.\t-\t1\tgene_id "g2"; transcript_id "t2"; protein_id "p2";
+chr1\tt\tCDS\t41\t46\t.\t-\t0\tgene_id "g2"; transcript_id "t2"; protein_id "p2";
+chr9\tt\texon\t1\t10\t.\t+\t.\tgene_id "g4"; transcript_id "t4";
+"""
+
+
+def read_records(path):
+    with open(path) as handle:
+        text = handle.read()
+    return [(record.split("\n", 1)[0], record.split("\n", 1)[1].replace("\n", ""))
+            for record in text.split(">")[1:]]
+
+
+@pytest.fixture
+def fasta(tmp_path):
+    path = str(tmp_path / "genes.fa")
+    with open(path, "w") as handle:
+        handle.write(f">chr1\n{SEQUENCE[:25]}\n{SEQUENCE[25:50]}\n{SEQUENCE[50:]}\n")
+    with IndexedFasta(path) as fasta:
+        yield fasta
+
+
+@pytest.fixture(params=["gff3", "gtf"])
+def annotation(request, tmp_path):
+    path = str(tmp_path / f"genes.{request.param}")
+    with open(path, "w") as handle:
+        handle.write(GFF3 if request.param == "gff3" else GTF)
+    store, _, graph = parse_annotations(path, index=False)
+    return store, graph, request.param
+
+
+def test_hierarchy(annotation):
+    store, graph, annotation_format = annotation
+    # A GFF3 transcript without a parent is its own gene
+    assert sorted(graph.genes) == ["g1", "g2", "g4" if annotation_format == "gtf" else "t4"]
+    assert graph.genes["g1"].name == "alpha"
+    assert sorted(graph.genes["g1"].transcripts) == ["t1", "t3"]
+    assert graph.transcripts["t2"].gene_id == "g2"
+    assert graph.transcripts["t2"].protein_id == "p2"
+    assert (len(graph.transcripts["t1"].exon_rows), len(graph.transcripts["t1"].cds_rows)) == (2, 2)
+    cds_row = graph.transcripts["t1"].cds_rows[0]
+    assert graph.transcripts_for_row(cds_row) == ["t1"]
+    assert sorted(graph.transcripts_for_row(graph.genes["g1"].row)) == ["t1", "t3"]
+
+
+def test_spliced_sequences_and_phase(fasta, annotation):
+    store, graph, _ = annotation
+    t1, t2 = graph.transcripts["t1"], graph.transcripts["t2"]
+    assert transcript_sequence(fasta, store, t1) == SEQUENCE[0:12] + SEQUENCE[20:32]
+    assert transcript_sequence(fasta, store, t1, "cds") == "ATGGCCTTTAAATGGTAA"
+    assert transcript_sequence(fasta, store, t2) == reverse_complement(SEQUENCE[40:46] + SEQUENCE[49:60])
+    # The first (5') CDS segment on the minus strand is the rightmost one, and its phase drops one base
+    assert transcript_sequence(fasta, store, t2, "cds") == "ATGAAACCCTGA"
+    assert transcript_sequence(fasta, store, graph.transcripts["t3"], "cds") == ""
+
+
+def test_translate():
+    assert translate("ATGGCCTTTAAATGGTAA") == "MAFKW*"
+    assert translate("augGCCtt") == "MA"  # RNA and lower case, the incomplete codon dropped
+    assert translate("ATGNNNTGA") == "MX*"
+    assert translate("ATAAGATGG") == "IRW"
+
+
+@pytest.mark.parametrize("kind, expected", [
+    ("mrna", {"t1": SEQUENCE[0:12] + SEQUENCE[20:32], "t3": SEQUENCE[12:20],
+              "t2": reverse_complement(SEQUENCE[40:46] + SEQUENCE[49:60])}),
+    ("cds", {"t1": "ATGGCCTTTAAATGGTAA", "t2": "ATGAAACCCTGA"}),
+    ("protein", {"t1": "MAFKW", "p2": "MKP"}),  # Named by protein_id where there is one
+])
+def test_export_transcripts(fasta, annotation, tmp_path, kind, expected):
+    store, graph, _ = annotation
+    save_path = str(tmp_path / f"{kind}.fa")
+    exported, skipped = export_transcripts(fasta, store, graph, save_path, kind=kind)
+    assert (exported, skipped) == (len(expected), 4 - len(expected))
+    records = read_records(save_path)
+    assert {header.split()[0]: sequence for header, sequence in records} == expected
+    # In assembly order, the span of the exons (or of the CDS) in the header
+    assert records[0][0].split()[-1] == ("chr1:1-32(+)" if kind == "mrna" else "chr1:4-29(+)")
+
+
+class FailingFasta:
+    # Fails partway through the export, after the output has been opened
+    def __init__(self, fasta):
+        self.fasta = fasta
+        self.fetches = 0
+
+    def names(self):
+        return self.fasta.names()
+
+    def fetch(self, *args):
+        self.fetches += 1
+        if self.fetches > 2:
+            raise KeyboardInterrupt
+        return self.fasta.fetch(*args)
+
+
+def test_failed_export_keeps_existing_file(fasta, annotation, tmp_path):
+    store, graph, _ = annotation
+    save_path = str(tmp_path / "previous.fa")
+    with open(save_path, "w") as handle:
+        handle.write("previous export\n")
+    before = sorted(os.listdir(tmp_path))
+    with pytest.raises(KeyboardInterrupt):
+        export_transcripts(FailingFasta(fasta), store, graph, save_path)
+    with open(save_path) as handle:
+        assert handle.read() == "previous export\n"
+    assert sorted(os.listdir(tmp_path)) == before
+
+    with pytest.raises(FileNotFoundError):
+        export_transcripts(fasta, store, graph, str(tmp_path / "missing" / "out.fa"))
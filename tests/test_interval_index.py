@@ -0,0 +1,66 @@
+import random
+
+import pytest
+
+from annotations import AnnotationStore
+from interval_index import IntervalIndex
+from parallel_parse import parse_annotations
+
+
+def random_store(rng, rows):
+    # Nested, overlapping and identical intervals over two scaffolds
+    store = AnnotationStore()
+    for _ in range(rows):
+        start = rng.randint(1, 50_000)
+        end = start + rng.choice((0, rng.randint(0, 50), rng.randint(0, 5_000)))
+        store.append((rng.choice(("a", "b")), "src", "gene", start, end, "+", ".", "", ""))
+    return store
+
+
+def brute_overlap(store, scaffold, start, end):
+    rows = [row for row in range(len(store))
+            if store.scaffold[row] == scaffold and store.start[row] <= end and store.end[row] >= start]
+    return sorted(rows, key=lambda row: (store.start[row], row))
+
+
+def brute_distance(store, scaffold, start, end):
+    distances = [start - store.end[row] if store.end[row] < start else store.start[row] - end
+                 for row in range(len(store)) if store.scaffold[row] == scaffold]
+    return min(distances, default=None)
+
+
+def check(store, index, rng, queries):
+    for _ in range(queries):
+        scaffold = rng.choice(("a", "b", "missing"))
+        start = rng.randint(-100, 60_000)
+        end = start + rng.choice((0, rng.randint(0, 2_000)))
+        expected = brute_overlap(store, scaffold, start, end)
+        assert index.overlap(scaffold, start, end) == expected
+
+        nearest = index.nearest(scaffold, start, end)
+        if expected:
+            assert nearest == expected
+            continue
+        best = brute_distance(store, scaffold, start, end)
+        assert (best is None) == (not nearest)
+        for row in nearest:
+            distance = start - store.end[row] if store.end[row] < start else store.start[row] - end
+            assert distance == best
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_overlap_and_nearest_match_brute_force(seed):
+    rng = random.Random(seed)
+    store = random_store(rng, rng.choice((1, 20, 2_000)))
+    check(store, IntervalIndex(store), rng, 300)
+
+
+def test_synthetic_annotation(dataset):
+    store = parse_annotations(dataset["gff3"], index=False, graph=False)[0]
+    rng = random.Random(11)
+    index = IntervalIndex(store)
+    name, length = dataset["lengths"][0]
+    for _ in range(50):
+        start = rng.randint(1, length)
+        end = start + rng.randint(0, 20_000)
+        assert index.overlap(name, start, end) == brute_overlap(store, name, start, end)
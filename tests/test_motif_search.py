@@ -0,0 +1,87 @@
+import os
+import re
+
+import pytest
+
+from fasta_index import IndexedFasta
+from motif_search import MotifError, MotifSet, parse_patterns, reverse_complement_pattern, search_fasta
+
+PATTERNS = (("ecori", "GAATTC"), ("tata", "TATAWAW"), ("degenerate", "GCNNGC"))
+CHUNK_SIZE = 100_000  # Many chunks, so hits across chunk edges are exercised
+
+
+def brute_hits(fasta, patterns):
+    # Every overlapping match on both strands (palindromes on the plus strand only),
+    # via regexes over whole scaffolds
+    codes = {"A": "A", "C": "C", "G": "G", "T": "T", "R": "[AG]", "Y": "[CT]", "S": "[CG]", "W": "[AT]",
+             "K": "[GT]", "M": "[AC]", "B": "[CGT]", "D": "[AGT]", "H": "[ACT]", "V": "[ACG]", "N": "[ACGT]"}
+    hits = []
+    for scaffold in fasta.names():
+        text = fasta.fetch(scaffold).upper()
+        for name, sequence in patterns:
+            reverse = reverse_complement_pattern(sequence)
+            for strand, motif in (("+", sequence), ("-", reverse)) if reverse != sequence else (("+", sequence),):
+                regex = re.compile("(?=" + "".join(codes[base] for base in motif) + ")")
+                hits.extend((scaffold, match.start(), match.start() + len(motif), strand, name)
+                            for match in regex.finditer(text))
+    return hits
+
+
+@pytest.fixture(scope="module")
+def fasta(dataset):
+    with IndexedFasta(dataset["fasta"]) as fasta:
+        yield fasta
+
+
+def test_serial_matches_brute_force(fasta):
+    hits = search_fasta(fasta, PATTERNS, chunk_size=CHUNK_SIZE)
+    order = {name: index for index, name in enumerate(fasta.names())}
+    assert not hits.truncated
+    assert sorted(hits[index] for index in range(len(hits))) == sorted(brute_hits(fasta, PATTERNS))
+    assert [(order[hit[0]], hit[1]) for hit in hits] == sorted((order[hit[0]], hit[1]) for hit in hits)
+
+
+def test_parallel_matches_serial(fasta):
+    serial = search_fasta(fasta, PATTERNS, chunk_size=CHUNK_SIZE)
+    parallel = search_fasta(fasta, PATTERNS, workers=3, chunk_size=CHUNK_SIZE)
+    assert [serial[index] for index in range(len(serial))] == [parallel[index] for index in range(len(parallel))]
+    assert serial.counts() == parallel.counts()
+
+
+def test_workers_without_fai(fasta_copy):
+    with IndexedFasta(fasta_copy) as fasta:
+        os.unlink(fasta_copy + ".fai")  # Workers open the FASTA from the parent's entries
+        serial = search_fasta(fasta, PATTERNS[:1], chunk_size=CHUNK_SIZE)
+        parallel = search_fasta(fasta, PATTERNS[:1], workers=2, chunk_size=CHUNK_SIZE)
+        assert len(serial) == len(parallel) > 0
+    assert not os.path.exists(fasta_copy + ".fai")
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_hit_limit(fasta, workers):
+    total = len(search_fasta(fasta, PATTERNS[:1], chunk_size=CHUNK_SIZE))
+    assert total > 10
+    exact = search_fasta(fasta, PATTERNS[:1], workers=workers, max_hits=total, chunk_size=CHUNK_SIZE)
+    assert len(exact) == total and not exact.truncated
+    cut = search_fasta(fasta, PATTERNS[:1], workers=workers, max_hits=total - 1, chunk_size=CHUNK_SIZE)
+    assert len(cut) == total - 1 and cut.truncated
+    few = search_fasta(fasta, PATTERNS[:1], workers=workers, max_hits=5, chunk_size=CHUNK_SIZE)
+    assert [few[index] for index in range(5)] == [exact[index] for index in range(5)] and few.truncated
+
+
+def test_scan_cap_over_both_strands():
+    # Minus strand hits (GTT) come first, then plus strand ones (AAC)
+    motifs = MotifSet([("aac", "AAC"), ("ecori", "GAATTC")])
+    text = "GTTGTTGAATTCGTTAACAACAAC"
+    everything = motifs.scan(text, max_hits=100)
+    assert [(start, strand) for start, _, strand in everything] == [
+        (0, "-"), (3, "-"), (6, "+"), (12, "-"), (15, "+"), (18, "+"), (21, "+")]
+    for max_hits in range(1, len(everything) + 1):
+        assert motifs.scan(text, max_hits=max_hits, offset=50) == [
+            (start + 50, index, strand) for start, index, strand in everything[:max_hits]]
+    assert motifs.scan(text, limit=13) == everything[:4]
+
+
+def test_bad_patterns():
+    with pytest.raises(MotifError):
+        parse_patterns("GAAXTC")
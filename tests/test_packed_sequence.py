@@ -0,0 +1,67 @@
+import random
+
+import pytest
+
+from fasta_index import IndexedFasta
+from packed_sequence import PackedFasta, PackedSequence
+
+
+def random_sequence(rng, length):
+    # Mostly ACGT with N runs, other IUPAC codes and soft-masked stretches
+    bases = bytearray(rng.choice(b"ACGT") for _ in range(length))
+    for _ in range(length // 500):
+        start = rng.randrange(length)
+        bases[start:start + rng.randint(1, 80)] = b"N" * len(bases[start:start + 80])
+    for _ in range(length // 300):
+        bases[rng.randrange(length)] = rng.choice(b"RYKMSWBDHVn")
+    for _ in range(length // 400):
+        start = rng.randrange(length)
+        end = min(length, start + rng.randint(1, 200))
+        bases[start:end] = bases[start:end].lower()
+    return bytes(bases)
+
+
+def brute_counts(text):
+    upper = text.upper()
+    counts = {base: upper.count(base) for base in "ACGTN"}
+    counts["other"] = len(upper) - sum(counts.values())
+    return counts
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_round_trip_and_counts(seed):
+    rng = random.Random(seed)
+    data = random_sequence(rng, rng.randint(1, 20_000))
+    sequence = PackedSequence("s")
+    position = 0
+    while position < len(data):  # Chunks of whole bytes, as PackedFasta feeds them, the last one ragged
+        size = 4 * rng.randint(1, 1_000)
+        sequence.append(data[position:position + size])
+        position += size
+
+    text = data.decode()
+    assert len(sequence) == len(data)
+    assert sequence.fetch() == text
+    for _ in range(200):
+        start = rng.randrange(-5, len(data) + 5)
+        end = start + rng.randrange(0, 300)
+        window = text[max(0, start):max(0, end)]
+        assert sequence.fetch(start, end) == window
+        assert sequence.base_counts(start, end) == brute_counts(window)
+        assert sequence.soft_masked(start, end) == sum(base.islower() for base in window)
+    assert sequence.base_counts() == brute_counts(text)
+
+
+def test_packed_fasta_matches_indexed(fasta_copy):
+    rng = random.Random(3)
+    with IndexedFasta(fasta_copy) as fasta:
+        packed = PackedFasta.from_fasta(fasta)
+        assert packed.lengths == fasta.lengths
+        assert packed.memory_size() < sum(fasta.lengths.values()) / 3
+        for name in fasta.names():
+            length = fasta.lengths[name]
+            assert packed[name].base_counts() == brute_counts(fasta.fetch(name))
+            for _ in range(50):
+                start = rng.randrange(length)
+                end = start + rng.randrange(1, 5_000)
+                assert packed.fetch(name, start, end) == fasta.fetch(name, start, end)
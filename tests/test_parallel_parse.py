@@ -0,0 +1,103 @@
+import os
+
+import pytest
+
+import parallel_parse
+from fasta_index import read_fai
+from parallel_parse import parse_annotations, scan_fasta, split_offsets
+
+WORKERS = 3
+
+
+@pytest.fixture
+def force_parallel(monkeypatch):
+    # Small inputs go down the multi-process path, cut into many pieces
+    monkeypatch.setattr(parallel_parse, "MIN_PARALLEL_SIZE", 0)
+    monkeypatch.setattr(parallel_parse, "MIN_PIECE_SIZE", 64 * 1024)
+    monkeypatch.setattr(parallel_parse, "PIECES_PER_WORKER", 8)
+
+
+def slots(record):
+    return {name: getattr(record, name) for name in record.__slots__}
+
+
+def test_split_offsets_cut_after_markers(dataset):
+    path = dataset["fasta"]
+    with open(path, "rb") as handle:
+        data = handle.read()
+    for marker in (b"\n", b"\n>"):
+        offsets = split_offsets(path, 100_000, marker)
+        assert offsets[0] == 0 and offsets[-1] == len(data)
+        assert offsets == sorted(set(offsets))
+        for offset in offsets[1:-1]:
+            assert data[offset - 1:offset] == b"\n"
+            if marker == b"\n>":
+                assert data[offset:offset + 1] == b">"
+    assert len(split_offsets(path, 100_000, b"\n")) > len(split_offsets(path, 100_000, b"\n>")) > 2
+
+
+@pytest.mark.parametrize("annotation_format", ["gff3", "gtf"])
+def test_parallel_parse_equals_serial(dataset, force_parallel, annotation_format):
+    path = dataset[annotation_format]
+    store, search_index, graph = parse_annotations(path, workers=1)
+    assert len(split_offsets(path, parallel_parse._piece_size(path, WORKERS))) > 3
+    merged = []
+    parallel_store, parallel_index, parallel_graph = parse_annotations(
+        path, workers=WORKERS, on_merged=lambda partial: merged.append(len(partial)))
+
+    assert len(store) > 0 and len(merged) > 1 and merged[-1] == len(store)
+    for name in store.COLUMN_NAMES:
+        assert list(map(store.column(name).__getitem__, range(len(store)))) == \
+            list(map(parallel_store.column(name).__getitem__, range(len(parallel_store)))), name
+
+    assert search_index.postings == parallel_index.postings
+    assert search_index.vocabulary == parallel_index.vocabulary
+    assert search_index.row_count == parallel_index.row_count
+    assert list(search_index.search("kinase")) == list(parallel_index.search("kinase"))
+
+    assert len(graph.transcripts) > 0
+    assert list(graph.genes) == list(parallel_graph.genes)
+    assert list(graph.transcripts) == list(parallel_graph.transcripts)
+    for gene_id, gene in graph.genes.items():
+        assert slots(gene) == slots(parallel_graph.genes[gene_id])
+    for transcript_id, transcript in graph.transcripts.items():
+        assert slots(transcript) == slots(parallel_graph.transcripts[transcript_id])
+    assert graph.row_transcripts == parallel_graph.row_transcripts
+
+
+def test_parse_without_index_or_graph(dataset, force_parallel):
+    store, search_index, graph = parse_annotations(dataset["gff3"], workers=WORKERS, index=False, graph=False)
+    assert search_index is None and graph is None
+    assert len(store) == len(parse_annotations(dataset["gff3"], index=False, graph=False)[0])
+
+
+def test_parallel_scan_equals_serial(dataset, fasta_copy, force_parallel):
+    entries, stats, tracks = scan_fasta(fasta_copy, workers=1)
+    os.unlink(fasta_copy + ".fai")
+    assert len(split_offsets(fasta_copy, parallel_parse._piece_size(fasta_copy, WORKERS), b"\n>")) > 3
+    parallel_entries, parallel_stats, parallel_tracks = scan_fasta(fasta_copy, workers=WORKERS)
+
+    assert [entry.name for entry in entries] == [name for name, _ in dataset["lengths"]]
+    assert [entry.length for entry in entries] == [length for _, length in dataset["lengths"]]
+    assert entries == parallel_entries == read_fai(fasta_copy + ".fai")
+    assert [slots(scaffold) for scaffold in stats.scaffolds] == \
+        [slots(scaffold) for scaffold in parallel_stats.scaffolds]
+    assert stats.summary() == parallel_stats.summary()
+    assert list(tracks.scaffolds) == list(parallel_tracks.scaffolds)
+    for name, length in dataset["lengths"]:
+        assert tracks.profile(name, 0, length, 50, length) == parallel_tracks.profile(name, 0, length, 50, length)
+
+
+def test_scan_reuses_current_fai(fasta_copy):
+    entries, stats, _ = scan_fasta(fasta_copy)
+    fai_path = fasta_copy + ".fai"
+    written = os.path.getmtime(fai_path)
+    os.utime(fai_path, (written + 10, written + 10))
+
+    reused, reused_stats, _ = scan_fasta(fasta_copy)
+    assert reused == entries and os.path.getmtime(fai_path) == written + 10
+    assert reused_stats.summary() == stats.summary()
+
+    os.utime(fasta_copy, (written + 20, written + 20))  # FASTA edited after its index
+    assert scan_fasta(fasta_copy)[0] == entries
+    assert os.path.getmtime(fai_path) != written + 10  # Rewritten
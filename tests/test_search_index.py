@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from annotations import parse_annotation_line
+from parallel_parse import parse_annotations
+from search_index import FIELD_ALIASES, SEARCH_FIELDS, SearchIndex, parse_query, tokenize
+
+
+def brute_rows(rows, query):
+    # Every term must be a prefix of a token in its field (any field when unscoped)
+    terms = parse_query(query)
+    if not terms:
+        return []
+    matched = []
+    for number, row in enumerate(rows):
+        for field, token in terms:
+            fields = [field] if field else SEARCH_FIELDS
+            if not any(word.startswith(token) for name in fields for word in tokenize(row[SEARCH_FIELDS[name]])):
+                break
+        else:
+            matched.append(number)
+    return matched
+
+
+def random_query(rng, rows):
+    row = rows[rng.randrange(len(rows))]
+    words = []
+    for _ in range(rng.randint(1, 3)):
+        field = rng.choice(list(SEARCH_FIELDS))
+        tokens = tokenize(row[SEARCH_FIELDS[field]])
+        if not tokens:
+            continue
+        token = rng.choice(tokens)
+        token = token[:rng.randint(1, len(token))]
+        alias = rng.choice([name for name, target in FIELD_ALIASES.items() if target == field])
+        words.append(rng.choice((token, token.upper(), f"{alias}:{token}")))
+    return " ".join(words)
+
+
+@pytest.fixture(scope="module")
+def annotation(dataset):
+    with open(dataset["gff3"]) as handle:
+        rows = [row for row in map(parse_annotation_line, handle) if row is not None]
+    store, index, _ = parse_annotations(dataset["gff3"], graph=False)
+    assert len(store) == len(rows)
+    return rows, index
+
+
+def test_matches_brute_force(annotation):
+    rows, index = annotation
+    rng = random.Random(9)
+    for _ in range(60):
+        query = random_query(rng, rows)
+        assert index.search(query) == brute_rows(rows, query), query
+
+
+def test_scoped_terms_and_prefixes():
+    rows = [("chr1", "src", "gene", 1, 10, "+", ".", "protein kinase", "psbA", "ID=g1;Name=psbA"),
+            ("chr1", "src", "CDS", 1, 10, "+", "0", "protein kinase", "psbA", "ID=c1;Parent=g1"),
+            ("chr2", "src", "CDS", 5, 20, "-", "0", "helicase", "rbcL", "ID=c2;note=kinase-like"),
+            ("chr2", "src", "exon", 5, 20, "-", ".", "Unknown", "Unknown", "ID=e2")]
+    index = SearchIndex()
+    index.add_rows(0, rows)
+    index.finalize()
+    assert index.search("kinase") == [0, 1, 2]
+    assert index.search("product:kinase") == [0, 1]
+    assert index.search("attr:kinase") == [2]
+    assert index.search("KIN type:cds") == [1, 2]
+    assert index.search("gene:psb feature:CDS") == [1]
+    assert index.search("chr:chr2 name:rbc") == [2]
+    assert index.search("psbA rbcL") == []
+    assert index.search("colour:red") == []  # Not a field, so both words are plain terms
+    assert index.search("  ") == []
+    assert parse_query("Gene:psbA-like chr1") == [("gene_name", "psba"), ("gene_name", "like"), (None, "chr1")]